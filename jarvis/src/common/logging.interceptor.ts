@@ -6,22 +6,31 @@ import {
   NestInterceptor,
 } from '@nestjs/common';
 import { Observable, tap } from 'rxjs';
-import type { Request } from 'express';
+import type { Request, Response } from 'express';
+
+/** En-tête posé par le wake listener pour joindre ses traces aux logs du backend. */
+export const TRACE_HEADER = 'x-trace-id';
 
 @Injectable()
 export class LoggingInterceptor implements NestInterceptor {
   private readonly logger = new Logger('HTTP');
 
   intercept(context: ExecutionContext, next: CallHandler): Observable<unknown> {
-    const req = context.switchToHttp().getRequest<Request>();
+    const http = context.switchToHttp();
+    const req = http.getRequest<Request>();
     const { method, url } = req;
     const start = Date.now();
+    const traceId = req.header(TRACE_HEADER);
+    const traceSuffix = traceId ? ` [trace=${traceId}]` : '';
+    if (traceId) http.getResponse<Response>().setHeader(TRACE_HEADER, traceId);
 
     return next
       .handle()
       .pipe(
         tap(() =>
-          this.logger.log(`${method} ${url} — ${Date.now() - start}ms`),
+          this.logger.log(
+            `${method} ${url} — ${Date.now() - start}ms${traceSuffix}`,
+          ),
         ),
       );
   }
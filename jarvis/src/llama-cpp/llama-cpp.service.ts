@@ -253,6 +253,8 @@ export class LlamaCppService implements OnModuleInit, OnModuleDestroy {
     });
     const start = Date.now();
     let tokenCount = 0;
+    // Interrompt la génération si le consommateur abandonne le flux
+    const abort = new AbortController();
 
     try {
       let resolveNext: ((value: IteratorResult<string>) => void) | null = null;
@@ -261,6 +263,8 @@ export class LlamaCppService implements OnModuleInit, OnModuleDestroy {
 
       const completionPromise = completion.generateCompletion(fullPrompt, {
         temperature: this.temperature,
+        signal: abort.signal,
+        stopOnAbortSignal: true,
         onToken: (tokens: Token[]) => {
           const text = this.llmContext!.model.detokenize(tokens);
           if (text) {
@@ -305,6 +309,7 @@ export class LlamaCppService implements OnModuleInit, OnModuleDestroy {
         `generateStream() — ${tokenCount} tokens in ${Date.now() - start}ms`,
       );
     } finally {
+      abort.abort();
       await completion.dispose();
       sequence.dispose();
     }
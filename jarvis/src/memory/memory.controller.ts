@@ -1,4 +1,5 @@
-import { Body, Controller, Post } from '@nestjs/common';
+import { Body, Controller, Post, Res } from '@nestjs/common';
+import * as express from 'express';
 import { MemoryService } from './memory.service';
 import { MemoryAddDto, MemoryQueryDto, MemorySearchDto } from './memory.dto';
 
@@ -8,7 +9,10 @@ export class MemoryController {
 
   @Post('add')
   async add(@Body() dto: MemoryAddDto) {
-    return this.memory.add(dto.text, dto.source, dto.contextType);
+    return this.memory.add(dto.text, dto.source, dto.contextType, {
+      id: dto.id,
+      spokenAt: dto.spokenAt,
+    });
   }
 
   @Post('search')
@@ -20,4 +24,39 @@ export class MemoryController {
   async query(@Body() dto: MemoryQueryDto) {
     return this.memory.query(dto.query, dto.topK);
   }
+
+  @Post('query/stream')
+  async queryStream(
+    @Body() dto: MemoryQueryDto,
+    @Res() res: express.Response,
+  ): Promise<void> {
+    res.setHeader('Content-Type', 'text/event-stream');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.setHeader('Connection', 'keep-alive');
+    res.setHeader('X-Accel-Buffering', 'no');
+    res.flushHeaders();
+
+    // Client parti (requête spéculative abandonnée) : arrêter la génération
+    let clientGone = false;
+    res.on('close', () => (clientGone = true));
+
+    try {
+      const { tokenStream, ...metadata } = await this.memory.queryStream(
+        dto.query,
+        dto.topK,
+      );
+
+      res.write(`event: metadata\ndata: ${JSON.stringify(metadata)}\n\n`);
+
+      for await (const token of tokenStream) {
+        if (clientGone) return;
+        res.write(`data: ${JSON.stringify({ token })}\n\n`);
+      }
+      res.write(`data: ${JSON.stringify({ done: true })}\n\n`);
+    } catch {
+      res.write(`data: ${JSON.stringify({ error: 'Generation failed' })}\n\n`);
+    } finally {
+      res.end();
+    }
+  }
 }
@@ -4,6 +4,7 @@ import {
   IsInt,
   IsOptional,
   IsString,
+  IsUUID,
   Min,
   MinLength,
   ValidateNested,
@@ -22,6 +23,16 @@ export class MemoryAddDto {
   @IsOptional()
   @IsString()
   contextType?: string;
+
+  /** Clé d'idempotence : un renvoi avec le même id écrase le même point. */
+  @IsOptional()
+  @IsUUID()
+  id?: string;
+
+  /** Moment où l'information a été dite (ajout différé) ; défaut : maintenant. */
+  @IsOptional()
+  @IsISO8601()
+  spokenAt?: string;
 }
 
 export class DateFilterDto {
@@ -34,17 +34,45 @@ export class MemoryService {
     this.defaultTopK = Number(this.config.get('RAG_TOP_K') ?? 5);
   }
 
-  async add(text: string, source = 'manual-input', contextType = 'memory') {
+  async add(
+    text: string,
+    source = 'manual-input',
+    contextType = 'memory',
+    options: { id?: string; spokenAt?: string } = {},
+  ) {
     try {
-      const temporalResult = this.temporal.parse(text);
+      // Renvoi idempotent (rejeu du journal du wake listener après un accusé
+      // perdu) : le souvenir déjà stocké est rendu tel quel, sans remettre
+      // accessCount à zéro ni réémettre MEMORY_ADDED
+      if (options.id) {
+        const existing = await this.vs.getMemoryPoint(options.id);
+        const stored = existing?.payload as MemoryPayload | null | undefined;
+        if (stored) {
+          this.logger.log(`Ajout mémoire déjà enregistré (id=${options.id})`);
+          return {
+            source: stored.source,
+            upserted: 0,
+            ...(stored.eventDate !== undefined
+              ? { eventDate: stored.eventDate }
+              : {}),
+          };
+        }
+      }
+
+      // Ajout différé (file locale du wake listener) : « demain » se résout
+      // par rapport au moment où la phrase a été dite, pas à l'arrivée
+      const spokenAt = options.spokenAt
+        ? new Date(options.spokenAt)
+        : new Date();
+      const temporalResult = this.temporal.parse(text, spokenAt);
       const eventDate = temporalResult?.resolvedDate;
 
       const [vector] = await this.ollama.embed([text]);
       await this.vs.ensureMemoryCollection(vector.length);
 
-      const addedAt = new Date().toISOString();
+      const addedAt = spokenAt.toISOString();
       const importance = this.scoring.computeImportance(text, eventDate);
-      const memoryId = uuidv4();
+      const memoryId = options.id ?? uuidv4();
       await this.vs.upsertMemory([
         {
           id: memoryId,
@@ -131,101 +159,143 @@ export class MemoryService {
 
   async query(q: string, topK?: number) {
     try {
-      // 1. Détecter le contexte temporel dans la question
-      let dateFilter:
-        | { field: 'eventDate' | 'addedAt'; gte?: string; lte?: string }
-        | undefined;
-      let temporalExpression: string | undefined;
-
-      // Priorité à l'intervalle (semaine, plage de dates)
-      const interval = this.temporal.parseInterval(q);
-      if (interval) {
-        dateFilter = {
-          field: 'eventDate',
-          gte: interval.start,
-          lte: interval.end,
-        };
-        temporalExpression = interval.expression;
-      } else {
-        // Fallback : date unique → filtre sur la journée entière
-        const temporal = this.temporal.parse(q);
-        if (temporal?.resolvedDate) {
-          const d = new Date(temporal.resolvedDate);
-          const y = d.getUTCFullYear();
-          const mo = d.getUTCMonth();
-          const dy = d.getUTCDate();
-          const gte = new Date(Date.UTC(y, mo, dy, 0, 0, 0, 0)).toISOString();
-          const lte = new Date(
-            Date.UTC(y, mo, dy, 23, 59, 59, 999),
-          ).toISOString();
-          dateFilter = { field: 'eventDate', gte, lte };
-          temporalExpression = temporal.expression;
-        }
+      const { prompt, system, ...meta } = await this.buildQueryPrompt(q, topK);
+
+      // Générer la réponse LLM (non-streaming)
+      const answer = await this.ollama.generate(prompt, system);
+
+      this.eventEmitter.emit(JARVIS_EVENTS.MEMORY_QUERIED, {
+        question: q,
+        answer,
+        sourceIds: meta.sources,
+        topK: meta.topK,
+      } satisfies MemoryQueriedEvent);
+
+      return { answer, ...meta };
+    } catch (error) {
+      this.logger.error(`Requête mémoire échouée pour "${q}"`, error);
+      throw new InternalServerErrorException('La requête mémoire a échoué');
+    }
+  }
+
+  /**
+   * Variante streamée de query() : recherche et prompt identiques, réponse
+   * LLM émise token par token. MEMORY_QUERIED est émis une fois le flux
+   * entièrement consommé.
+   */
+  async queryStream(
+    q: string,
+    topK?: number,
+  ): Promise<{
+    sources: string[];
+    topK: number;
+    temporalContext?: string;
+    tokenStream: AsyncGenerator<string>;
+  }> {
+    const { prompt, system, ...meta } = await this.buildQueryPrompt(q, topK);
+    const eventEmitter = this.eventEmitter;
+    const tokens = this.ollama.generateStream(prompt, system);
+
+    async function* tokenStream(): AsyncGenerator<string> {
+      let answer = '';
+      for await (const token of tokens) {
+        answer += token;
+        yield token;
       }
+      eventEmitter.emit(JARVIS_EVENTS.MEMORY_QUERIED, {
+        question: q,
+        answer,
+        sourceIds: meta.sources,
+        topK: meta.topK,
+      } satisfies MemoryQueriedEvent);
+    }
 
-      // 2. Chercher les souvenirs pertinents
-      this.logger.debug(
-        `Temporal expression classified "${temporalExpression}" → ${dateFilter?.field} between ${dateFilter?.gte} and ${dateFilter?.lte}`,
-      );
-      const { results } = await this.search(q, topK, dateFilter);
-
-      // 3. Formater le contexte pour le LLM
-      const formatEventDate = (iso: string) => {
-        const d = new Date(iso);
-        return d.toLocaleString('fr-FR', {
-          day: '2-digit',
-          month: '2-digit',
-          year: 'numeric',
-          hour: '2-digit',
-          minute: '2-digit',
-          timeZone: 'Europe/Paris',
-        });
-      };
+    return { ...meta, tokenStream: tokenStream() };
+  }
 
-      const contexts = results
-        .map(
-          (r, i) =>
-            `# Souvenir ${i + 1}${r.source ? ` (source: ${r.source})` : ''}${r.eventDate ? ` [prévu le ${formatEventDate(r.eventDate)}]` : ''}\n${r.text}`,
-        )
-        .join('\n\n');
+  private async buildQueryPrompt(q: string, topK?: number) {
+    // 1. Détecter le contexte temporel dans la question
+    let dateFilter:
+      | { field: 'eventDate' | 'addedAt'; gte?: string; lte?: string }
+      | undefined;
+    let temporalExpression: string | undefined;
 
-      const sources = [
-        ...new Set(results.map((r) => r.source).filter(Boolean)),
-      ] as string[];
+    // Priorité à l'intervalle (semaine, plage de dates)
+    const interval = this.temporal.parseInterval(q);
+    if (interval) {
+      dateFilter = {
+        field: 'eventDate',
+        gte: interval.start,
+        lte: interval.end,
+      };
+      temporalExpression = interval.expression;
+    } else {
+      // Fallback : date unique → filtre sur la journée entière
+      const temporal = this.temporal.parse(q);
+      if (temporal?.resolvedDate) {
+        const d = new Date(temporal.resolvedDate);
+        const y = d.getUTCFullYear();
+        const mo = d.getUTCMonth();
+        const dy = d.getUTCDate();
+        const gte = new Date(Date.UTC(y, mo, dy, 0, 0, 0, 0)).toISOString();
+        const lte = new Date(
+          Date.UTC(y, mo, dy, 23, 59, 59, 999),
+        ).toISOString();
+        dateFilter = { field: 'eventDate', gte, lte };
+        temporalExpression = temporal.expression;
+      }
+    }
 
-      const today = new Date().toLocaleDateString('fr-FR', {
-        weekday: 'long',
+    // 2. Chercher les souvenirs pertinents
+    this.logger.debug(
+      `Temporal expression classified "${temporalExpression}" → ${dateFilter?.field} between ${dateFilter?.gte} and ${dateFilter?.lte}`,
+    );
+    const { results } = await this.search(q, topK, dateFilter);
+
+    // 3. Formater le contexte pour le LLM
+    const formatEventDate = (iso: string) => {
+      const d = new Date(iso);
+      return d.toLocaleString('fr-FR', {
         day: '2-digit',
-        month: 'long',
+        month: '2-digit',
         year: 'numeric',
+        hour: '2-digit',
+        minute: '2-digit',
         timeZone: 'Europe/Paris',
       });
-      const system = `Tu es Jarvis, un assistant personnel pour la maison. Nous sommes le ${today}. Réponds en français. Utilise PRIORITAIREMENT les informations mémorisées pour répondre. Les dates indiquées dans les souvenirs sont les dates réelles de l'événement — ignore les expressions relatives dans le texte (demain, ce soir…) et fie-toi à la date indiquée entre crochets. Si aucune information pertinente n'est disponible, dis-le clairement.`;
+    };
 
-      const prompt =
-        contexts.length > 0
-          ? `Informations mémorisées:\n${contexts}\n\nQuestion:\n${q}\n\nRéponse:`
-          : `Question:\n${q}\n\nAucune information mémorisée pertinente n'est disponible. Réponse:`;
+    const contexts = results
+      .map(
+        (r, i) =>
+          `# Souvenir ${i + 1}${r.source ? ` (source: ${r.source})` : ''}${r.eventDate ? ` [prévu le ${formatEventDate(r.eventDate)}]` : ''}\n${r.text}`,
+      )
+      .join('\n\n');
 
-      // 4. Générer la réponse LLM (non-streaming)
-      const answer = await this.ollama.generate(prompt, system);
+    const sources = [
+      ...new Set(results.map((r) => r.source).filter(Boolean)),
+    ] as string[];
 
-      this.eventEmitter.emit(JARVIS_EVENTS.MEMORY_QUERIED, {
-        question: q,
-        answer,
-        sourceIds: sources,
-        topK: results.length,
-      } satisfies MemoryQueriedEvent);
+    const today = new Date().toLocaleDateString('fr-FR', {
+      weekday: 'long',
+      day: '2-digit',
+      month: 'long',
+      year: 'numeric',
+      timeZone: 'Europe/Paris',
+    });
+    const system = `Tu es Jarvis, un assistant personnel pour la maison. Nous sommes le ${today}. Réponds en français. Utilise PRIORITAIREMENT les informations mémorisées pour répondre. Les dates indiquées dans les souvenirs sont les dates réelles de l'événement — ignore les expressions relatives dans le texte (demain, ce soir…) et fie-toi à la date indiquée entre crochets. Si aucune information pertinente n'est disponible, dis-le clairement.`;
 
-      return {
-        answer,
-        sources,
-        topK: results.length,
-        ...(temporalExpression ? { temporalContext: temporalExpression } : {}),
-      };
-    } catch (error) {
-      this.logger.error(`Requête mémoire échouée pour "${q}"`, error);
-      throw new InternalServerErrorException('La requête mémoire a échoué');
-    }
+    const prompt =
+      contexts.length > 0
+        ? `Informations mémorisées:\n${contexts}\n\nQuestion:\n${q}\n\nRéponse:`
+        : `Question:\n${q}\n\nAucune information mémorisée pertinente n'est disponible. Réponse:`;
+
+    return {
+      prompt,
+      system,
+      sources,
+      topK: results.length,
+      ...(temporalExpression ? { temporalContext: temporalExpression } : {}),
+    };
   }
 }
@@ -218,6 +218,15 @@ export class VectorstoreService {
     });
   }
 
+  async getMemoryPoint(id: string) {
+    const { exists } = await this.client.collectionExists(
+      this.memoryCollection,
+    );
+    if (!exists) return null;
+    const [point] = await this.retrieveMemoryPoints([id]);
+    return point ?? null;
+  }
+
   async updateMemoryPayload(
     pointId: string,
     fields: Partial<MemoryPayload>,
@@ -0,0 +1,190 @@
+"""Priority-aware admission control in front of the inference backend.
+
+Requests belong to a priority class: `interactive` (wake-listener voice
+commands) or `bulk` (UI uploads, long files). At most `slots` requests are
+handed to the executor / worker pool at once; the others wait here and are
+granted slots interactive-first, then in arrival order, so a 3-second
+command never queues behind a long upload.
+
+Each class has a maximum number of waiting requests and a maximum audio
+duration. A client may also send a deadline: the projected completion time
+(work already admitted or waiting ahead of it, spread over the slots,
+using a running real-time-factor estimate) is compared to it and the
+request is turned away immediately when it cannot make it.
+Rejections carry a `Retry-After` hint.
+
+`admit()` yields the request's `Ticket`; the caller attaches the backend job
+to it. A request cancelled while its job runs (client gone) keeps the slot
+until the job ends, so the backend never holds more than `slots` requests,
+and only completed transcriptions feed the real-time-factor estimate.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+import metrics
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+CLASSES = (INTERACTIVE, BULK)  # in priority order
+
+_RTF_ALPHA = 0.2  # weight of the latest observation in the running RTF estimate
+
+
+@dataclass(frozen=True)
+class ClassLimits:
+    max_queue: int  # waiting requests (not yet handed to the backend); 0 = unlimited
+    max_audio_sec: float  # 0 = unlimited
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float | None = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> dict[str, str] | None:
+        if self.retry_after is None:
+            return None
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+@dataclass
+class Ticket:
+    priority: str
+    audio_sec: float
+    enqueued_at: float = field(default_factory=time.monotonic)
+    granted_at: float | None = None
+    backend: Future | None = None
+
+    def attach(self, future: Future) -> None:
+        """Bind the backend job: the slot is held until *future* is done."""
+        self.backend = future
+
+
+class AdmissionController:
+    """Lives on the event loop: not thread-safe, no locking needed."""
+
+    def __init__(self, slots: int, limits: dict[str, ClassLimits], initial_rtf: float = 0.5):
+        self._slots = max(1, slots)
+        self._limits = limits
+        self.rtf = initial_rtf
+        self._seq = itertools.count()
+        self._waiting: list[tuple[int, int, Ticket, asyncio.Future]] = []
+        self._running: list[Ticket] = []
+
+    def check(self, priority: str, audio_sec: float, deadline_sec: float | None = None) -> None:
+        """Raise AdmissionRejected if the request would be refused; cheap, call before reading the body."""
+        limits = self._limits[priority]
+        if limits.max_audio_sec and audio_sec > limits.max_audio_sec:
+            self._reject(priority, "too_long")
+            raise AdmissionRejected(
+                413, f"{audio_sec:.0f}s of audio exceeds the {limits.max_audio_sec:.0f}s limit for {priority} requests"
+            )
+        if limits.max_queue and self.waiting(priority) >= limits.max_queue:
+            self._reject(priority, "queue_full")
+            raise AdmissionRejected(
+                429, f"{priority} queue full ({limits.max_queue} waiting)", self.projected_wait(priority)
+            )
+        if deadline_sec is not None:
+            wait = self.projected_wait(priority)
+            if wait + audio_sec * self.rtf > deadline_sec:
+                self._reject(priority, "deadline")
+                raise AdmissionRejected(
+                    429,
+                    f"projected completion {wait + audio_sec * self.rtf:.1f}s exceeds the {deadline_sec:.1f}s deadline",
+                    wait,
+                )
+
+    @asynccontextmanager
+    async def admit(self, priority: str, audio_sec: float, deadline_sec: float | None = None) -> AsyncIterator[Ticket]:
+        """Check, then hold a backend slot for the duration of the block (and of the attached job)."""
+        self.check(priority, audio_sec, deadline_sec)
+        ticket = Ticket(priority, audio_sec)
+        if len(self._running) < self._slots and not self._waiting:
+            self._grant(ticket)
+        else:
+            granted = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiting, (CLASSES.index(priority), next(self._seq), ticket, granted))
+            try:
+                await granted
+            except asyncio.CancelledError:
+                # Client gone while waiting, or cancelled right after being granted
+                if granted.done() and not granted.cancelled():
+                    self._release(ticket)
+                else:
+                    self._waiting = [w for w in self._waiting if w[2] is not ticket]
+                    heapq.heapify(self._waiting)
+                raise
+        try:
+            yield ticket
+        except BaseException:
+            self._release_when_backend_done(ticket)
+            raise
+        self._release(ticket, completed=True)
+
+    def waiting(self, priority: str | None = None) -> int:
+        return sum(1 for _, _, t, _ in self._waiting if priority is None or t.priority == priority)
+
+    def projected_wait(self, priority: str) -> float:
+        """Seconds before a new *priority* request would start, from the RTF estimate."""
+        now = time.monotonic()
+        rank = CLASSES.index(priority)
+        remaining = sum(max(0.0, t.audio_sec * self.rtf - (now - t.granted_at)) for t in self._running)
+        ahead = sum(t.audio_sec * self.rtf for r, _, t, _ in self._waiting if r <= rank)
+        if len(self._running) < self._slots and not ahead:
+            return 0.0
+        return (remaining + ahead) / self._slots
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._running),
+            "slots": self._slots,
+            "waiting": {c: self.waiting(c) for c in CLASSES},
+            "rtf_estimate": round(self.rtf, 3),
+        }
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted_at = time.monotonic()
+        self._running.append(ticket)
+        metrics.ADMISSION_WAIT_SECONDS.observe(ticket.granted_at - ticket.enqueued_at, priority=ticket.priority)
+
+    def _release_when_backend_done(self, ticket: Ticket) -> None:
+        backend = ticket.backend
+        if backend is None or backend.done():
+            self._release(ticket)
+            return
+        loop = asyncio.get_running_loop()
+        backend.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(
+                self._release, ticket, not f.cancelled() and f.exception() is None
+            )
+        )
+
+    def _release(self, ticket: Ticket, completed: bool = False) -> None:
+        """Free the slot; *completed* (a full transcription ran) updates the RTF estimate."""
+        if ticket not in self._running:
+            return
+        self._running.remove(ticket)
+        elapsed = time.monotonic() - ticket.granted_at
+        if completed and ticket.audio_sec > 0:
+            self.rtf += _RTF_ALPHA * (elapsed / ticket.audio_sec - self.rtf)
+        while self._waiting and len(self._running) < self._slots:
+            _, _, nxt, granted = heapq.heappop(self._waiting)
+            if granted.cancelled():
+                continue
+            self._grant(nxt)
+            granted.set_result(None)
+
+    @staticmethod
+    def _reject(priority: str, reason: str) -> None:
+        metrics.ADMISSION_REJECTED.inc(priority=priority, reason=reason)
@@ -0,0 +1,23 @@
+"""In-memory audio conversion helpers (no temp file, no container decoding)."""
+
+import numpy as np
+
+WHISPER_SAMPLE_RATE = 16000
+
+
+def pcm16_to_float32(data: bytes, sample_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """Convert little-endian int16 mono PCM to the float32 16 kHz array Whisper expects.
+
+    The int16 view over *data* is not copied; the float32 conversion is the
+    only allocation and is scaled in place. Callers validate the input: *data*
+    must hold whole samples (even length) and *sample_rate* must be positive.
+    """
+    audio = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+    audio *= 1.0 / 32768.0
+    if sample_rate != WHISPER_SAMPLE_RATE and len(audio) > 0:
+        duration = len(audio) / sample_rate
+        target_len = int(round(duration * WHISPER_SAMPLE_RATE))
+        src_t = np.linspace(0.0, duration, num=len(audio), endpoint=False)
+        dst_t = np.linspace(0.0, duration, num=target_len, endpoint=False)
+        audio = np.interp(dst_t, src_t, audio).astype(np.float32)
+    return audio
@@ -0,0 +1,216 @@
+"""Startup auto-tuner for compute_type / cpu_threads / num_workers / beam_size.
+
+Each candidate runs in a fresh process (so peak RSS is per-candidate): the
+model is loaded, warmed up once, then the reference clip is transcribed and
+the real-time factor (decode time / audio duration) is recorded. The clip must
+be real speech: on synthetic audio the decoder emits almost no tokens and the
+RTF says nothing about commands. Without it `run_tuning` raises
+FileNotFoundError; the server then starts on its saved profile or env settings.
+
+With a reference transcript next to the clip (`reference_fr.txt`), each
+candidate is scored by WER and the fastest one within `max_wer_delta` of the
+most accurate wins. Without it, accuracy cannot be checked, so beam_size is
+pinned to the largest value requested and only the speed-neutral settings
+compete. The winner is persisted as a JSON profile that later starts load
+directly.
+
+Run standalone with `python autotune.py`, or set `STT_AUTOTUNE=true` to tune
+at server start when no matching profile exists (`force` to always re-tune).
+"""
+
+import json
+import multiprocessing as mp
+import os
+import platform
+import time
+import wave
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+
+import numpy as np
+
+from audio import WHISPER_SAMPLE_RATE, pcm16_to_float32
+from wer import word_errors
+
+DEFAULT_CLIP = Path(__file__).parent / "reference_fr.wav"
+DEFAULT_PROFILE = Path(__file__).parent / "tuning_profile.json"
+DEFAULT_MAX_WER_DELTA = 0.02
+
+
+@dataclass(frozen=True)
+class Candidate:
+    compute_type: str
+    cpu_threads: int
+    num_workers: int
+    beam_size: int
+
+
+def candidates(device: str, beam_sizes: list[int]) -> list[Candidate]:
+    """Build the search grid for *device* ("cpu" or "cuda")."""
+    if device == "cuda":
+        compute_types = ["float16", "int8_float16", "int8"]
+        thread_options = [0]
+    else:
+        compute_types = ["int8", "int8_float32", "float32"]
+        cores = os.cpu_count() or 4
+        thread_options = sorted({max(1, cores // 2), cores})
+    return [
+        Candidate(ct, threads, workers, beam)
+        for ct in compute_types
+        for threads in thread_options
+        for workers in (1, 2)
+        for beam in beam_sizes
+    ]
+
+
+def load_reference_clip(path: Path = DEFAULT_CLIP) -> tuple[np.ndarray, str | None]:
+    """Load the reference speech clip (16-bit mono WAV) and its transcript (same name, .txt) if any."""
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Auto-tuning needs a reference speech clip: record a few seconds of a typical "
+            f"command as 16-bit mono WAV and save it as {path} (or point STT_TUNE_CLIP at one), "
+            f"optionally with its transcript in {path.with_suffix('.txt').name}."
+        )
+    with wave.open(str(path), "rb") as wf:
+        audio = pcm16_to_float32(wf.readframes(wf.getnframes()), wf.getframerate())
+    transcript_path = path.with_suffix(".txt")
+    transcript = transcript_path.read_text(encoding="utf-8").strip() if transcript_path.exists() else None
+    return audio, transcript or None
+
+
+def select_best(results: list[dict], has_reference: bool, max_wer_delta: float) -> dict:
+    """Fastest candidate among those accurate enough (see module docstring)."""
+    valid = [r for r in results if "rtf" in r]
+    if not valid:
+        raise RuntimeError("auto-tuning failed for every candidate")
+    if has_reference:
+        best_wer = min(r["wer"] for r in valid)
+        valid = [r for r in valid if r["wer"] <= best_wer + max_wer_delta]
+    else:
+        beam = max(r["beam_size"] for r in valid)
+        valid = [r for r in valid if r["beam_size"] == beam]
+    return min(valid, key=lambda r: r["rtf"])
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if platform.system() == "Darwin" else rss / 1024
+
+
+def _measure(candidate: Candidate, model_size: str, device: str, language: str, audio: np.ndarray, out) -> None:
+    """Child process: load, warm up, time one transcription, report via *out*."""
+    from faster_whisper import WhisperModel
+
+    try:
+        t0 = time.perf_counter()
+        model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=candidate.compute_type,
+            cpu_threads=candidate.cpu_threads,
+            num_workers=candidate.num_workers,
+        )
+        load_sec = time.perf_counter() - t0
+        kwargs = {"language": language, "beam_size": candidate.beam_size, "vad_filter": False}
+        list(model.transcribe(audio[:WHISPER_SAMPLE_RATE], **kwargs)[0])
+
+        t0 = time.perf_counter()
+        segments = list(model.transcribe(audio, **kwargs)[0])
+        decode_sec = time.perf_counter() - t0
+        out.send({
+            "text": " ".join(s.text.strip() for s in segments),
+            "load_sec": round(load_sec, 3),
+            "decode_sec": round(decode_sec, 3),
+            "rtf": round(decode_sec / (len(audio) / WHISPER_SAMPLE_RATE), 4),
+            "peak_rss_mb": _peak_rss_mb(),
+        })
+    except Exception as e:
+        out.send({"error": repr(e)})
+
+
+def run_tuning(
+    model_size: str,
+    device: str,
+    language: str,
+    beam_sizes: list[int],
+    clip_path: Path = DEFAULT_CLIP,
+    profile_path: Path = DEFAULT_PROFILE,
+    max_wer_delta: float = DEFAULT_MAX_WER_DELTA,
+) -> dict:
+    """Benchmark every candidate, write the profile to *profile_path* and return it."""
+    audio, transcript = load_reference_clip(clip_path)
+    if transcript is None and len(set(beam_sizes)) > 1:
+        print(
+            f"No transcript for {clip_path.name}: accuracy cannot be compared, "
+            f"beam_size pinned to {max(beam_sizes)}."
+        )
+    resolved_device = device if device != "auto" else _detect_device()
+    ctx = mp.get_context("spawn")
+    results = []
+
+    for candidate in candidates(resolved_device, beam_sizes):
+        parent, child = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_measure, args=(candidate, model_size, resolved_device, language, audio, child))
+        proc.start()
+        child.close()
+        try:
+            measurement = parent.recv()
+        except EOFError:
+            measurement = {"error": f"process exited with code {proc.exitcode}"}
+        proc.join()
+        if transcript is not None and "text" in measurement:
+            errors, words = word_errors(transcript, measurement["text"])
+            measurement["wer"] = round(errors / max(words, 1), 4)
+        print(f"  {candidate}: {measurement}")
+        results.append({**asdict(candidate), **measurement})
+
+    best = select_best(results, transcript is not None, max_wer_delta)
+
+    profile = {
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "model": model_size,
+        "device": resolved_device,
+        "clip_sec": round(len(audio) / WHISPER_SAMPLE_RATE, 2),
+        "selection": f"fastest within WER +{max_wer_delta}" if transcript is not None else "fastest, beam pinned",
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "best": {f.name: best[f.name] for f in fields(Candidate)},
+        "results": results,
+    }
+    profile_path.write_text(json.dumps(profile, indent=2))
+    print(f"Tuning profile written to {profile_path}: {profile['best']}")
+    return profile
+
+
+def load_profile(model_size: str, device: str, profile_path: Path = DEFAULT_PROFILE) -> dict | None:
+    """Return the saved profile if it was tuned for this model, device and host."""
+    if not profile_path.exists():
+        return None
+    profile = json.loads(profile_path.read_text())
+    if profile.get("model") != model_size or profile.get("host") != platform.node():
+        return None
+    if device != "auto" and profile.get("device") != device:
+        return None
+    return profile
+
+
+def _detect_device() -> str:
+    import ctranslate2
+
+    return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
+
+if __name__ == "__main__":
+    run_tuning(
+        os.getenv("WHISPER_MODEL", "turbo"),
+        os.getenv("WHISPER_DEVICE", "auto"),
+        os.getenv("WHISPER_LANGUAGE", "fr"),
+        [int(b) for b in os.getenv("STT_TUNE_BEAM_SIZES", "1").split(",")],
+        Path(os.getenv("STT_TUNE_CLIP", DEFAULT_CLIP)),
+        Path(os.getenv("STT_TUNE_PROFILE", DEFAULT_PROFILE)),
+        float(os.getenv("STT_TUNE_MAX_WER_DELTA", str(DEFAULT_MAX_WER_DELTA))),
+    )
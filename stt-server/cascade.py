@@ -0,0 +1,108 @@
+"""Two-tier cascade: a small model transcribes first, the large one only re-does doubtful segments.
+
+A segment is escalated when its `avg_logprob` is below `min_avg_logprob` or
+its `no_speech_prob` is above `max_no_speech_prob`. Only that segment's audio
+(plus a small margin) goes through the large model, so short, stereotyped
+commands never pay the large-model cost.
+"""
+
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from faster_whisper import WhisperModel, decode_audio
+
+import metrics
+from audio import WHISPER_SAMPLE_RATE
+
+_MARGIN_SAMPLES = WHISPER_SAMPLE_RATE // 5  # 200 ms around an escalated segment
+
+
+@dataclass
+class CascadeSegment:
+    start: float
+    end: float
+    text: str
+    tier: str  # "small" or "large"
+    avg_logprob: float
+    no_speech_prob: float
+
+    def to_dict(self) -> dict:
+        return {
+            "start": round(self.start, 3),
+            "end": round(self.end, 3),
+            "text": self.text,
+            "tier": self.tier,
+            "avg_logprob": round(self.avg_logprob, 3),
+            "no_speech_prob": round(self.no_speech_prob, 3),
+        }
+
+
+class CascadeTranscriber:
+    def __init__(
+        self,
+        small: WhisperModel,
+        large: WhisperModel,
+        language: str,
+        beam_size: int = 1,
+        min_avg_logprob: float = -0.5,
+        max_no_speech_prob: float = 0.5,
+    ):
+        self._small = small
+        self._large = large
+        self._language = language
+        self._beam_size = beam_size
+        self._min_avg_logprob = min_avg_logprob
+        self._max_no_speech_prob = max_no_speech_prob
+
+    def transcribe(self, audio: str | np.ndarray) -> list[CascadeSegment]:
+        if isinstance(audio, str):
+            with metrics.STAGE_SECONDS.time(stage="decode"):
+                audio = decode_audio(audio)
+        t0 = time.perf_counter()
+
+        with metrics.STAGE_SECONDS.time(stage="cascade_small"):
+            segments, _ = self._small.transcribe(
+                audio, language=self._language, beam_size=self._beam_size, vad_filter=True
+            )
+            segments = list(segments)
+
+        result: list[CascadeSegment] = []
+        for seg in segments:
+            cs = CascadeSegment(seg.start, seg.end, seg.text.strip(), "small", seg.avg_logprob, seg.no_speech_prob)
+            if self._needs_escalation(cs):
+                with metrics.STAGE_SECONDS.time(stage="cascade_large"):
+                    cs = self._escalate(audio, cs)
+            if cs.text:
+                result.append(cs)
+
+        if len(audio):
+            duration = len(audio) / WHISPER_SAMPLE_RATE
+            metrics.AUDIO_SECONDS.observe(duration)
+            metrics.RTF.observe((time.perf_counter() - t0) / duration)
+        return result
+
+    def _needs_escalation(self, seg: CascadeSegment) -> bool:
+        return seg.avg_logprob < self._min_avg_logprob or seg.no_speech_prob > self._max_no_speech_prob
+
+    def _escalate(self, audio: np.ndarray, seg: CascadeSegment) -> CascadeSegment:
+        lo = max(0, int(seg.start * WHISPER_SAMPLE_RATE) - _MARGIN_SAMPLES)
+        hi = min(len(audio), int(seg.end * WHISPER_SAMPLE_RATE) + _MARGIN_SAMPLES)
+        segments, _ = self._large.transcribe(
+            audio[lo:hi],
+            language=self._language,
+            beam_size=self._beam_size,
+            vad_filter=False,
+            condition_on_previous_text=False,
+        )
+        large = list(segments)
+        if not large:
+            return CascadeSegment(seg.start, seg.end, "", "large", seg.avg_logprob, 1.0)
+        return CascadeSegment(
+            seg.start,
+            seg.end,
+            " ".join(s.text.strip() for s in large),
+            "large",
+            float(np.mean([s.avg_logprob for s in large])),
+            max(s.no_speech_prob for s in large),
+        )
@@ -0,0 +1,192 @@
+"""Dedicated inference thread with a bounded queue and request micro-batching.
+
+Blocking faster-whisper calls never run on the event loop: endpoints submit a
+job and await its future. The worker thread drains the queue, coalescing the
+audio jobs that arrive within `max_wait_sec` (up to `max_batch_size`) into a
+single `BatchedInferencePipeline` call. Every request goes through the same
+per-request VAD and clipping, batched or not, so load never changes a
+transcript.
+"""
+
+import bisect
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
+
+import metrics
+from audio import WHISPER_SAMPLE_RATE
+
+# Same settings BatchedInferencePipeline uses for `vad_filter=True`: speech
+# chunks merged into clips of at most one 30 s Whisper window.
+_VAD_OPTIONS = VadOptions(max_speech_duration_s=30, min_silence_duration_ms=160)
+# Silence inserted between coalesced requests so no window straddles two of them.
+_GAP_SAMPLES = WHISPER_SAMPLE_RATE // 2
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue is at capacity."""
+
+
+@dataclass
+class _Job:
+    future: Future = field(default_factory=Future)
+    audio: str | np.ndarray | None = None
+    call: Callable[[], Any] | None = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class InferenceExecutor:
+    def __init__(
+        self,
+        model: WhisperModel,
+        language: str,
+        max_batch_size: int = 8,
+        max_wait_sec: float = 0.02,
+        max_queue: int = 32,
+        beam_size: int = 1,
+    ):
+        self._pipeline = BatchedInferencePipeline(model=model)
+        self._language = language
+        self._beam_size = beam_size
+        self._max_batch_size = max_batch_size
+        self._max_wait_sec = max_wait_sec
+        self._queue: queue.Queue[_Job | None] = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="stt-inference", daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, audio: str | np.ndarray) -> Future:
+        """Queue a transcription of a file path or float32 16 kHz array; resolves to text."""
+        return self._put(_Job(audio=audio))
+
+    def submit_call(self, call: Callable[[], Any]) -> Future:
+        """Run an arbitrary model call (e.g. a streaming step) on the inference thread."""
+        return self._put(_Job(call=call))
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _put(self, job: _Job) -> Future:
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFullError(f"inference queue full ({self._queue.maxsize} pending)")
+        return job.future
+
+    def _run(self) -> None:
+        pending: _Job | None = None
+        while True:
+            job = pending or self._queue.get()
+            pending = None
+            if job is None:
+                return
+            if job.call is not None:
+                self._resolve([job], lambda: [job.call()])
+                continue
+
+            batch = [job]
+            deadline = time.monotonic() + self._max_wait_sec
+            while len(batch) < self._max_batch_size:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None or nxt.call is not None:
+                    pending = nxt
+                    break
+                batch.append(nxt)
+
+            now = time.monotonic()
+            for queued in batch:
+                metrics.QUEUE_WAIT_SECONDS.observe(now - queued.enqueued_at)
+            metrics.BATCH_SIZE.observe(len(batch))
+            self._resolve(batch, lambda: self._transcribe_batch(batch))
+
+    @staticmethod
+    def _resolve(jobs: list[_Job], fn: Callable[[], list[Any]]) -> None:
+        try:
+            results = fn()
+        except Exception as e:
+            for job in jobs:
+                job.future.set_exception(e)
+            return
+        for job, result in zip(jobs, results):
+            job.future.set_result(result)
+
+    def _transcribe_batch(self, jobs: list[_Job]) -> list[str]:
+        audios = []
+        for job in jobs:
+            if isinstance(job.audio, str):
+                with metrics.STAGE_SECONDS.time(stage="decode"):
+                    audios.append(decode_audio(job.audio))
+            else:
+                audios.append(job.audio)
+        for audio in audios:
+            metrics.AUDIO_SECONDS.observe(len(audio) / WHISPER_SAMPLE_RATE)
+
+        # One decoding path whatever the load: each request is VAD-filtered on its
+        # own, then all requests are laid out on one timeline and their speech
+        # chunks handed to the pipeline as explicit ≤30 s clips. A request alone
+        # is just a timeline of one, so its transcript does not depend on batching.
+        t0 = time.perf_counter()
+        parts: list[np.ndarray] = []
+        clips: list[dict] = []
+        starts: list[float] = []
+        cursor = 0
+        for audio in audios:
+            for chunk in merge_segments(get_speech_timestamps(audio, _VAD_OPTIONS), _VAD_OPTIONS):
+                clips.append({"start": cursor + chunk["start"], "end": cursor + chunk["end"]})
+            starts.append(cursor / WHISPER_SAMPLE_RATE)
+            parts.append(audio)
+            parts.append(np.zeros(_GAP_SAMPLES, dtype=np.float32))
+            cursor += len(audio) + _GAP_SAMPLES
+        vad_sec = time.perf_counter() - t0
+
+        if not clips:
+            metrics.STAGE_SECONDS.observe(vad_sec, stage="vad_filter")
+            return ["" for _ in jobs]
+
+        segments = self._timed_transcribe(
+            np.concatenate(parts),
+            sum(len(a) for a in audios),
+            vad_sec,
+            vad_filter=False,
+            clip_timestamps=clips,
+        )
+
+        # Clips never span two requests, but a segment may start a little past its
+        # request's end (in the gap): clamp it to the last request starting before it.
+        texts: list[list[str]] = [[] for _ in jobs]
+        for seg in segments:
+            texts[max(0, bisect.bisect_right(starts, seg.start) - 1)].append(seg.text.strip())
+        return [" ".join(t) for t in texts]
+
+    def _timed_transcribe(self, audio: np.ndarray, n_speech_samples: int, vad_sec: float, **kwargs) -> list:
+        """Run the pipeline, recording the eager (VAD + features) and generation stages and the RTF."""
+        t0 = time.perf_counter()
+        segments, _ = self._pipeline.transcribe(
+            audio,
+            language=self._language,
+            beam_size=self._beam_size,
+            batch_size=self._max_batch_size,
+            **kwargs,
+        )
+        t1 = time.perf_counter()
+        segments = list(segments)
+        t2 = time.perf_counter()
+        metrics.STAGE_SECONDS.observe(vad_sec + t1 - t0, stage="vad_filter")
+        metrics.STAGE_SECONDS.observe(t2 - t1, stage="generation")
+        if n_speech_samples:
+            metrics.RTF.observe((vad_sec + t2 - t0) / (n_speech_samples / WHISPER_SAMPLE_RATE))
+        return segments
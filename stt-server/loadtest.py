@@ -0,0 +1,374 @@
+"""Load and accuracy benchmark for the STT server.
+
+Starts `stt_server.py` locally once per configuration (model size and
+compute type, e.g. `turbo:int8 small:int8_float32`), then drives
+`POST /transcribe` with a corpus of voice-command clips at each load level:
+
+- closed loop (`--concurrency 1,4,8`): N clients each send their next clip as
+  soon as the previous answer arrives – measures the throughput ceiling;
+- open loop (`--rate 0.5,2`): Poisson arrivals at R requests/sec regardless
+  of completions – measures latency at a given traffic level.
+
+Requests are sent as `X-STT-Priority: interactive` by default (the wake
+listener's class); `--priority bulk` measures the bulk class and its smaller
+queue instead.
+
+Each level reports throughput, latency p50/p95/p99, real-time factor
+(latency / clip duration), admission rejections (429/413, see admission.py)
+apart from errors (5xx = queue full or failure, transport errors) and the
+peak RSS of the server process tree; each configuration reports WER against the
+reference transcripts. The server runs with HF_HUB_OFFLINE=1, so models must
+already be in the local cache (`--allow-download` lifts this).
+
+The corpus is a TSV file of `clip.wav<TAB>reference transcript` lines, clip
+paths relative to the TSV (16-bit WAV, any sample rate).
+
+    python loadtest.py corpus/commands.tsv --config turbo:int8 --config small:int8 \
+        --concurrency 1,4 --rate 1 --out loadtest.json
+    python loadtest.py corpus/commands.tsv --url http://localhost:8300   # already running
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from wer import word_errors
+
+SERVER_SCRIPT = Path(__file__).parent / "stt_server.py"
+STARTUP_TIMEOUT_SEC = 900  # first load of a large model from disk can be slow
+RSS_SAMPLE_SEC = 0.2
+PRIORITY_HEADER = "X-STT-Priority"
+REJECTED_STATUSES = (413, 429)  # admission control, not failures
+
+
+@dataclass(frozen=True)
+class Clip:
+    path: Path
+    reference: str
+    duration_sec: float
+    data: bytes
+
+
+def load_corpus(tsv: Path) -> list[Clip]:
+    clips = []
+    for line in tsv.read_text(encoding="utf-8").splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        name, _, reference = line.partition("\t")
+        path = tsv.parent / name
+        with wave.open(str(path), "rb") as wf:
+            duration = wf.getnframes() / wf.getframerate()
+        clips.append(Clip(path, reference.strip(), duration, path.read_bytes()))
+    if not clips:
+        raise ValueError(f"{tsv}: empty corpus")
+    return clips
+
+
+# ----------------------------------------------------------------------
+# Server process
+# ----------------------------------------------------------------------
+
+
+class LocalServer:
+    """`stt_server.py` in a subprocess, with peak RSS sampled over its process tree."""
+
+    def __init__(self, model: str, compute_type: str, port: int, extra_env: dict[str, str], allow_download: bool):
+        env = {
+            **os.environ,
+            **extra_env,
+            "WHISPER_MODEL": model,
+            "WHISPER_COMPUTE_TYPE": compute_type,
+            "STT_PORT": str(port),
+            "STT_AUTOTUNE": "false",  # benchmark exactly the requested configuration
+        }
+        if not allow_download:
+            env["HF_HUB_OFFLINE"] = "1"
+        self.url = f"http://127.0.0.1:{port}"
+        self._proc = subprocess.Popen(
+            [sys.executable, str(SERVER_SCRIPT)],
+            cwd=SERVER_SCRIPT.parent,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.STDOUT,
+        )
+        self.peak_rss_mb: float | None = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+        self._sampler.start()
+
+    def wait_ready(self) -> float:
+        """Block until /health answers; returns the startup time in seconds."""
+        t0 = time.perf_counter()
+        while time.perf_counter() - t0 < STARTUP_TIMEOUT_SEC:
+            if self._proc.poll() is not None:
+                raise RuntimeError(f"server exited with code {self._proc.returncode}")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - t0
+            except httpx.TransportError:
+                pass
+            time.sleep(0.5)
+        raise TimeoutError(f"server not ready after {STARTUP_TIMEOUT_SEC}s")
+
+    def reset_peak(self) -> None:
+        self.peak_rss_mb = None
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._proc.terminate()
+        try:
+            self._proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+
+    def _sample_rss(self) -> None:
+        while not self._stop.wait(RSS_SAMPLE_SEC):
+            rss = _tree_rss_mb(self._proc.pid)
+            if rss is not None and (self.peak_rss_mb is None or rss > self.peak_rss_mb):
+                self.peak_rss_mb = rss
+
+
+def _tree_rss_mb(root_pid: int) -> float | None:
+    """Current RSS of *root_pid* and its descendants (worker pool), Linux only."""
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+    parents: dict[int, int] = {}
+    for stat in proc.glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+            parents[int(stat.parent.name)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        children = [p for p, ppid in parents.items() if ppid == pid and p not in tree]
+        tree.update(children)
+        frontier.extend(children)
+    total_kb = 0
+    for pid in tree:
+        try:
+            for line in (proc / str(pid) / "status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return round(total_kb / 1024, 1)
+
+
+# ----------------------------------------------------------------------
+# Load generation
+# ----------------------------------------------------------------------
+
+
+async def _send(client: httpx.AsyncClient, clip: Clip, results: list[dict]) -> None:
+    t0 = time.perf_counter()
+    try:
+        resp = await client.post("/transcribe", files={"audio": (clip.path.name, clip.data, "audio/wav")})
+        status = resp.status_code
+        text = resp.json().get("text", "") if status == 200 else ""
+    except httpx.HTTPError as e:
+        status, text = type(e).__name__, ""
+    results.append({
+        "clip": clip.path.name,
+        "status": status,
+        "latency_sec": time.perf_counter() - t0,
+        "duration_sec": clip.duration_sec,
+        "text": text,
+    })
+
+
+async def _closed_loop(url: str, clips: list[Clip], concurrency: int, requests: int, priority: str) -> list[dict]:
+    results: list[dict] = []
+    order = iter(range(requests))
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        for i in order:
+            await _send(client, clips[i % len(clips)], results)
+
+    headers = {PRIORITY_HEADER: priority}
+    async with httpx.AsyncClient(base_url=url, timeout=300, headers=headers) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+    return results
+
+
+async def _open_loop(
+    url: str, clips: list[Clip], rate: float, requests: int, seed: int, priority: str
+) -> list[dict]:
+    results: list[dict] = []
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    headers = {PRIORITY_HEADER: priority}
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limits, headers=headers) as client:
+        tasks = []
+        for i in range(requests):
+            tasks.append(asyncio.create_task(_send(client, clips[i % len(clips)], results)))
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+    return results
+
+
+def _percentile(values: list[float], q: float) -> float | None:
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+def summarize(results: list[dict], wall_sec: float, peak_rss_mb: float | None) -> dict:
+    ok = [r for r in results if r["status"] == 200]
+    rejected = [r for r in results if r["status"] in REJECTED_STATUSES]
+    latencies = [r["latency_sec"] for r in ok]
+    rtfs = [r["latency_sec"] / r["duration_sec"] for r in ok if r["duration_sec"] > 0]
+    return {
+        "requests": len(results),
+        "rejected": len(rejected),
+        "errors": len(results) - len(ok) - len(rejected),
+        "error_statuses": sorted({
+            str(r["status"]) for r in results if r["status"] != 200 and r["status"] not in REJECTED_STATUSES
+        }),
+        "wall_sec": round(wall_sec, 2),
+        "throughput_rps": round(len(ok) / wall_sec, 3) if wall_sec else 0.0,
+        "audio_sec_per_sec": round(sum(r["duration_sec"] for r in ok) / wall_sec, 2) if wall_sec else 0.0,
+        "latency_sec": {q: _percentile(latencies, int(q[1:])) for q in ("p50", "p95", "p99")},
+        "rtf": {"p50": _percentile(rtfs, 50), "p95": _percentile(rtfs, 95)},
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def wer(clips: list[Clip], results: list[dict]) -> dict:
+    """Corpus WER over the first successful transcript of each clip."""
+    references = {c.path.name: c.reference for c in clips}
+    seen: dict[str, str] = {}
+    for r in results:
+        if r["status"] == 200:
+            seen.setdefault(r["clip"], r["text"])
+    errors = words = 0
+    for name, text in seen.items():
+        e, n = word_errors(references[name], text)
+        errors, words = errors + e, words + n
+    return {"wer": round(errors / words, 4) if words else None, "clips_scored": len(seen)}
+
+
+def run_levels(url: str, clips: list[Clip], args, server: LocalServer | None) -> list[dict]:
+    levels = [("concurrency", c) for c in args.concurrency] + [("rate", r) for r in args.rate]
+    runs = []
+    for kind, value in levels:
+        if server:
+            server.reset_peak()
+        t0 = time.perf_counter()
+        if kind == "concurrency":
+            results = asyncio.run(_closed_loop(url, clips, int(value), args.requests, args.priority))
+        else:
+            results = asyncio.run(_open_loop(url, clips, value, args.requests, args.seed, args.priority))
+        summary = {kind: value, **summarize(results, time.perf_counter() - t0, server and server.peak_rss_mb)}
+        summary["results"] = results
+        print(
+            f"  {kind}={value}: {summary['throughput_rps']} req/s, "
+            f"p50={summary['latency_sec']['p50']}s p95={summary['latency_sec']['p95']}s "
+            f"p99={summary['latency_sec']['p99']}s, RTF p50={summary['rtf']['p50']}, "
+            f"rejected={summary['rejected']}, errors={summary['errors']}, peak RSS={summary['peak_rss_mb']} MB"
+        )
+        runs.append(summary)
+    return runs
+
+
+def benchmark_config(label: str, url: str, clips: list[Clip], args, server: LocalServer | None) -> dict:
+    # Warm-up: first request pays for lazy initialisation, keep it out of the numbers
+    asyncio.run(_closed_loop(url, clips, 1, 1, args.priority))
+    runs = run_levels(url, clips, args, server)
+    accuracy = wer(clips, [r for run in runs for r in run["results"]])
+    print(f"  WER={accuracy['wer']} over {accuracy['clips_scored']} clips")
+    if not args.keep_results:
+        for run in runs:
+            del run["results"]
+    return {"config": label, **accuracy, "levels": runs}
+
+
+def print_table(configs: list[dict]) -> None:
+    print(f"\n{'config':24} {'level':16} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'RTF':>6} {'rej':>4} {'err':>4} {'RSS MB':>8} {'WER':>6}")
+    for cfg in configs:
+        for run in cfg["levels"]:
+            level = f"c={run['concurrency']}" if "concurrency" in run else f"rate={run['rate']}/s"
+            lat = run["latency_sec"]
+            print(f"{cfg['config']:24} {level:16} {run['throughput_rps']:>7} {lat['p50'] or '-':>7} "
+                  f"{lat['p95'] or '-':>7} {lat['p99'] or '-':>7} {run['rtf']['p50'] or '-':>6} "
+                  f"{run['rejected']:>4} {run['errors']:>4} {run['peak_rss_mb'] or '-':>8} {cfg['wer'] if cfg['wer'] is not None else '-':>6}")
+
+
+def _number_list(cast):
+    return lambda s: [cast(v) for v in s.split(",") if v]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load and WER benchmark for stt_server /transcribe.")
+    parser.add_argument("corpus", type=Path, help="TSV of clip.wav<TAB>reference")
+    parser.add_argument("--config", action="append", default=[],
+                        help="model[:compute_type] to start locally, repeatable (default: env settings)")
+    parser.add_argument("--url", help="benchmark an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8399)
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the server, repeatable")
+    parser.add_argument("--concurrency", type=_number_list(int), default=[1, 4], help="closed-loop levels")
+    parser.add_argument("--rate", type=_number_list(float), default=[], help="open-loop levels (req/s)")
+    parser.add_argument("--requests", type=int, default=50, help="requests per level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--priority", choices=("interactive", "bulk"), default="interactive",
+                        help=f"{PRIORITY_HEADER} sent with every request")
+    parser.add_argument("--allow-download", action="store_true", help="do not force HF_HUB_OFFLINE=1")
+    parser.add_argument("--keep-results", action="store_true", help="include per-request results in --out")
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    args = parser.parse_args()
+
+    clips = load_corpus(args.corpus)
+    print(f"Corpus: {len(clips)} clips, {sum(c.duration_sec for c in clips):.1f}s of audio")
+    extra_env = dict(kv.split("=", 1) for kv in args.env)
+    configs = []
+
+    if args.url:
+        print(f"Benchmarking {args.url} …")
+        configs.append(benchmark_config(args.url, args.url.rstrip("/"), clips, args, None))
+    default_spec = f"{os.getenv('WHISPER_MODEL', 'turbo')}:{os.getenv('WHISPER_COMPUTE_TYPE', 'auto')}"
+    for spec in args.config or ([] if args.url else [default_spec]):
+        model, _, compute_type = spec.partition(":")
+        compute_type = compute_type or "auto"
+        print(f"Starting server: model={model}, compute_type={compute_type} …")
+        server = LocalServer(model, compute_type, args.port, extra_env, args.allow_download)
+        try:
+            startup_sec = server.wait_ready()
+            print(f"  ready in {startup_sec:.1f}s")
+            result = benchmark_config(spec, server.url, clips, args, server)
+            configs.append({**result, "startup_sec": round(startup_sec, 1)})
+        except Exception as e:
+            print(f"  {spec} failed: {e!r}")
+            configs.append({"config": spec, "error": repr(e), "levels": []})
+        finally:
+            server.stop()
+
+    print_table([c for c in configs if "error" not in c])
+    if args.out:
+        report = {
+            "host": os.uname().nodename if hasattr(os, "uname") else None,
+            "cpu_count": os.cpu_count(),
+            "corpus": str(args.corpus),
+            "clips": len(clips),
+            "run_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "configs": configs,
+        }
+        args.out.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Minimal thread-safe metrics registry rendered in Prometheus text format.
+
+Kept dependency-free: counters, gauges (optionally computed at scrape time)
+and cumulative histograms, enough for `/metrics` without prometheus_client.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DURATION_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+RTF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+_lock = threading.Lock()
+
+
+def _fmt_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with _lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_fmt_labels(key)} {value}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float] | None = None):
+        super().__init__(name, help_text)
+        self._value = 0.0
+        self._fn = fn
+
+    def set(self, value: float) -> None:
+        with _lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with _lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def samples(self) -> Iterator[str]:
+        value = self._fn() if self._fn else self._value
+        yield f"{self.name} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self._buckets = buckets
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            series = self._series.setdefault(key, [0] * len(self._buckets) + [0.0, 0])
+            for i, bound in enumerate(self._buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self) -> Iterator[str]:
+        with _lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            for bound, count in zip(self._buckets, series):
+                yield f"{self.name}_bucket{_fmt_labels(key + (('le', str(bound)),))} {count}"
+            yield f"{self.name}_bucket{_fmt_labels(key + (('le', '+Inf'),))} {series[-1]}"
+            yield f"{self.name}_sum{_fmt_labels(key)} {series[-2]}"
+            yield f"{self.name}_count{_fmt_labels(key)} {series[-1]}"
+
+
+_registry: list[_Metric] = []
+
+
+def _register(metric: _Metric) -> _Metric:
+    _registry.append(metric)
+    return metric
+
+
+def gauge_fn(name: str, help_text: str, fn: Callable[[], float]) -> Gauge:
+    """Register a gauge whose value is computed when /metrics is scraped."""
+    return _register(Gauge(name, help_text, fn))
+
+
+def render() -> str:
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+REQUESTS = _register(Counter("stt_requests_total", "HTTP requests by path and status code."))
+REQUEST_SECONDS = _register(Histogram("stt_request_seconds", "End-to-end HTTP request latency by path."))
+IN_FLIGHT = _register(Gauge("stt_in_flight_requests", "HTTP requests currently being served."))
+STAGE_SECONDS = _register(Histogram(
+    "stt_stage_seconds",
+    "Time per /transcribe pipeline stage: upload_read, decode, vad_filter "
+    "(VAD + feature extraction), generation (segment decoding), cascade_small, cascade_large.",
+))
+QUEUE_WAIT_SECONDS = _register(Histogram("stt_queue_wait_seconds", "Time a request waited before inference started."))
+BATCH_SIZE = _register(Histogram("stt_batch_size", "Requests coalesced per inference batch.", COUNT_BUCKETS))
+AUDIO_SECONDS = _register(Histogram("stt_audio_duration_seconds", "Duration of transcribed audio.", DURATION_BUCKETS))
+RTF = _register(Histogram("stt_real_time_factor", "Inference time divided by audio duration.", RTF_BUCKETS))
+MODEL_LOAD_SECONDS = _register(Gauge("stt_model_load_seconds", "Time taken to load the model(s) at startup."))
+ADMISSION_WAIT_SECONDS = _register(Histogram(
+    "stt_admission_wait_seconds", "Time a request waited for a backend slot, by priority class."
+))
+ADMISSION_REJECTED = _register(Counter(
+    "stt_admission_rejected_total", "Requests turned away by admission control, by priority and reason."
+))
@@ -0,0 +1,95 @@
+"""Incremental transcription of a live PCM stream.
+
+Audio is accumulated in a float32 buffer and re-decoded every `step_sec` of
+new audio. Segments that end far enough from the buffer tail are considered
+stable: they are emitted as final and trimmed from the buffer, so each decode
+only covers the still-open part of the utterance.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+from audio import WHISPER_SAMPLE_RATE
+
+
+@dataclass
+class Segment:
+    start: float
+    end: float
+    text: str
+
+    def to_dict(self) -> dict:
+        return {"start": round(self.start, 3), "end": round(self.end, 3), "text": self.text}
+
+
+@dataclass
+class StreamingTranscriber:
+    model: WhisperModel
+    language: str
+    step_sec: float = 1.0
+    stable_margin_sec: float = 1.5
+    beam_size: int = 1
+    buffer: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.float32))
+    offset_sec: float = 0.0  # absolute time of buffer[0]
+    committed: list[Segment] = field(default_factory=list)
+    _pending_samples: int = 0
+
+    def feed(self, audio: np.ndarray) -> bool:
+        """Append audio; return True when enough new audio arrived to re-decode."""
+        self.buffer = np.concatenate((self.buffer, audio))
+        self._pending_samples += len(audio)
+        return self._pending_samples >= self.step_sec * WHISPER_SAMPLE_RATE
+
+    def step(self) -> tuple[list[Segment], str]:
+        """Decode the open buffer. Return (newly final segments, current partial text)."""
+        self._pending_samples = 0
+        segments = self._decode()
+        horizon = self.offset_sec + len(self.buffer) / WHISPER_SAMPLE_RATE - self.stable_margin_sec
+
+        finals: list[Segment] = []
+        # The last segment is never committed mid-stream: Whisper often rewrites it.
+        for seg in segments[:-1]:
+            if seg.end > horizon:
+                break
+            finals.append(seg)
+
+        if finals:
+            self._commit(finals, trim_to=finals[-1].end - self.offset_sec)
+
+        partial = " ".join(s.text for s in segments[len(finals):])
+        return finals, partial
+
+    def finish(self) -> list[Segment]:
+        """Decode whatever is left in the buffer and commit all of it."""
+        finals = self._decode() if len(self.buffer) else []
+        self._commit(finals, trim_to=len(self.buffer) / WHISPER_SAMPLE_RATE)
+        return finals
+
+    @property
+    def text(self) -> str:
+        return " ".join(s.text for s in self.committed)
+
+    def _decode(self) -> list[Segment]:
+        prompt = self.text[-200:] or None
+        segments, _ = self.model.transcribe(
+            self.buffer,
+            language=self.language,
+            beam_size=self.beam_size,
+            vad_filter=True,
+            condition_on_previous_text=False,
+            initial_prompt=prompt,
+        )
+        return [
+            Segment(self.offset_sec + s.start, self.offset_sec + s.end, s.text.strip())
+            for s in segments
+            if s.text.strip()
+        ]
+
+    def _commit(self, finals: list[Segment], trim_to: float) -> None:
+        """Record *finals* and drop the first *trim_to* seconds of the buffer."""
+        self.committed.extend(finals)
+        cut = min(len(self.buffer), int(trim_to * WHISPER_SAMPLE_RATE))
+        self.buffer = self.buffer[cut:]
+        self.offset_sec += cut / WHISPER_SAMPLE_RATE
@@ -3,49 +3,404 @@
 Keeps the model loaded in memory so subsequent requests are fast.
 """
 
+import asyncio
+import io
 import os
-import tempfile
+import time
+from concurrent.futures import Future
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 import uvicorn
-from fastapi import FastAPI, File, UploadFile
-from faster_whisper import WhisperModel
+import numpy as np
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from faster_whisper import WhisperModel, decode_audio
+
+import admission
+import autotune
+import metrics
+from audio import WHISPER_SAMPLE_RATE, pcm16_to_float32
+from cascade import CascadeTranscriber
+from inference import InferenceExecutor, QueueFullError
+from streaming import StreamingTranscriber
+from worker_pool import RemoteModel, WorkerCrashedError, WorkerPool
 
 MODEL_SIZE = os.getenv("WHISPER_MODEL", "turbo")
 DEVICE = os.getenv("WHISPER_DEVICE", "auto")  # "auto", "cpu", or "cuda"
 COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "auto")
 LANGUAGE = os.getenv("WHISPER_LANGUAGE", "fr")
 PORT = int(os.getenv("STT_PORT", "8300"))
+STREAM_STEP_SEC = float(os.getenv("STT_STREAM_STEP_SEC", "1.0"))
+STREAM_STABLE_MARGIN_SEC = float(os.getenv("STT_STREAM_STABLE_MARGIN_SEC", "1.5"))
+BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("STT_BATCH_MAX_WAIT_MS", "20"))
+QUEUE_SIZE = int(os.getenv("STT_QUEUE_SIZE", "32"))
+WORKERS = int(os.getenv("STT_WORKERS", "1"))
+WORKER_READY_TIMEOUT_SEC = float(os.getenv("STT_WORKER_READY_TIMEOUT_SEC", "600"))
+CPU_THREADS = int(os.getenv("STT_CPU_THREADS", "0"))  # 0 = CTranslate2 default
+NUM_WORKERS = int(os.getenv("WHISPER_NUM_WORKERS", "1"))
+BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "1"))
+AUTOTUNE = os.getenv("STT_AUTOTUNE", "false").lower()  # "true", "force" or "false"
+TUNE_PROFILE = Path(os.getenv("STT_TUNE_PROFILE", autotune.DEFAULT_PROFILE))
+TUNE_CLIP = Path(os.getenv("STT_TUNE_CLIP", autotune.DEFAULT_CLIP))
+TUNE_BEAM_SIZES = [int(b) for b in os.getenv("STT_TUNE_BEAM_SIZES", "1").split(",")]
+TUNE_MAX_WER_DELTA = float(os.getenv("STT_TUNE_MAX_WER_DELTA", str(autotune.DEFAULT_MAX_WER_DELTA)))
+CASCADE_MODEL = os.getenv("STT_CASCADE_MODEL", "")  # e.g. "base"; empty = cascade off
+CASCADE_MIN_AVG_LOGPROB = float(os.getenv("STT_CASCADE_MIN_AVG_LOGPROB", "-0.5"))
+CASCADE_MAX_NO_SPEECH_PROB = float(os.getenv("STT_CASCADE_MAX_NO_SPEECH_PROB", "0.5"))
+INTERACTIVE_MAX_QUEUE = int(os.getenv("STT_INTERACTIVE_MAX_QUEUE", "16"))
+INTERACTIVE_MAX_AUDIO_SEC = float(os.getenv("STT_INTERACTIVE_MAX_AUDIO_SEC", "30"))
+BULK_MAX_QUEUE = int(os.getenv("STT_BULK_MAX_QUEUE", "8"))
+BULK_MAX_AUDIO_SEC = float(os.getenv("STT_BULK_MAX_AUDIO_SEC", "1800"))
+
+TRACE_HEADER = "X-Trace-Id"  # set by the wake listener, joins its traces with our timings
+PRIORITY_HEADER = "X-STT-Priority"  # "interactive" or "bulk"; defaults depend on the route
+DEADLINE_HEADER = "X-STT-Deadline-Ms"  # reject up front (429) if the result cannot be ready in time
+PCM_CONTENT_TYPE = "application/octet-stream"
+
+model: WhisperModel | RemoteModel | None = None
+executor: InferenceExecutor | None = None
+pool: WorkerPool | None = None
+cascade: CascadeTranscriber | None = None
+admission_ctl: admission.AdmissionController | None = None
+tuning_profile: dict | None = None
+settings: dict = {}
 
-model: WhisperModel | None = None
+
+def _resolve_settings() -> dict:
+    """Env settings, overridden by the saved (or freshly tuned) profile when there is one."""
+    global tuning_profile
+    tuning_profile = None if AUTOTUNE == "force" else autotune.load_profile(MODEL_SIZE, DEVICE, TUNE_PROFILE)
+    if tuning_profile is None and AUTOTUNE in ("true", "force"):
+        print("Auto-tuning faster-whisper settings …")
+        try:
+            tuning_profile = autotune.run_tuning(
+                MODEL_SIZE, DEVICE, LANGUAGE, TUNE_BEAM_SIZES, TUNE_CLIP, TUNE_PROFILE, TUNE_MAX_WER_DELTA
+            )
+        except FileNotFoundError as e:
+            # Tuning is an optimisation: keep the last profile for this host, else the env settings
+            tuning_profile = autotune.load_profile(MODEL_SIZE, DEVICE, TUNE_PROFILE)
+            fallback = "the saved profile" if tuning_profile else "environment settings"
+            print(f"WARNING: auto-tuning skipped, using {fallback}. {e}")
+
+    resolved = {
+        "device": DEVICE,
+        "compute_type": COMPUTE_TYPE,
+        "cpu_threads": CPU_THREADS,
+        "num_workers": NUM_WORKERS,
+        "beam_size": BEAM_SIZE,
+    }
+    if tuning_profile:
+        resolved.update(tuning_profile["best"], device=tuning_profile["device"])
+        print(f"Using tuned profile from {TUNE_PROFILE}: {tuning_profile['best']}")
+    return resolved
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global model
-    print(f"Loading faster-whisper model '{MODEL_SIZE}' (device={DEVICE}, compute={COMPUTE_TYPE}) …")
-    model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE)
-    print("Model loaded – ready to transcribe.")
+    global model, executor, pool, cascade, settings, admission_ctl
+    settings = await run_in_threadpool(_resolve_settings)
+    device, compute_type = settings["device"], settings["compute_type"]
+    load_started = time.perf_counter()
+    if WORKERS > 1:
+        print(f"Starting {WORKERS} faster-whisper workers '{MODEL_SIZE}' (device={device}, compute={compute_type}) …")
+        pool = WorkerPool(
+            WORKERS,
+            MODEL_SIZE,
+            device,
+            compute_type,
+            LANGUAGE,
+            cpu_threads=settings["cpu_threads"],
+            num_workers=settings["num_workers"],
+            beam_size=settings["beam_size"],
+            max_in_flight=QUEUE_SIZE,
+        )
+        try:
+            await run_in_threadpool(pool.wait_ready, WORKER_READY_TIMEOUT_SEC)
+        except RuntimeError:
+            pool.shutdown()
+            pool = None
+            raise
+        model = pool.remote_model()
+        print(f"Worker pool ready ({pool.threads_per_worker} threads per worker).")
+        if CASCADE_MODEL:
+            print("STT_CASCADE_MODEL is ignored when STT_WORKERS > 1.")
+    else:
+        print(f"Loading faster-whisper model '{MODEL_SIZE}' (device={device}, compute={compute_type}) …")
+        model = WhisperModel(
+            MODEL_SIZE,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=settings["cpu_threads"],
+            num_workers=settings["num_workers"],
+        )
+        executor = InferenceExecutor(
+            model,
+            LANGUAGE,
+            max_batch_size=BATCH_SIZE,
+            max_wait_sec=BATCH_MAX_WAIT_MS / 1000,
+            max_queue=QUEUE_SIZE,
+            beam_size=settings["beam_size"],
+        )
+        if CASCADE_MODEL:
+            print(f"Loading cascade first-tier model '{CASCADE_MODEL}' …")
+            small = WhisperModel(
+                CASCADE_MODEL,
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=settings["cpu_threads"],
+                num_workers=settings["num_workers"],
+            )
+            cascade = CascadeTranscriber(
+                small,
+                model,
+                LANGUAGE,
+                beam_size=settings["beam_size"],
+                min_avg_logprob=CASCADE_MIN_AVG_LOGPROB,
+                max_no_speech_prob=CASCADE_MAX_NO_SPEECH_PROB,
+            )
+        print("Model loaded – ready to transcribe.")
+    metrics.MODEL_LOAD_SECONDS.set(time.perf_counter() - load_started)
+    # Requests handed to the backend at once: one per worker, one batch, or one cascade call at a time
+    slots = WORKERS if pool else 1 if cascade else BATCH_SIZE
+    tuned_rtf = [r["rtf"] for r in (tuning_profile or {}).get("results", []) if "rtf" in r]
+    admission_ctl = admission.AdmissionController(
+        slots,
+        {
+            admission.INTERACTIVE: admission.ClassLimits(INTERACTIVE_MAX_QUEUE, INTERACTIVE_MAX_AUDIO_SEC),
+            admission.BULK: admission.ClassLimits(BULK_MAX_QUEUE, BULK_MAX_AUDIO_SEC),
+        },
+        initial_rtf=min(tuned_rtf, default=0.5),
+    )
     yield
-    model = None
+    if pool:
+        pool.shutdown()
+    if executor:
+        executor.shutdown()
+    executor = pool = model = cascade = admission_ctl = None
 
 
 app = FastAPI(lifespan=lifespan)
 
+metrics.gauge_fn(
+    "stt_queue_depth",
+    "Requests queued or running on the inference thread / worker pool.",
+    lambda: (pool or executor).queue_depth if (pool or executor) else 0,
+)
 
-@app.post("/transcribe")
-async def transcribe(audio: UploadFile = File(...)):
-    suffix = os.path.splitext(audio.filename or ".webm")[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(await audio.read())
-        tmp_path = tmp.name
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    path = request.url.path
+    metrics.IN_FLIGHT.inc()
+    t0 = time.perf_counter()
+    status = 500
     try:
-        segments, _ = model.transcribe(tmp_path, language=LANGUAGE, beam_size=1, vad_filter=True)
-        text = " ".join(seg.text.strip() for seg in segments)
-        return {"text": text}
+        response = await call_next(request)
+        status = response.status_code
+        if TRACE_HEADER in request.headers:
+            response.headers[TRACE_HEADER] = request.headers[TRACE_HEADER]
+        return response
     finally:
-        os.unlink(tmp_path)
+        elapsed = time.perf_counter() - t0
+        metrics.IN_FLIGHT.dec()
+        metrics.REQUEST_SECONDS.observe(elapsed, path=path)
+        metrics.REQUESTS.inc(path=path, status=str(status))
+        trace_id = request.headers.get(TRACE_HEADER)
+        if trace_id:
+            print(f"[trace {trace_id}] {request.method} {path} {status} {elapsed * 1000:.0f}ms")
+
+
+def _admission_params(request: Request, default_priority: str) -> tuple[str, float | None]:
+    priority = request.headers.get(PRIORITY_HEADER, default_priority).lower()
+    if priority not in admission.CLASSES:
+        raise HTTPException(status_code=400, detail=f"{PRIORITY_HEADER} must be one of {', '.join(admission.CLASSES)}")
+    deadline_ms = request.headers.get(DEADLINE_HEADER)
+    try:
+        deadline = float(deadline_ms) / 1000 if deadline_ms else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{DEADLINE_HEADER} must be a number of milliseconds") from None
+    return priority, deadline
+
+
+def _admission_check(priority: str, audio_sec: float, deadline: float | None) -> None:
+    try:
+        admission_ctl.check(priority, audio_sec, deadline)
+    except admission.AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers) from e
+
+
+async def _admit_and_transcribe(audio: np.ndarray, priority: str, deadline: float | None) -> dict:
+    """Wait for a backend slot (interactive requests first), then transcribe."""
+    try:
+        async with admission_ctl.admit(priority, len(audio) / WHISPER_SAMPLE_RATE, deadline) as ticket:
+            return await _transcribe(audio, ticket)
+    except admission.AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers) from e
+
+
+async def _await_backend(future: Future, ticket: admission.Ticket):
+    """Await a backend job without cancelling it: a cancelled request keeps its slot until the job ends."""
+    ticket.attach(future)
+    return await asyncio.shield(asyncio.wrap_future(future))
+
+
+async def _transcribe(audio: str | np.ndarray, ticket: admission.Ticket) -> dict:
+    """Queue a file path or float32 16 kHz array on the inference thread or worker pool.
+
+    In cascade mode the response also lists each segment with the tier that produced it.
+    """
+    try:
+        if cascade:
+            segments = await _await_backend(executor.submit_call(lambda: cascade.transcribe(audio)), ticket)
+            return {
+                "text": " ".join(seg.text for seg in segments),
+                "segments": [seg.to_dict() for seg in segments],
+            }
+        return {"text": await _await_backend((pool or executor).submit(audio), ticket)}
+    except (QueueFullError, WorkerCrashedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"}) from e
+
+
+async def _run_model_call(call, ticket: admission.Ticket):
+    """Run a blocking model call: on the inference thread, or in a thread that waits on the pool.
+
+    A worker thread cannot be abandoned, so the pool path holds the slot until the call returns.
+    """
+    if pool:
+        return await run_in_threadpool(call)
+    return await _await_backend(executor.submit_call(call), ticket)
+
+
+async def _admit_stream_call(call, session: StreamingTranscriber):
+    """Run one streamed decode under an interactive admission slot sized to the open buffer."""
+    async with admission_ctl.admit(admission.INTERACTIVE, len(session.buffer) / WHISPER_SAMPLE_RATE) as ticket:
+        return await _run_model_call(call, ticket)
+
+
+@app.get("/health")
+async def health():
+    backend = pool or executor
+    return {
+        "status": "ok",
+        "queue": backend.queue_depth if backend else 0,
+        "workers": WORKERS,
+        "admission": admission_ctl.stats() if admission_ctl else None,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/tuning")
+async def tuning():
+    """Settings in use and, when available, the full auto-tuning results for this host."""
+    return {"settings": settings, "profile": tuning_profile}
+
+
+@app.post("/transcribe")
+async def transcribe(request: Request, audio: UploadFile = File(...)):
+    """Transcribe an uploaded file (any format ffmpeg reads). Bulk priority unless the header says otherwise.
+
+    The file is decoded here, straight from the upload (no temp file copy),
+    rather than on the inference thread so its duration is known before
+    admission.
+    """
+    priority, deadline = _admission_params(request, admission.BULK)
+    _admission_check(priority, 0.0, deadline)  # queue full: reject before decoding
+    with metrics.STAGE_SECONDS.time(stage="decode"):
+        samples = await run_in_threadpool(decode_audio, audio.file)
+    return await _admit_and_transcribe(samples, priority, deadline)
+
+
+@app.post("/transcribe/pcm")
+async def transcribe_pcm(request: Request, sample_rate: int = 16000):
+    """Transcribe a raw int16 mono PCM body (`application/octet-stream`) or a compressed one.
+
+    PCM is converted straight to a float32 array: no temp file and no
+    ffmpeg decoding. A compact body (`audio/flac`, `audio/ogg; codecs=opus`)
+    is decoded in memory; multipart uploads go through /transcribe.
+    Interactive priority unless the header says otherwise; for PCM the audio
+    length is known from Content-Length, so oversized or late requests are
+    refused before the body is read.
+    """
+    priority, deadline = _admission_params(request, admission.INTERACTIVE)
+    content_type = request.headers.get("content-type", PCM_CONTENT_TYPE).split(";")[0].strip().lower()
+    if content_type != PCM_CONTENT_TYPE and not content_type.startswith("audio/"):
+        raise HTTPException(status_code=415, detail=f"expected {PCM_CONTENT_TYPE} or audio/*, got {content_type}")
+    compressed = content_type != PCM_CONTENT_TYPE
+    if not compressed and sample_rate <= 0:
+        raise HTTPException(status_code=400, detail="sample_rate must be positive")
+    content_length = int(request.headers.get("content-length") or 0)
+    _admission_check(priority, 0.0 if compressed else content_length / 2 / sample_rate, deadline)
+    with metrics.STAGE_SECONDS.time(stage="upload_read"):
+        body = await request.body()
+    if not compressed and len(body) % 2:
+        raise HTTPException(status_code=400, detail="int16 PCM body must have an even number of bytes")
+    with metrics.STAGE_SECONDS.time(stage="decode"):
+        if compressed:
+            audio = await run_in_threadpool(decode_audio, io.BytesIO(body))
+        else:
+            audio = pcm16_to_float32(body, sample_rate)
+    return await _admit_and_transcribe(audio, priority, deadline)
+
+
+@app.websocket("/transcribe/stream")
+async def transcribe_stream(ws: WebSocket, sample_rate: int = 16000):
+    """Live transcription of raw int16 mono PCM.
+
+    Client → server: binary frames of PCM, then a text frame `{"type": "end"}`.
+    Server → client: `partial` (unstable tail, may be rewritten), `final`
+    (one stable segment) and a closing `done` carrying the full transcript.
+
+    Every decode takes an interactive admission slot. An intermediate decode
+    refused under load is skipped (the audio stays buffered for the next one);
+    a refused final decode closes the socket with 1013 (try again later).
+    """
+    await ws.accept()
+    if sample_rate <= 0:
+        await ws.close(code=1007, reason="sample_rate must be positive")
+        return
+    session = StreamingTranscriber(
+        model,
+        LANGUAGE,
+        step_sec=STREAM_STEP_SEC,
+        stable_margin_sec=STREAM_STABLE_MARGIN_SEC,
+        beam_size=settings["beam_size"],
+    )
+
+    try:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                if len(message["bytes"]) % 2:
+                    await ws.close(code=1007, reason="int16 PCM frames must have an even number of bytes")
+                    return
+                if session.feed(pcm16_to_float32(message["bytes"], sample_rate)):
+                    try:
+                        finals, partial = await _admit_stream_call(session.step, session)
+                    except admission.AdmissionRejected:
+                        continue
+                    for seg in finals:
+                        await ws.send_json({"type": "final", **seg.to_dict()})
+                    await ws.send_json({"type": "partial", "text": partial})
+            elif message.get("text") is not None:
+                break
+
+        for seg in await _admit_stream_call(session.finish, session):
+            await ws.send_json({"type": "final", **seg.to_dict()})
+        await ws.send_json({"type": "done", "text": session.text})
+        await ws.close()
+    except (QueueFullError, WorkerCrashedError, admission.AdmissionRejected):
+        await ws.close(code=1013)  # try again later
+    except WebSocketDisconnect:
+        pass
 
 
 if __name__ == "__main__":
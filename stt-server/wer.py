@@ -0,0 +1,22 @@
+"""Word error rate against reference transcripts (load test, auto-tuner)."""
+
+import re
+import unicodedata
+
+
+def normalize(text: str) -> list[str]:
+    """Lowercase, drop punctuation (apostrophes split words), keep accents."""
+    text = unicodedata.normalize("NFC", text.lower()).replace("’", "'")
+    return re.sub(r"[^\w\s]|_", " ", text).split()
+
+
+def word_errors(reference: str, hypothesis: str) -> tuple[int, int]:
+    """(substitutions + deletions + insertions, reference word count)."""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, start=1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, start=1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1], len(ref)
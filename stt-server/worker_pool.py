@@ -0,0 +1,353 @@
+"""Multi-process pool of WhisperModel replicas (`STT_WORKERS=N`).
+
+Each worker process loads its own model with `cpu_threads // N` threads and,
+on Linux, is pinned to a matching slice of cores. Decoded audio is handed over
+through `multiprocessing.shared_memory` (only the segment name travels through
+the pipe), each request goes to the worker with the fewest in-flight jobs, and
+a worker that dies is restarted while its pending requests fail fast. Restarts
+back off exponentially while the model keeps failing to load, and a worker
+that fails `_MAX_LOAD_FAILURES` times in a row is given up on.
+
+Latency vs throughput: one worker with all threads gives the lowest latency
+for a single request; N workers with 1/N of the threads each give up to ~N×
+aggregate throughput under concurrent load, but every individual request runs
+on fewer threads and is slower when the server is otherwise idle.
+"""
+
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, NamedTuple
+
+import numpy as np
+
+import metrics
+from audio import WHISPER_SAMPLE_RATE
+from inference import QueueFullError
+
+_RESTART_DELAY_SEC = 1.0
+_RESTART_MAX_DELAY_SEC = 60.0
+_MAX_LOAD_FAILURES = 5
+
+
+class WorkerCrashedError(Exception):
+    """Raised on requests that were in flight when their worker process died."""
+
+
+class RemoteSegment(NamedTuple):
+    start: float
+    end: float
+    text: str
+
+
+def _worker_main(
+    conn,
+    model_size: str,
+    device: str,
+    compute_type: str,
+    cpu_threads: int,
+    num_workers: int,
+    cores: list[int] | None,
+):
+    """Entry point of a worker process: load a model, then serve jobs from *conn*."""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    try:
+        from faster_whisper import WhisperModel, decode_audio
+
+        model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+        )
+    except Exception as e:
+        conn.send(("load_error", None, repr(e)))
+        return
+    conn.send(("ready", None, None))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+
+        job_id, source, kwargs = msg
+        shm = None
+        timings: dict[str, float] = {}
+        try:
+            t0 = time.perf_counter()
+            if isinstance(source, str):
+                audio = decode_audio(source)
+                timings["decode"] = time.perf_counter() - t0
+            else:
+                shm_name, n_samples = source
+                shm = shared_memory.SharedMemory(name=shm_name)
+                # The front-end owns the segment and unlinks it; don't let this
+                # process' resource tracker do it a second time.
+                resource_tracker.unregister(shm._name, "shared_memory")
+                audio = np.ndarray((n_samples,), dtype=np.float32, buffer=shm.buf)
+            t1 = time.perf_counter()
+            segments, _ = model.transcribe(audio, **kwargs)
+            t2 = time.perf_counter()
+            result = [RemoteSegment(s.start, s.end, s.text) for s in segments]
+            timings["vad_filter"] = t2 - t1
+            timings["generation"] = time.perf_counter() - t2
+            conn.send(("ok", job_id, (result, timings, len(audio) / WHISPER_SAMPLE_RATE)))
+        except Exception as e:
+            conn.send(("error", job_id, repr(e)))
+        finally:
+            audio = None
+            if shm is not None:
+                shm.close()
+
+
+@dataclass
+class _Job:
+    future: Future
+    shm: shared_memory.SharedMemory | None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _Worker:
+    index: int
+    cores: list[int] | None
+    process: Any = None
+    conn: Any = None
+    ready: bool = False
+    failed: bool = False  # given up on after repeated load failures
+    load_failures: int = 0  # consecutive deaths before reporting ready
+    jobs: dict[int, _Job] = field(default_factory=dict)
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        n_workers: int,
+        model_size: str,
+        device: str,
+        compute_type: str,
+        language: str,
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        beam_size: int = 1,
+        max_in_flight: int = 32,
+    ):
+        total_threads = cpu_threads or os.cpu_count() or n_workers
+        self._threads_per_worker = max(1, total_threads // n_workers)
+        self._model_args = (model_size, device, compute_type, self._threads_per_worker, num_workers)
+        self._default_kwargs = {"language": language, "beam_size": beam_size, "vad_filter": True}
+        self._max_in_flight = max_in_flight
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        self._state_changed = threading.Condition(self._lock)
+        self._ids = itertools.count()
+        self._closing = False
+
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+        self._workers: list[_Worker] = []
+        for i in range(n_workers):
+            cores = None
+            if cpus and len(cpus) >= n_workers:
+                share = len(cpus) // n_workers
+                cores = cpus[i * share:(i + 1) * share]
+            worker = _Worker(index=i, cores=cores)
+            self._spawn(worker)
+            self._workers.append(worker)
+            threading.Thread(target=self._read_loop, args=(worker,), name=f"stt-worker-{i}", daemon=True).start()
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return sum(len(w.jobs) for w in self._workers)
+
+    @property
+    def threads_per_worker(self) -> int:
+        return self._threads_per_worker
+
+    def wait_ready(self, timeout: float) -> None:
+        """Block until every worker has loaded its model; raise RuntimeError on timeout or give-up."""
+        deadline = time.monotonic() + timeout
+        with self._state_changed:
+            while not all(w.ready for w in self._workers):
+                failed = [w.index for w in self._workers if w.failed]
+                if failed:
+                    raise RuntimeError(f"STT workers {failed} failed to load the model")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    pending = [w.index for w in self._workers if not w.ready]
+                    raise RuntimeError(f"STT workers {pending} not ready after {timeout:.0f}s")
+                self._state_changed.wait(remaining)
+
+    def submit(self, audio: str | np.ndarray) -> Future:
+        """Transcribe a file path or float32 16 kHz array on the least-loaded worker; resolves to text."""
+        inner = self.submit_segments(audio)
+        outer: Future = Future()
+
+        def _done(f: Future) -> None:
+            if f.exception() is not None:
+                outer.set_exception(f.exception())
+            else:
+                outer.set_result(" ".join(s.text.strip() for s in f.result()))
+
+        inner.add_done_callback(_done)
+        return outer
+
+    def submit_segments(self, audio: str | np.ndarray, **kwargs) -> Future:
+        """Run `model.transcribe(audio, **kwargs)` on a worker; resolves to a list of RemoteSegment."""
+        shm = None
+        if isinstance(audio, str):
+            source: Any = audio
+        else:
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+            shm = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+            np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+            source = (shm.name, len(audio))
+
+        job_id = next(self._ids)
+        future: Future = Future()
+        with self._lock:
+            if sum(len(w.jobs) for w in self._workers) >= self._max_in_flight:
+                self._release(shm)
+                raise QueueFullError(f"all workers busy ({self._max_in_flight} in flight)")
+            workers = [w for w in self._workers if not w.failed]
+            if not workers:
+                self._release(shm)
+                raise WorkerCrashedError("no STT worker available")
+            worker = min(workers, key=lambda w: (not w.ready, len(w.jobs)))
+            worker.jobs[job_id] = _Job(future, shm)
+            try:
+                worker.conn.send((job_id, source, {**self._default_kwargs, **kwargs}))
+            except (BrokenPipeError, OSError) as e:
+                worker.jobs.pop(job_id)
+                self._release(shm)
+                raise WorkerCrashedError(f"worker {worker.index} unavailable") from e
+        return future
+
+    def remote_model(self) -> "RemoteModel":
+        return RemoteModel(self)
+
+    def shutdown(self) -> None:
+        self._closing = True
+        with self._lock:
+            for worker in self._workers:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+        for worker in self._workers:
+            if worker.failed:
+                continue
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
+
+    def _spawn(self, worker: _Worker) -> None:
+        parent_conn, child_conn = self._ctx.Pipe()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, *self._model_args, worker.cores),
+            name=f"stt-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        child_conn.close()
+        worker.conn = parent_conn
+        worker.ready = False
+
+    def _read_loop(self, worker: _Worker) -> None:
+        while True:
+            try:
+                status, job_id, payload = worker.conn.recv()
+            except (EOFError, OSError):
+                if self._closing or not self._restart(worker):
+                    return
+                continue
+
+            if status == "ready":
+                with self._state_changed:
+                    worker.ready = True
+                    worker.load_failures = 0
+                    self._state_changed.notify_all()
+                print(f"STT worker {worker.index} ready ({self._threads_per_worker} threads, cores={worker.cores}).")
+                continue
+            if status == "load_error":
+                print(f"STT worker {worker.index} failed to load the model: {payload}")
+                continue
+
+            with self._lock:
+                job = worker.jobs.pop(job_id, None)
+            if job is None:
+                continue
+            self._release(job.shm)
+            if status == "ok":
+                segments, timings, duration = payload
+                self._record(job, timings, duration)
+                job.future.set_result(segments)
+            else:
+                job.future.set_exception(RuntimeError(payload))
+
+    def _restart(self, worker: _Worker) -> bool:
+        """Fail the worker's jobs and respawn it with backoff; False once it is given up on."""
+        worker.process.join(timeout=5)
+        with self._state_changed:
+            jobs, worker.jobs = worker.jobs, {}
+            if not worker.ready:
+                worker.load_failures += 1
+            worker.ready = False
+            worker.failed = worker.load_failures >= _MAX_LOAD_FAILURES
+            self._state_changed.notify_all()
+        for job in jobs.values():
+            self._release(job.shm)
+            job.future.set_exception(WorkerCrashedError(f"worker {worker.index} crashed"))
+        if worker.failed:
+            print(
+                f"STT worker {worker.index} died (exit={worker.process.exitcode}) – "
+                f"giving up after {worker.load_failures} failed model loads."
+            )
+            return False
+
+        delay = min(_RESTART_MAX_DELAY_SEC, _RESTART_DELAY_SEC * 2 ** max(0, worker.load_failures - 1))
+        print(f"STT worker {worker.index} died (exit={worker.process.exitcode}) – restarting in {delay:.0f}s.")
+        time.sleep(delay)
+        with self._lock:
+            if self._closing:
+                return False
+            self._spawn(worker)
+        return True
+
+    @staticmethod
+    def _record(job: _Job, timings: dict[str, float], duration: float) -> None:
+        busy = sum(timings.values())
+        metrics.QUEUE_WAIT_SECONDS.observe(max(0.0, time.monotonic() - job.enqueued_at - busy))
+        for stage, seconds in timings.items():
+            metrics.STAGE_SECONDS.observe(seconds, stage=stage)
+        metrics.AUDIO_SECONDS.observe(duration)
+        if duration:
+            metrics.RTF.observe((timings["vad_filter"] + timings["generation"]) / duration)
+
+    @staticmethod
+    def _release(shm: shared_memory.SharedMemory | None) -> None:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+class RemoteModel:
+    """Blocking `WhisperModel.transcribe` look-alike backed by the pool (for streaming sessions)."""
+
+    def __init__(self, pool: WorkerPool):
+        self._pool = pool
+
+    def transcribe(self, audio: np.ndarray, **kwargs) -> tuple[list[RemoteSegment], None]:
+        return self._pool.submit_segments(audio, **kwargs).result(), None
@@ -0,0 +1,96 @@
+"""Preparation de l'enregistrement avant envoi au STT : rognage des silences et encodage.
+
+- `trim_silence` : l'enregistrement contient le pre-roll, le temps de reaction
+  apres le prompt et le hangover de l'end-pointer (jusqu'a
+  `silence_duration_sec` en mode rms). Une passe vectorisee d'energie par
+  trames de 20 ms retire le silence de debut et de fin en gardant une marge :
+  moins d'octets envoyes et moins d'audio a decoder pour Whisper.
+- `encode` : PCM brut (defaut), FLAC (sans perte, ~2x plus compact) ou Opus
+  (avec perte, ~10x) via soundfile/libsndfile ; le serveur STT decode ces
+  formats en memoire sur /transcribe/pcm.
+"""
+
+import io
+import logging
+
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_FRAME_SEC = 0.02
+_MIN_SPEECH_FRAMES = 3  # un clic isole ne compte pas comme debut de parole
+_NOISE_PERCENTILE = 10
+
+CONTENT_TYPES = {
+    "pcm": "application/octet-stream",
+    "flac": "audio/flac",
+    "opus": "audio/ogg; codecs=opus",
+}
+
+
+def trim_silence(pcm: np.ndarray, config: Config) -> np.ndarray:
+    """
+    Retourne la portion de *pcm* (int16 mono) entre la premiere et la derniere
+    parole, plus `trim_margin_sec` de chaque cote. Vue sans copie ; *pcm* tel
+    quel si aucune parole n'est trouvee (le VAD du serveur tranchera).
+
+    Seuil : plancher de bruit de l'enregistrement (10e centile des trames)
+    x `noise_floor_factor`, borne a [SILENCE_THRESHOLD / 2, SILENCE_THRESHOLD]
+    pour qu'un enregistrement entierement parle ne rogne pas la voix.
+    """
+    frame = int(config.sample_rate * _FRAME_SEC)
+    n_frames = len(pcm) // frame
+    if n_frames < _MIN_SPEECH_FRAMES:
+        return pcm
+
+    frames = pcm[:n_frames * frame].reshape(n_frames, frame).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    floor = float(np.percentile(rms, _NOISE_PERCENTILE))
+    threshold = min(config.silence_threshold, max(config.silence_threshold * 0.5, floor * config.noise_floor_factor))
+
+    loud = (rms >= threshold).astype(np.int8)
+    sustained = np.flatnonzero(np.convolve(loud, np.ones(_MIN_SPEECH_FRAMES, dtype=np.int8), "valid")
+                               == _MIN_SPEECH_FRAMES)
+    if len(sustained) == 0:
+        return pcm
+
+    margin = int(config.trim_margin_sec * config.sample_rate)
+    start = max(0, sustained[0] * frame - margin)
+    end = min(len(pcm), (sustained[-1] + _MIN_SPEECH_FRAMES) * frame + margin)
+    return pcm[start:end]
+
+
+def check_format(fmt: str) -> str:
+    """Format d'envoi utilisable : repli sur `pcm` si soundfile / le codec manque."""
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"STT_UPLOAD_FORMAT inconnu: {fmt} (pcm, flac ou opus)")
+    if fmt == "pcm":
+        return fmt
+    try:
+        import soundfile
+
+        container, subtype = ("FLAC", "PCM_16") if fmt == "flac" else ("OGG", "OPUS")
+        if subtype not in soundfile.available_subtypes(container):
+            raise RuntimeError(f"libsndfile sans {container}/{subtype}")
+    except Exception as e:
+        logger.warning("Encodage %s indisponible (%s) — envoi en PCM brut.", fmt, e)
+        return "pcm"
+    return fmt
+
+
+def encode(pcm: np.ndarray, sample_rate: int, fmt: str) -> bytes:
+    """Encode le PCM int16 mono au format *fmt* (cf. CONTENT_TYPES)."""
+    pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+    if fmt == "pcm":
+        return pcm.tobytes()
+
+    import soundfile
+
+    buf = io.BytesIO()
+    if fmt == "flac":
+        soundfile.write(buf, pcm, sample_rate, format="FLAC", subtype="PCM_16")
+    else:
+        soundfile.write(buf, pcm, sample_rate, format="OGG", subtype="OPUS")
+    return buf.getvalue()
@@ -0,0 +1,123 @@
+"""Capture micro dans un thread dedie avec ring buffer et pre-roll.
+
+PyAudio appelle `_on_audio` depuis son propre thread a chaque bloc capte ;
+le bloc est copie dans un ring buffer NumPy prealloue. Le seul producteur
+avance un curseur absolu (nombre total d'echantillons ecrits) : les lecteurs
+(wake word, enregistreur, VAD) lisent chacun a leur propre curseur, et
+n'attendent sur une condition (`notify_all` a chaque bloc) que lorsqu'ils
+ont rattrape le producteur.
+
+Le micro est donc lu en continu, y compris pendant la transcription, la
+classification ou la synthese vocale : plus d'overflow PyAudio silencieux, et
+la parole prononcee juste apres le wake word est conservee.
+"""
+
+import logging
+import threading
+
+import numpy as np
+import pyaudio
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCapture:
+    def __init__(self, pa: pyaudio.PyAudio, config: Config, device_index: int | None = None):
+        self.sample_rate = config.sample_rate
+        self._capacity = int(config.ring_buffer_sec * config.sample_rate)
+        self._ring = np.zeros(self._capacity, dtype=np.int16)
+        self._write_pos = 0  # curseur absolu, seul le callback l'avance
+        self._data_ready = threading.Condition()
+        self.input_overflows = 0  # blocs signales perdus par PortAudio
+        self.reader_overruns = 0  # echantillons ecrases avant d'etre lus
+
+        self._stream = pa.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=config.sample_rate,
+            input=True,
+            frames_per_buffer=config.chunk_size,
+            input_device_index=device_index,
+            stream_callback=self._on_audio,
+        )
+
+    def _on_audio(self, in_data, frame_count, time_info, status_flags):
+        if status_flags & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        data = np.frombuffer(in_data, dtype=np.int16)
+        start = self._write_pos % self._capacity
+        end = start + len(data)
+        if end <= self._capacity:
+            self._ring[start:end] = data
+        else:
+            split = self._capacity - start
+            self._ring[start:] = data[:split]
+            self._ring[:end - self._capacity] = data[split:]
+        with self._data_ready:
+            self._write_pos += len(data)
+            self._data_ready.notify_all()
+        return None, pyaudio.paContinue
+
+    @property
+    def write_pos(self) -> int:
+        return self._write_pos
+
+    def reader(self, preroll_sec: float = 0.0, start: int | None = None) -> "CaptureReader":
+        """
+        Cree un lecteur positionne sur `start` (par defaut : maintenant),
+        recule de `preroll_sec` pour inclure l'audio deja capte.
+        """
+        pos = self._write_pos if start is None else start
+        pos -= int(preroll_sec * self.sample_rate)
+        return CaptureReader(self, max(0, pos, self._write_pos - self._capacity))
+
+    def stats(self) -> dict:
+        return {"input_overflows": self.input_overflows, "reader_overruns": self.reader_overruns}
+
+    def close(self) -> None:
+        self._stream.stop_stream()
+        self._stream.close()
+        if self.input_overflows or self.reader_overruns:
+            logger.warning("Capture: %s", self.stats())
+
+    def _read(self, cursor: int, n: int, timeout: float = 0.5) -> tuple[np.ndarray, int]:
+        # Chaque lecteur attend sa propre position : pas de reveil perdu entre lecteurs
+        while self._write_pos < cursor + n:
+            with self._data_ready:
+                if self._data_ready.wait_for(lambda: self._write_pos >= cursor + n, timeout):
+                    break
+            if not self._stream.is_active():
+                raise IOError("Flux de capture arrete")
+
+        oldest = self._write_pos - self._capacity
+        if cursor < oldest:
+            self.reader_overruns += oldest - cursor
+            logger.warning("Lecteur en retard: %d echantillons perdus", oldest - cursor)
+            cursor = oldest
+            if self._write_pos < cursor + n:
+                return self._read(cursor, n, timeout)
+
+        start = cursor % self._capacity
+        end = start + n
+        if end <= self._capacity:
+            out = self._ring[start:end].copy()
+        else:
+            out = np.concatenate((self._ring[start:], self._ring[:end - self._capacity]))
+        return out, cursor + n
+
+
+class CaptureReader:
+    """Lecteur a curseur propre ; meme interface `read()` qu'un stream PyAudio."""
+
+    def __init__(self, capture: AudioCapture, cursor: int):
+        self._capture = capture
+        self.cursor = cursor
+
+    def read(self, num_frames: int, exception_on_overflow: bool = False) -> bytes:
+        return self.read_array(num_frames).tobytes()
+
+    def read_array(self, num_frames: int) -> np.ndarray:
+        out, self.cursor = self._capture._read(self.cursor, num_frames)
+        return out
@@ -1,12 +1,25 @@
-"""Classification des commandes vocales Jarvis en add / query / unknown."""
+"""Classification des commandes vocales Jarvis en add / query / unknown.
 
+Trois tiers, du plus rapide au plus lent : regex explicites, classifieur
+local n-grammes (cf. intent_model.py), puis LLM via /agent/classify seulement
+si la confiance locale est sous INTENT_MIN_CONFIDENCE.
+"""
+
+import json
 import logging
 import re
+import time
 from enum import Enum
-from typing import Optional
+from pathlib import Path
+from typing import Callable, Optional
 
 import requests
 
+import tracing
+from config import Config
+from intent_model import IntentModel, load_or_train, normalize
+from resilience import CircuitBreaker, TtlLruCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -45,6 +58,98 @@ _QUERY_PATTERNS = [
 ]
 
 
+_local_model: IntentModel | None = None
+_min_confidence = 1.0
+_log_path: Path | None = None
+
+# Appels /agent/classify : connexions reutilisees, resultats en cache, disjoncteur
+_session = requests.Session()
+_llm_timeout = 240.0
+_llm_cache = TtlLruCache(256, 3600.0)
+_llm_breaker = CircuitBreaker("/agent/classify")
+_STATS_INTERVAL_SEC = 300.0
+_last_stats = time.monotonic()
+
+
+def setup(config: Config) -> None:
+    """Charge (ou entraine) le classifieur local et ouvre le journal des decisions."""
+    global _local_model, _min_confidence, _log_path, _llm_timeout, _llm_cache, _llm_breaker
+    _min_confidence = config.intent_min_confidence
+    _llm_timeout = config.intent_llm_timeout_sec
+    _llm_cache = TtlLruCache(config.intent_cache_size, config.intent_cache_ttl_sec)
+    _llm_breaker = CircuitBreaker(
+        "/agent/classify", config.llm_breaker_failures, config.llm_breaker_cooldown_sec
+    )
+    if config.intent_local:
+        try:
+            _local_model = load_or_train()
+        except Exception:
+            logger.exception("Classifieur local indisponible — regex puis LLM uniquement.")
+    if config.intent_log_file:
+        _log_path = Path(config.intent_log_file)
+        _log_path.parent.mkdir(parents=True, exist_ok=True)
+
+
+def _log_decision(text: str, command_type: CommandType, tier: str, confidence: float | None = None) -> None:
+    """Journalise la decision (corpus de re-entrainement, cf. intent_model.py --from-log)."""
+    if _log_path is None:
+        return
+    entry = {"ts": round(time.time(), 3), "text": text, "label": command_type.value, "tier": tier}
+    if confidence is not None:
+        entry["confidence"] = round(confidence, 3)
+    try:
+        with _log_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError:
+        logger.warning("Journal des intentions non inscriptible: %s", _log_path)
+
+
+def _classify_locally(text: str) -> tuple[CommandType, float] | None:
+    if _local_model is None:
+        return None
+    with tracing.span("classify_local") as span:
+        label, confidence = _local_model.predict(text)
+        span.update(result=label, confidence=round(confidence, 3))
+    return CommandType(label), confidence
+
+
+def _cache_key(text: str) -> str:
+    return " ".join(re.findall(r"\w+", normalize(text)))
+
+
+def _maybe_log_stats() -> None:
+    global _last_stats
+    now = time.monotonic()
+    if now - _last_stats >= _STATS_INTERVAL_SEC:
+        _last_stats = now
+        logger.info("Classification LLM: cache %s, disjoncteur %s", _llm_cache.stats(), _llm_breaker.stats())
+
+
+def _classify_with_llm_guarded(
+    text: str, jarvis_api_url: str, on_llm_call: Callable[[], None] | None = None
+) -> "tuple[CommandType, str] | None":
+    """_classify_with_llm derriere le cache et le disjoncteur."""
+    _maybe_log_stats()
+    key = _cache_key(text)
+    cached = _llm_cache.get(key)
+    if cached is not None:
+        logger.info("Classification LLM depuis le cache: %s", cached[0].value)
+        return cached
+    if not _llm_breaker.allow():
+        logger.info("Disjoncteur /agent/classify ouvert — appel LLM saute.")
+        return None
+
+    if on_llm_call is not None:
+        on_llm_call()
+    result = _classify_with_llm(text, jarvis_api_url)
+    if result is None:
+        _llm_breaker.record_failure()
+    else:
+        _llm_breaker.record_success()
+        _llm_cache.put(key, result)
+    return result
+
+
 def _classify_with_llm(
     text: str, jarvis_api_url: str
 ) -> "tuple[CommandType, str] | None":
@@ -57,10 +162,11 @@ def _classify_with_llm(
     url = f"{jarvis_api_url.rstrip('/')}/agent/classify"
     try:
         logger.info("Tentative de classification LLM via %s", url)
-        resp = requests.post(
+        resp = _session.post(
             url,
             json={"text": text, "source": "wake_listener"},
-            timeout=240,
+            headers=tracing.headers(),
+            timeout=(5, _llm_timeout),
         )
         logger.debug("Classification LLM — requête POST %s avec payload: %s", url, {"text": text, "source": "wake_listener"})
         resp.raise_for_status()
@@ -86,7 +192,7 @@ def _classify_with_llm(
         logger.debug("Backend /agent/classify non disponible — fallback regex.")
         return None
     except requests.Timeout:
-        logger.warning("Timeout /agent/classify (%ss) — fallback regex.", 240)
+        logger.warning("Timeout /agent/classify (%ss) — fallback regex.", _llm_timeout)
         return None
     except requests.HTTPError as e:
         logger.warning("Erreur HTTP /agent/classify: %s — fallback regex.", e)
@@ -121,13 +227,18 @@ def _classify_with_regex(text: str) -> "tuple[CommandType, str] | None":
 
 
 def classify(
-    text: str, jarvis_api_url: Optional[str] = None
+    text: str,
+    jarvis_api_url: Optional[str] = None,
+    on_llm_call: Optional[Callable[[], None]] = None,
 ) -> tuple[CommandType, str]:
     """
     Classifie une transcription vocale Jarvis.
 
-    Stratégie : regex d'abord (instantané), puis LLM uniquement si regex = UNKNOWN
-    (pour désambiguïser les cas comme "Qu'est-ce qu'on mange demain soir ?").
+    Stratégie : regex d'abord (instantané), puis classifieur local (< 1 ms),
+    et LLM uniquement si la confiance locale est insuffisante (pour
+    désambiguïser les cas comme "Qu'est-ce qu'on mange demain soir ?").
+    `on_llm_call` est appelé juste avant un appel LLM effectif (hors cache
+    et disjoncteur), pour lancer du travail spéculatif en parallèle.
 
     Retourne (CommandType, contenu):
     - ADD   : contenu = texte sans le préfixe de commande
@@ -141,13 +252,30 @@ def classify(
     regex_result = _classify_with_regex(normalized)
     if regex_result is not None:
         logger.debug("Classification regex: %s", regex_result[0].value)
+        _log_decision(normalized, regex_result[0], "regex")
         return regex_result
 
-    # Fallback LLM pour les cas ambigus que regex ne couvre pas
+    # Classifieur local : suffisant quand il est confiant
+    local_result = _classify_locally(normalized)
+    if local_result is not None:
+        command_type, confidence = local_result
+        logger.info("Classification locale: %s (confiance %.2f)", command_type.value, confidence)
+        if confidence >= _min_confidence:
+            _log_decision(normalized, command_type, "local", confidence)
+            return command_type, normalized
+
+    # Fallback LLM pour les cas ambigus
     if jarvis_api_url:
-        logger.info("Regex UNKNOWN — tentative classification LLM via %s", jarvis_api_url)
-        llm_result = _classify_with_llm(normalized, jarvis_api_url)
+        logger.info("Confiance insuffisante — tentative classification LLM via %s", jarvis_api_url)
+        with tracing.span("classify_llm"):
+            llm_result = _classify_with_llm_guarded(normalized, jarvis_api_url, on_llm_call)
         if llm_result is not None:
+            _log_decision(normalized, llm_result[0], "llm")
             return llm_result
 
+    # LLM indisponible : la meilleure hypothese locale vaut mieux que UNKNOWN
+    if local_result is not None:
+        _log_decision(normalized, local_result[0], "local", local_result[1])
+        return local_result[0], normalized
+
     return CommandType.UNKNOWN, normalized
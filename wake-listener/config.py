@@ -13,6 +13,17 @@ class Config:
     # OpenWakeWord
     wake_model: str = "hey_jarvis"
     wake_threshold: float = 0.5
+    wake_inference_framework: str = "tflite"  # "tflite" ou "onnx"
+    # Porte d'energie devant OWW (cf. wake_gate.py)
+    wake_gate: bool = True
+    wake_gate_factor: float = 2.0
+    wake_gate_min_rms: float = 150.0
+    wake_gate_hangover_sec: float = 1.0
+    wake_gate_replay_sec: float = 1.5
+
+    # Multi-pieces : (nom, peripherique d'entree, peripherique de sortie) par micro ;
+    # vide = une seule piece sur les peripheriques par defaut
+    rooms: tuple[tuple[str, int | None, int | None], ...] = ()
 
     # Audio / Silence
     silence_threshold: float = 500.0
@@ -21,28 +32,126 @@ class Config:
     chunk_size: int = 1280  # ~80ms a 16kHz
     sample_rate: int = 16000
 
+    # Capture (ring buffer alimente par le callback PyAudio)
+    ring_buffer_sec: float = 60.0
+    preroll_sec: float = 0.3  # audio inclus avant le wake word detecte
+    prompt_echo_tail_sec: float = 0.2  # audio ignore apres la fin du prompt (latence de sortie, echo)
+
+    # End-pointing (cf. endpointing.py)
+    endpointer: str = "silero"  # "silero", "adaptive" ou "rms"
+    vad_threshold: float = 0.5
+    noise_floor_factor: float = 3.0
+    endpoint_hangover_sec: float = 0.7
+    endpoint_max_hangover_sec: float = 1.5
+
     # STT Server
     stt_server_url: str = "http://127.0.0.1:8300"
+    stt_streaming: bool = False
+    stt_upload_format: str = "pcm"  # "pcm", "flac" ou "opus" (cf. audio_prep.py)
+    trim_silence: bool = True  # rogne le silence de debut et de fin avant l'envoi
+    trim_margin_sec: float = 0.25
 
     # Jarvis Backend API
     jarvis_api_url: str = "http://127.0.0.1:3000"
+    # File locale des commandes ADD (cf. memory_queue.py)
+    memory_queue_file: str = "data/memory_queue.jsonl"
+    memory_queue_batch: int = 8  # entrees envoyees en parallele par lot
+    memory_retry_max_sec: float = 60.0  # plafond du backoff entre deux renvois
+
+    # Modeles : verifies contre models/manifest.json (cf. models.py)
+    models_offline: bool = False  # jamais de telechargement ; modele manquant = erreur
 
     # TTS (Piper)
     tts_model: str = "fr_FR-gilles-low"
     tts_enabled: bool = True
+    tts_cache_size: int = 64  # phrases de reponse gardees en LRU
+    answer_streaming: bool = True  # reponses QUERY lues phrase par phrase (SSE)
+
+    # Classification (cf. command_classifier.py / intent_model.py)
+    intent_local: bool = True
+    intent_min_confidence: float = 0.75  # en dessous : appel LLM /agent/classify
+    intent_log_file: str = "traces/intents.jsonl"  # vide = pas de journal
+    intent_llm_timeout_sec: float = 240.0
+    intent_cache_size: int = 256  # resultats LLM gardes (texte normalise)
+    intent_cache_ttl_sec: float = 3600.0
+    llm_breaker_failures: int = 2  # echecs consecutifs avant ouverture
+    llm_breaker_cooldown_sec: float = 120.0
+    speculative_query: bool = False  # /memory/query/stream lance pendant la classification LLM
+
+    # Traces de latence
+    trace_file: str = "traces/interactions.jsonl"  # vide = pas de fichier
+    trace_max_bytes: int = 5 * 1024 * 1024
+    trace_backup_count: int = 5
+    trace_summary: bool = True
+
+    @property
+    def multi_room(self) -> bool:
+        return len(self.rooms) > 1
+
+
+def _parse_rooms(spec: str) -> tuple[tuple[str, int | None, int | None], ...]:
+    """ROOMS=salon:2:4,cuisine:5 → nom:entree[:sortie] (index PyAudio / sounddevice)."""
+    rooms = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, *devices = item.split(":")
+        input_device = int(devices[0]) if devices and devices[0] else None
+        output_device = int(devices[1]) if len(devices) > 1 and devices[1] else None
+        rooms.append((name, input_device, output_device))
+    names = [name for name, _, _ in rooms]
+    if len(set(names)) != len(names) or "" in names:
+        raise ValueError(f"ROOMS: noms de pieces vides ou en double ({spec})")
+    return tuple(rooms)
 
 
 def load_config() -> Config:
     return Config(
         wake_model=os.getenv("WAKE_MODEL", "hey_jarvis"),
         wake_threshold=float(os.getenv("WAKE_THRESHOLD", "0.5")),
+        wake_inference_framework=os.getenv("WAKE_INFERENCE_FRAMEWORK", "tflite").lower(),
+        wake_gate=os.getenv("WAKE_GATE", "true").lower() in ("true", "1", "yes"),
+        wake_gate_factor=float(os.getenv("WAKE_GATE_FACTOR", "2.0")),
+        wake_gate_min_rms=float(os.getenv("WAKE_GATE_MIN_RMS", "150")),
+        wake_gate_hangover_sec=float(os.getenv("WAKE_GATE_HANGOVER_SEC", "1.0")),
+        wake_gate_replay_sec=float(os.getenv("WAKE_GATE_REPLAY_SEC", "1.5")),
+        rooms=_parse_rooms(os.getenv("ROOMS", "")),
         silence_threshold=float(os.getenv("SILENCE_THRESHOLD", "500")),
         silence_duration_sec=float(os.getenv("SILENCE_DURATION_SEC", "3.0")),
         max_recording_sec=float(os.getenv("MAX_RECORDING_SEC", "30.0")),
         chunk_size=int(os.getenv("CHUNK_SIZE", "1280")),
         sample_rate=int(os.getenv("SAMPLE_RATE", "16000")),
+        ring_buffer_sec=float(os.getenv("RING_BUFFER_SEC", "60.0")),
+        preroll_sec=float(os.getenv("PREROLL_SEC", "0.3")),
+        prompt_echo_tail_sec=float(os.getenv("PROMPT_ECHO_TAIL_SEC", "0.2")),
+        endpointer=os.getenv("ENDPOINTER", "silero").lower(),
+        vad_threshold=float(os.getenv("VAD_THRESHOLD", "0.5")),
+        noise_floor_factor=float(os.getenv("NOISE_FLOOR_FACTOR", "3.0")),
+        endpoint_hangover_sec=float(os.getenv("ENDPOINT_HANGOVER_SEC", "0.7")),
+        endpoint_max_hangover_sec=float(os.getenv("ENDPOINT_MAX_HANGOVER_SEC", "1.5")),
         stt_server_url=os.getenv("STT_SERVER_URL", "http://127.0.0.1:8300"),
+        stt_streaming=os.getenv("STT_STREAMING", "false").lower() in ("true", "1", "yes"),
+        stt_upload_format=os.getenv("STT_UPLOAD_FORMAT", "pcm").lower(),
+        trim_silence=os.getenv("TRIM_SILENCE", "true").lower() in ("true", "1", "yes"),
+        trim_margin_sec=float(os.getenv("TRIM_MARGIN_SEC", "0.25")),
         jarvis_api_url=os.getenv("JARVIS_API_URL", "http://127.0.0.1:3000"),
+        memory_queue_file=os.getenv("MEMORY_QUEUE_FILE", "data/memory_queue.jsonl"),
+        memory_queue_batch=int(os.getenv("MEMORY_QUEUE_BATCH", "8")),
+        memory_retry_max_sec=float(os.getenv("MEMORY_RETRY_MAX_SEC", "60")),
+        models_offline=os.getenv("MODELS_OFFLINE", "false").lower() in ("true", "1", "yes"),
         tts_model=os.getenv("TTS_MODEL", "fr_FR-siwis-medium"),
         tts_enabled=os.getenv("TTS_ENABLED", "true").lower() in ("true", "1", "yes"),
+        tts_cache_size=int(os.getenv("TTS_CACHE_SIZE", "64")),
+        answer_streaming=os.getenv("ANSWER_STREAMING", "true").lower() in ("true", "1", "yes"),
+        intent_local=os.getenv("INTENT_LOCAL", "true").lower() in ("true", "1", "yes"),
+        intent_min_confidence=float(os.getenv("INTENT_MIN_CONFIDENCE", "0.75")),
+        intent_log_file=os.getenv("INTENT_LOG_FILE", "traces/intents.jsonl"),
+        intent_llm_timeout_sec=float(os.getenv("INTENT_LLM_TIMEOUT_SEC", "240")),
+        intent_cache_size=int(os.getenv("INTENT_CACHE_SIZE", "256")),
+        intent_cache_ttl_sec=float(os.getenv("INTENT_CACHE_TTL_SEC", "3600")),
+        llm_breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "2")),
+        llm_breaker_cooldown_sec=float(os.getenv("LLM_BREAKER_COOLDOWN_SEC", "120")),
+        speculative_query=os.getenv("SPECULATIVE_QUERY", "false").lower() in ("true", "1", "yes"),
+        trace_file=os.getenv("TRACE_FILE", "traces/interactions.jsonl"),
+        trace_max_bytes=int(os.getenv("TRACE_MAX_BYTES", str(5 * 1024 * 1024))),
+        trace_backup_count=int(os.getenv("TRACE_BACKUP_COUNT", "5")),
+        trace_summary=os.getenv("TRACE_SUMMARY", "true").lower() in ("true", "1", "yes"),
     )
@@ -0,0 +1,179 @@
+"""Detection de fin de parole (end-pointing) pour l'enregistrement post-wake.
+
+Un `Endpointer` combine un detecteur de voix frame par frame et une
+temporisation (hangover) :
+
+- avant toute parole, l'enregistrement s'arrete apres `no_speech_timeout_sec` ;
+- apres de la parole, il s'arrete apres `hangover` de non-parole. Le hangover
+  part court (`base_hangover_sec`) et s'allonge jusqu'a `max_hangover_sec`
+  quand le locuteur marque des pauses longues au milieu de sa phrase.
+
+Detecteurs disponibles (`ENDPOINTER`) :
+
+- `silero` : VAD neuronal Silero (ONNX, CPU) fourni par OpenWakeWord ;
+- `adaptive` : RMS avec plancher de bruit calibre sur l'ambiance avant le wake word ;
+- `rms` : seuil RMS fixe (`SILENCE_THRESHOLD`), comportement historique.
+"""
+
+import logging
+
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def compute_rms(pcm: np.ndarray) -> float:
+    """Calcule le RMS (root mean square) d'un frame PCM int16."""
+    if len(pcm) == 0:
+        return 0.0
+    return float(np.sqrt(np.mean(pcm.astype(np.float64) ** 2)))
+
+
+class RmsDetector:
+    """Parole = RMS au-dessus d'un seuil fixe."""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+
+    def is_speech(self, pcm: np.ndarray) -> bool:
+        return compute_rms(pcm) >= self.threshold
+
+    def observe_ambient(self, pcm: np.ndarray) -> None:
+        pass
+
+    def reset(self) -> None:
+        pass
+
+
+class AdaptiveRmsDetector(RmsDetector):
+    """
+    Parole = RMS au-dessus de `factor` x plancher de bruit.
+
+    Le plancher est une moyenne glissante lente du RMS ambiant, alimentee en
+    continu pendant l'attente du wake word ; `min_threshold` evite qu'une
+    piece tres calme rende le detecteur hypersensible.
+    """
+
+    def __init__(self, min_threshold: float, factor: float = 3.0, alpha: float = 0.02):
+        super().__init__(min_threshold)
+        self._min_threshold = min_threshold
+        self._factor = factor
+        self._alpha = alpha
+        self._floor: float | None = None
+
+    def observe_ambient(self, pcm: np.ndarray) -> None:
+        rms = compute_rms(pcm)
+        if self._floor is None:
+            self._floor = rms
+        elif rms < self._floor * self._factor:
+            # On ignore les pics (parole, claquements) pour ne suivre que le fond
+            self._floor += self._alpha * (rms - self._floor)
+        self.threshold = max(self._min_threshold, self._floor * self._factor)
+
+    @property
+    def noise_floor(self) -> float | None:
+        return self._floor
+
+
+class SileroDetector:
+    """VAD neuronal Silero (modele ONNX embarque par OpenWakeWord, CPU uniquement)."""
+
+    def __init__(self, threshold: float = 0.5):
+        from openwakeword.vad import VAD
+
+        self._vad = VAD()
+        self._threshold = threshold
+        # Premiere inference au demarrage plutot qu'au premier enregistrement
+        self._vad.predict(np.zeros(1280, dtype=np.int16))
+        self._vad.reset_states()
+
+    def is_speech(self, pcm: np.ndarray) -> bool:
+        return float(self._vad.predict(pcm)) >= self._threshold
+
+    def observe_ambient(self, pcm: np.ndarray) -> None:
+        pass
+
+    def reset(self) -> None:
+        self._vad.reset_states()
+
+
+class Endpointer:
+    def __init__(
+        self,
+        detector,
+        frame_sec: float,
+        base_hangover_sec: float,
+        max_hangover_sec: float,
+        no_speech_timeout_sec: float,
+    ):
+        self.detector = detector
+        self._frame_sec = frame_sec
+        self._base_hangover = base_hangover_sec
+        self._max_hangover = max(base_hangover_sec, max_hangover_sec)
+        self._no_speech_timeout = no_speech_timeout_sec
+        self.start()
+
+    def start(self) -> None:
+        """Reinitialise l'etat avant un nouvel enregistrement."""
+        self.detector.reset()
+        self._heard_speech = False
+        self._silence_sec = 0.0
+        self._hangover = self._base_hangover
+
+    def observe_ambient(self, pcm: np.ndarray) -> None:
+        """Frame capte hors enregistrement (calibration du bruit de fond)."""
+        self.detector.observe_ambient(pcm)
+
+    def update(self, pcm: np.ndarray) -> bool:
+        """Traite un frame enregistre ; retourne True quand il faut arreter."""
+        if self.detector.is_speech(pcm):
+            if self._heard_speech and self._silence_sec > 0:
+                # Pause intra-phrase : on laisse plus de marge aux locuteurs lents
+                self._hangover = min(self._max_hangover, max(self._hangover, self._silence_sec * 1.5))
+            self._heard_speech = True
+            self._silence_sec = 0.0
+            return False
+
+        self._silence_sec += self._frame_sec
+        limit = self._hangover if self._heard_speech else self._no_speech_timeout
+        return self._silence_sec >= limit
+
+    @property
+    def heard_speech(self) -> bool:
+        return self._heard_speech
+
+
+def build_endpointer(config: Config) -> Endpointer:
+    """Construit l'end-pointer configure, avec repli sur le RMS si Silero est indisponible."""
+    frame_sec = config.chunk_size / config.sample_rate
+
+    if config.endpointer == "rms":
+        # Comportement historique : `silence_duration_sec` de silence, avant ou apres parole
+        return Endpointer(
+            RmsDetector(config.silence_threshold),
+            frame_sec,
+            config.silence_duration_sec,
+            config.silence_duration_sec,
+            config.silence_duration_sec,
+        )
+
+    detector = None
+    if config.endpointer == "silero":
+        try:
+            detector = SileroDetector(config.vad_threshold)
+        except Exception as e:
+            logger.warning("VAD Silero indisponible (%s) — repli sur le RMS adaptatif.", e)
+    if detector is None:
+        detector = AdaptiveRmsDetector(config.silence_threshold, config.noise_floor_factor)
+
+    logger.info("End-pointing: %s (hangover %.2f-%.2fs)", type(detector).__name__,
+                config.endpoint_hangover_sec, config.endpoint_max_hangover_sec)
+    return Endpointer(
+        detector,
+        frame_sec,
+        config.endpoint_hangover_sec,
+        config.endpoint_max_hangover_sec,
+        config.silence_duration_sec,
+    )
@@ -0,0 +1,208 @@
+"""Classifieur d'intention local : n-grammes de caracteres + modele lineaire NumPy.
+
+Tier intermediaire entre les regex (instantanees, mais rigides) et l'appel
+LLM `/agent/classify` (plusieurs secondes). Les transcriptions sont
+representees par des n-grammes de caracteres (2 a 4, par mot) et des mots,
+hashes dans un vecteur de taille fixe ; une regression logistique
+multinomiale donne ADD / QUERY / UNKNOWN avec une confiance (probabilite
+softmax). Une prediction coute bien moins d'une milliseconde.
+
+Le modele est entraine sur `intent/corpus.tsv` (une ligne `label<TAB>texte`)
+et sauvegarde dans un petit fichier `.npz`. Il est re-entraine
+automatiquement au demarrage si le corpus est plus recent que les poids.
+
+Re-entrainement a partir des transcriptions journalisees (INTENT_LOG_FILE),
+en ne gardant que les labels fiables (regex ou LLM) :
+
+    python intent_model.py --from-log traces/intents.jsonl
+"""
+
+import argparse
+import json
+import logging
+import re
+import time
+import unicodedata
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INTENT_DIR = Path(__file__).parent / "intent"
+DEFAULT_CORPUS = INTENT_DIR / "corpus.tsv"
+DEFAULT_WEIGHTS = INTENT_DIR / "weights.npz"
+
+LABELS = ("add", "query", "unknown")
+_TRUSTED_TIERS = ("regex", "llm")
+
+_DIM = 1 << 14
+_NGRAM_RANGE = (2, 4)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation (robuste aux variantes du STT)."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _features(text: str, dim: int) -> tuple[np.ndarray, np.ndarray]:
+    """Indices hashes et poids (norme L2) des n-grammes d'une transcription."""
+    words = _WORD_RE.findall(normalize(text))
+    grams: list[str] = []
+    for i, word in enumerate(words):
+        grams.append(f"w:{word}")
+        if i:
+            grams.append(f"b:{words[i - 1]} {word}")
+        padded = f" {word} "
+        for n in range(_NGRAM_RANGE[0], _NGRAM_RANGE[1] + 1):
+            grams.extend(padded[j:j + n] for j in range(len(padded) - n + 1))
+    if not grams:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    idx, counts = np.unique(
+        np.fromiter((zlib.crc32(g.encode("utf-8")) % dim for g in grams), dtype=np.int64, count=len(grams)),
+        return_counts=True,
+    )
+    values = np.log1p(counts).astype(np.float32)
+    values /= np.linalg.norm(values)
+    return idx, values
+
+
+class IntentModel:
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: tuple[str, ...] = LABELS):
+        self.weights = weights  # (dim, n_labels)
+        self.bias = bias
+        self.labels = labels
+
+    @property
+    def dim(self) -> int:
+        return self.weights.shape[0]
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """Retourne (label, confiance) pour une transcription."""
+        idx, values = _features(text, self.dim)
+        logits = values @ self.weights[idx] + self.bias
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    @classmethod
+    def train(
+        cls,
+        samples: list[tuple[str, str]],
+        dim: int = _DIM,
+        epochs: int = 300,
+        lr: float = 1.0,
+        l2: float = 1e-4,
+    ) -> "IntentModel":
+        """Regression logistique multinomiale, descente de gradient plein batch."""
+        x = np.zeros((len(samples), dim), dtype=np.float32)
+        y = np.zeros((len(samples), len(LABELS)), dtype=np.float32)
+        for row, (label, text) in enumerate(samples):
+            idx, values = _features(text, dim)
+            x[row, idx] = values
+            y[row, LABELS.index(label)] = 1.0
+
+        weights = np.zeros((dim, len(LABELS)), dtype=np.float32)
+        bias = np.zeros(len(LABELS), dtype=np.float32)
+        for _ in range(epochs):
+            logits = x @ weights + bias
+            logits -= logits.max(axis=1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=1, keepdims=True)
+            grad = (probs - y) / len(samples)
+            weights -= lr * (x.T @ grad + l2 * weights)
+            bias -= lr * grad.sum(axis=0)
+        return cls(weights, bias)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # float16 : ~100 Ko sur disque, sans effet mesurable sur les predictions
+        np.savez_compressed(
+            path, weights=self.weights.astype(np.float16), bias=self.bias, labels=np.array(self.labels)
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "IntentModel":
+        data = np.load(path)
+        return cls(
+            data["weights"].astype(np.float32),
+            data["bias"].astype(np.float32),
+            tuple(str(label) for label in data["labels"]),
+        )
+
+
+def load_corpus(path: Path = DEFAULT_CORPUS) -> list[tuple[str, str]]:
+    samples = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        label, _, text = line.partition("\t")
+        if label in LABELS and text.strip():
+            samples.append((label, text.strip()))
+    return samples
+
+
+def load_or_train(weights_path: Path = DEFAULT_WEIGHTS, corpus_path: Path = DEFAULT_CORPUS) -> IntentModel | None:
+    """Charge les poids, ou les (re)entraine si le corpus est plus recent."""
+    stale = not weights_path.exists() or (
+        corpus_path.exists() and corpus_path.stat().st_mtime > weights_path.stat().st_mtime
+    )
+    if not stale:
+        return IntentModel.load(weights_path)
+    if not corpus_path.exists():
+        logger.warning("Corpus d'intentions absent (%s) — classifieur local desactive.", corpus_path)
+        return None
+
+    t0 = time.monotonic()
+    samples = load_corpus(corpus_path)
+    model = IntentModel.train(samples)
+    model.save(weights_path)
+    logger.info(
+        "Classifieur local entraine sur %d exemples en %.1fs -> %s",
+        len(samples), time.monotonic() - t0, weights_path,
+    )
+    return model
+
+
+def merge_log(log_path: Path, corpus_path: Path = DEFAULT_CORPUS) -> int:
+    """Ajoute au corpus les transcriptions journalisees dont le label est fiable."""
+    known = {normalize(text) for _, text in load_corpus(corpus_path)} if corpus_path.exists() else set()
+    added = []
+    for line in log_path.read_text(encoding="utf-8").splitlines():
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        text = " ".join(entry.get("text", "").split())
+        if entry.get("tier") not in _TRUSTED_TIERS or entry.get("label") not in LABELS or not text:
+            continue
+        key = normalize(text)
+        if key not in known:
+            known.add(key)
+            added.append(f"{entry['label']}\t{text}")
+    if added:
+        with corpus_path.open("a", encoding="utf-8") as f:
+            f.write("\n".join(added) + "\n")
+    return len(added)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="(Re)entraine le classifieur d'intention local.")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--weights", type=Path, default=DEFAULT_WEIGHTS)
+    parser.add_argument("--from-log", type=Path, help="journal INTENT_LOG_FILE a fusionner dans le corpus")
+    args = parser.parse_args()
+
+    if args.from_log:
+        logger.info("%d transcriptions ajoutees au corpus.", merge_log(args.from_log, args.corpus))
+    samples = load_corpus(args.corpus)
+    model = IntentModel.train(samples)
+    model.save(args.weights)
+    correct = sum(model.predict(text)[0] == label for label, text in samples)
+    logger.info("Poids sauvegardes dans %s (exactitude entrainement %d/%d).", args.weights, correct, len(samples))
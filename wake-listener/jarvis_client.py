@@ -1,46 +1,71 @@
-"""Client HTTP pour le backend Jarvis (gestion de la mémoire conversationnelle)."""
+"""Client HTTP asynchrone pour le backend Jarvis (gestion de la mémoire conversationnelle)."""
 
+import json
 import logging
+from typing import AsyncGenerator
 
-import requests
+import httpx
 
+import tracing
 from config import Config
 
 logger = logging.getLogger(__name__)
 
 
+class MemoryRejectedError(Exception):
+    """Le backend refuse l'ajout (4xx hors 408/429) : un renvoi n'y changera rien."""
+
+
 class JarvisClient:
     def __init__(self, config: Config):
         self._base_url = config.jarvis_api_url.rstrip("/")
-        self._session = requests.Session()
+        self._client = httpx.AsyncClient(base_url=self._base_url)
 
-    def add_memory(self, text: str) -> dict | None:
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def add_memory(
+        self, text: str, memory_id: str | None = None, spoken_at: str | None = None
+    ) -> dict | None:
         """
         Envoie un texte à mémoriser via POST /memory/add.
 
-        Retourne la réponse JSON du backend, ou None en cas d'erreur.
+        `memory_id` (UUID) sert de clé d'idempotence, `spoken_at` (ISO 8601)
+        de date de référence pour les expressions temporelles (cf. memory_queue.py).
+
+        Retourne la réponse JSON du backend, ou None en cas d'erreur
+        transitoire ; lève MemoryRejectedError si la requête est refusée.
         """
+        payload = {"text": text, "source": "wake_listener"}
+        if memory_id:
+            payload["id"] = memory_id
+        if spoken_at:
+            payload["spokenAt"] = spoken_at
         try:
-            resp = self._session.post(
-                f"{self._base_url}/memory/add",
-                json={"text": text, "source": "wake_listener"},
+            resp = await self._client.post(
+                "/memory/add",
+                json=payload,
+                headers=tracing.headers(),
                 timeout=15,
             )
             resp.raise_for_status()
             return resp.json()
-        except requests.ConnectionError:
+        except httpx.ConnectError:
             logger.error(
                 "Impossible de joindre le backend Jarvis à %s", self._base_url
             )
             return None
-        except requests.HTTPError as e:
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if 400 <= status < 500 and status not in (408, 429):
+                raise MemoryRejectedError(f"HTTP {status}") from e
             logger.error("Erreur backend Jarvis (add): %s", e)
             return None
         except Exception:
             logger.exception("Erreur inattendue lors de l'ajout mémoire")
             return None
 
-    def query_memory(self, question: str) -> dict | None:
+    async def query_memory(self, question: str) -> dict | None:
         """
         Interroge la mémoire conversationnelle via POST /memory/query.
 
@@ -48,21 +73,70 @@ class JarvisClient:
         temporalContext?), ou None en cas d'erreur.
         """
         try:
-            resp = self._session.post(
-                f"{self._base_url}/memory/query",
+            resp = await self._client.post(
+                "/memory/query",
                 json={"query": question},
+                headers=tracing.headers(),
                 timeout=180,
             )
             resp.raise_for_status()
             return resp.json()
-        except requests.ConnectionError:
+        except httpx.ConnectError:
             logger.error(
                 "Impossible de joindre le backend Jarvis à %s", self._base_url
             )
             return None
-        except requests.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             logger.error("Erreur backend Jarvis (query): %s", e)
             return None
         except Exception:
             logger.exception("Erreur inattendue lors de la requête mémoire")
             return None
+
+    async def query_memory_stream(self, question: str) -> AsyncGenerator[str, None]:
+        """
+        Interroge la mémoire via POST /memory/query/stream (SSE).
+
+        Génère les tokens de la réponse au fil de leur production par le LLM.
+        En cas d'erreur, le générateur s'arrête simplement (l'appelant peut
+        se rabattre sur query_memory si rien n'a été produit). Fermer le
+        générateur (ou annuler la tâche qui le consomme) ferme la connexion,
+        ce qui interrompt la génération côté backend.
+        """
+        try:
+            async with self._client.stream(
+                "POST",
+                "/memory/query/stream",
+                json={"query": question},
+                headers=tracing.headers(),
+                timeout=httpx.Timeout(180, connect=5),
+            ) as resp:
+                resp.raise_for_status()
+                event = "message"
+                async for line in resp.aiter_lines():
+                    if not line:
+                        event = "message"
+                        continue
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                        continue
+                    if not line.startswith("data:"):
+                        continue
+                    data = json.loads(line[5:])
+                    if event == "metadata":
+                        logger.debug("Métadonnées mémoire: %s", data)
+                    elif "token" in data:
+                        yield data["token"]
+                    elif "error" in data:
+                        logger.error("Erreur backend Jarvis (query/stream): %s", data["error"])
+                        return
+                    elif data.get("done"):
+                        return
+        except httpx.ConnectError:
+            logger.error(
+                "Impossible de joindre le backend Jarvis à %s", self._base_url
+            )
+        except httpx.HTTPStatusError as e:
+            logger.error("Erreur backend Jarvis (query/stream): %s", e)
+        except Exception:
+            logger.exception("Erreur inattendue lors de la requête mémoire streamée")
@@ -0,0 +1,225 @@
+"""File locale durable (write-ahead) pour les commandes ADD.
+
+Une commande ADD est ajoutee au journal `MEMORY_QUEUE_FILE` (une ligne JSON,
+fsync avant de rendre la main) puis confirmee tout de suite a l'utilisateur :
+la latence percue est celle du disque local, plus celle du backend. Une tache
+de fond vide le journal vers POST /memory/add :
+
+- par lots de `MEMORY_QUEUE_BATCH` entrees envoyees en parallele ;
+- echec transitoire (backend injoignable, timeout, 5xx) : l'entree est
+  renvoyee avec un backoff exponentiel (plafond `MEMORY_RETRY_MAX_SEC`) ;
+- refus definitif (4xx) : l'entree est deplacee dans `<fichier>.rejected.jsonl`
+  plutot que perdue ;
+- cle d'idempotence : l'id (UUID) de l'entree devient l'identifiant du
+  souvenir cote backend ; un renvoi apres un accuse perdu retrouve le point
+  deja stocke et le renvoie tel quel, sans le dupliquer ni le reecrire. `spoken_at` garde la reference temporelle
+  (« demain ») du moment ou la phrase a ete dite.
+
+Format du journal : `{"op": "add", "id", "text", "spoken_at"}` puis
+`{"op": "done", "id"}` quand le backend a accuse reception. Au demarrage le
+journal est relu (une derniere ligne tronquee par un arret brutal est
+ignoree), les entrees sans `done` sont renvoyees et le fichier est compacte.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from config import Config
+from jarvis_client import JarvisClient, MemoryRejectedError
+
+logger = logging.getLogger(__name__)
+
+_RETRY_BASE_SEC = 1.0
+
+
+@dataclass
+class _Entry:
+    id: str
+    text: str
+    spoken_at: str
+    attempts: int = 0
+    next_try: float = 0.0  # time.monotonic()
+
+    def record(self) -> dict:
+        return {"op": "add", "id": self.id, "text": self.text, "spoken_at": self.spoken_at}
+
+
+def _fsync_dir(path: Path) -> None:
+    """Rend durable la creation / le remplacement d'un fichier dans *path*."""
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class MemoryQueue:
+    def __init__(self, config: Config, jarvis_client: JarvisClient):
+        self._path = Path(config.memory_queue_file)
+        self._rejected_path = self._path.with_suffix(".rejected.jsonl")
+        self._jarvis = jarvis_client
+        self._batch = max(1, config.memory_queue_batch)
+        self._retry_max = config.memory_retry_max_sec
+        self._pending: dict[str, _Entry] = {}  # ordre d'arrivee
+        self._file = None
+        # Serialise les acces au fichier faits depuis les threads de asyncio.to_thread
+        # (`add` de put(), `done` et troncature de run()). _truncate reverifie _pending
+        # sous ce verrou, et put() inscrit l'entree dans _pending avant d'ecrire son
+        # `add` : une troncature ne peut donc jamais effacer un `add` non acquitte.
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self.sent = 0
+        self.retries = 0
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def open(self) -> None:
+        """Relit le journal, garde les entrees non acquittees et le compacte."""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        if self._path.exists():
+            with open(self._path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            for n, line in enumerate(lines, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    if n == len(lines):
+                        logger.warning("Journal ADD: derniere ligne tronquee ignoree (%s).", self._path)
+                    else:
+                        logger.error("Journal ADD: ligne %d illisible ignoree (%s): %r", n, self._path, line)
+                    continue
+                # JSON valide mais pas un enregistrement du journal : ignore comme une ligne illisible
+                try:
+                    if record["op"] == "add":
+                        entry = _Entry(str(record["id"]), str(record["text"]), str(record["spoken_at"]))
+                        self._pending[entry.id] = entry
+                    elif record["op"] == "done":
+                        self._pending.pop(str(record["id"]), None)
+                    else:
+                        raise ValueError(record["op"])
+                except (KeyError, TypeError, ValueError):
+                    logger.error("Journal ADD: ligne %d mal formee ignoree (%s): %r", n, self._path, line)
+            if self._pending:
+                logger.info("Journal ADD: %d entree(s) en attente rejouee(s).", len(self._pending))
+        self._rewrite(self._pending.values())
+        self._file = open(self._path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._pending:
+            logger.info("Journal ADD: %d entree(s) en attente, renvoyee(s) au prochain demarrage.",
+                        len(self._pending))
+
+    async def put(self, text: str) -> str:
+        """Journalise *text* (fsync) et retourne son id ; l'envoi au backend suit en arriere-plan."""
+        entry = _Entry(str(uuid.uuid4()), text, datetime.now().astimezone().isoformat(), next_try=math.inf)
+        # Connue avant l'ecriture (le journal n'est pas tronque entre-temps), envoyee seulement apres le fsync
+        self._pending[entry.id] = entry
+        try:
+            await asyncio.to_thread(self._append, [entry.record()], True)
+        except BaseException:
+            del self._pending[entry.id]
+            raise
+        entry.next_try = 0.0
+        self._wakeup.set()
+        return entry.id
+
+    async def run(self) -> None:
+        """Tache de fond : vide le journal vers le backend jusqu'a annulation."""
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            due = [e for e in self._pending.values() if e.next_try <= now][:self._batch]
+            if not due:
+                timeout = min((e.next_try for e in self._pending.values() if e.next_try != math.inf), default=None)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), None if timeout is None else timeout - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            settled = [e for e, ok in zip(due, await asyncio.gather(*(self._send(e) for e in due))) if ok]
+            if not settled:
+                continue
+            await asyncio.to_thread(self._append, [{"op": "done", "id": e.id} for e in settled], False)
+            for entry in settled:
+                del self._pending[entry.id]
+            if not self._pending:
+                await asyncio.to_thread(self._truncate)
+
+    def stats(self) -> dict:
+        return {"pending": self.pending, "sent": self.sent, "retries": self.retries, "rejected": self.rejected}
+
+    async def _send(self, entry: _Entry) -> bool:
+        """True si l'entree est reglee (acceptee ou refusee definitivement)."""
+        try:
+            result = await self._jarvis.add_memory(entry.text, memory_id=entry.id, spoken_at=entry.spoken_at)
+        except MemoryRejectedError as e:
+            logger.error("Ajout memoire refuse par le backend (%s), entree deplacee dans %s: %s",
+                         e, self._rejected_path, entry.text)
+            await asyncio.to_thread(self._reject, entry)
+            self.rejected += 1
+            return True
+        if result is None:
+            entry.attempts += 1
+            delay = min(self._retry_max, _RETRY_BASE_SEC * 2 ** (entry.attempts - 1))
+            entry.next_try = time.monotonic() + delay * random.uniform(0.5, 1.0)
+            self.retries += 1
+            if entry.attempts == 1 or entry.attempts % 10 == 0:
+                logger.warning("Ajout memoire en attente (tentative %d, prochain essai dans ~%.0fs): %s",
+                               entry.attempts, delay, entry.text)
+            return False
+        self.sent += 1
+        logger.info(
+            "Mémorisé. eventDate=%s expression=%s",
+            result.get("eventDate", "—"),
+            result.get("expression", "—"),
+        )
+        return True
+
+    def _append(self, records: list[dict], durable: bool) -> None:
+        # Un `done` perdu ne coute qu'un renvoi idempotent : seul `add` est fsync
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+            if durable:
+                os.fsync(self._file.fileno())
+
+    def _truncate(self) -> None:
+        with self._lock:
+            if not self._pending:
+                self._file.truncate(0)
+                os.fsync(self._file.fileno())
+
+    def _rewrite(self, entries) -> None:
+        tmp = self._path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(e.record(), ensure_ascii=False) + "\n" for e in entries)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path)
+        _fsync_dir(self._path.parent)
+
+    def _reject(self, entry: _Entry) -> None:
+        with open(self._rejected_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry.record(), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
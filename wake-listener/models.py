@@ -0,0 +1,199 @@
+"""Manifeste local des modeles (OpenWakeWord, Silero, Piper) avec sommes de controle.
+
+Au demarrage, chaque fichier requis est verifie contre `models/manifest.json`
+(taille + SHA-256) au lieu d'interroger le reseau. Le SHA-256 n'est recalcule
+que si la taille ou la date de modification ont change : un demarrage normal
+ne fait que des `stat()`.
+
+- Fichier absent ou somme incorrecte : telechargement (sauf MODELS_OFFLINE=true,
+  auquel cas le demarrage echoue avec la liste des fichiers en cause).
+- Fichier present mais absent du manifeste : ajoute tel quel (premier demarrage
+  ou mise a jour manuelle d'un modele).
+
+`python models.py` verifie (et complete) le manifeste sans lancer le listener.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import urllib.request
+from pathlib import Path
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path(__file__).parent / "models"
+MANIFEST_PATH = MODELS_DIR / "manifest.json"
+
+_HASH_BLOCK = 1 << 20
+
+
+_PIPER_BASE = (
+    "https://huggingface.co/rhasspy/piper-voices/resolve/v1.0.0"
+    "/fr/fr_FR/{voice}/{quality}"
+)
+
+
+class ModelCheckError(RuntimeError):
+    """Modele manquant ou corrompu alors que le telechargement est interdit."""
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(_HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def oww_files(config: Config, framework: str | None = None) -> dict[str, Path]:
+    """
+    Fichiers OpenWakeWord utilises : features, wake word et (si Silero) VAD.
+
+    Le mode multi-pieces (cf. wake_batch.py) utilise toujours les versions ONNX.
+    """
+    import openwakeword
+
+    framework = framework or ("onnx" if config.multi_room else config.wake_inference_framework)
+    suffix = "." + framework
+
+    def resolve(model_path: str) -> Path:
+        return Path(model_path).with_suffix(suffix)
+
+    files = {f"oww/{name}": resolve(info["model_path"]) for name, info in openwakeword.FEATURE_MODELS.items()}
+    if Path(config.wake_model).suffix in (".onnx", ".tflite"):
+        files["oww/wake"] = Path(config.wake_model)  # modele personnalise, jamais telecharge
+    elif config.wake_model in openwakeword.MODELS:
+        files[f"oww/{config.wake_model}"] = resolve(openwakeword.MODELS[config.wake_model]["model_path"])
+    if config.endpointer == "silero":
+        files.update({f"oww/{name}": Path(info["model_path"]) for name, info in openwakeword.VAD_MODELS.items()})
+    return files
+
+
+def _piper_files(config: Config) -> dict[str, Path]:
+    if not config.tts_enabled:
+        return {}
+    onnx_path = MODELS_DIR / f"{config.tts_model}.onnx"
+    return {"piper/model": onnx_path, "piper/config": onnx_path.with_suffix(".onnx.json")}
+
+
+def ensure_piper_model(model_name: str) -> Path:
+    """Télécharge le modèle Piper depuis HuggingFace si absent."""
+    MODELS_DIR.mkdir(exist_ok=True)
+
+    onnx_path = MODELS_DIR / f"{model_name}.onnx"
+    json_path = MODELS_DIR / f"{model_name}.onnx.json"
+
+    # Extraire voix et qualité depuis le nom (ex. "fr_FR-gilles-low" → "gilles", "low")
+    parts = model_name.split("-")
+    voice_short = parts[1] if len(parts) > 1 else model_name
+    quality = parts[2] if len(parts) > 2 else "medium"
+    base_url = _PIPER_BASE.format(voice=voice_short, quality=quality)
+
+    if not onnx_path.exists():
+        url = f"{base_url}/{model_name}.onnx"
+        logger.info("Téléchargement du modèle Piper: %s ...", url)
+        urllib.request.urlretrieve(url, onnx_path)
+        logger.info("Modèle téléchargé: %s", onnx_path)
+
+    if not json_path.exists():
+        url = f"{base_url}/{model_name}.onnx.json"
+        logger.info("Téléchargement de la config Piper: %s ...", url)
+        urllib.request.urlretrieve(url, json_path)
+        logger.info("Config téléchargée: %s", json_path)
+
+    return onnx_path
+
+
+class Manifest:
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        if path.exists():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8"))["files"]
+            except (OSError, ValueError, KeyError):
+                logger.warning("Manifeste %s illisible — reconstruit.", path)
+        self._dirty = False
+
+    def check(self, name: str, path: Path) -> bool:
+        """True si *path* existe et correspond a l'entree *name* (ajoutee si absente)."""
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        entry = self.entries.get(name)
+        if entry and entry["path"] == str(path) and entry["size"] == st.st_size \
+                and entry["mtime_ns"] == st.st_mtime_ns:
+            return True
+        digest = _sha256(path)
+        if entry and entry["path"] == str(path) and entry["sha256"] != digest:
+            logger.error("Somme de controle incorrecte pour %s (%s).", name, path)
+            return False
+        if entry is None or entry["path"] != str(path):
+            logger.info("Manifeste: ajout de %s (%s).", name, path)
+        self.record(name, path, digest)
+        return True
+
+    def record(self, name: str, path: Path, digest: str | None = None) -> None:
+        st = path.stat()
+        self.entries[name] = {
+            "path": str(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": digest or _sha256(path),
+        }
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"files": self.entries}, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+def ensure_models(config: Config) -> None:
+    """
+    Verifie les modeles requis contre le manifeste ; telecharge seulement ceux
+    qui manquent ou sont corrompus (jamais si `models_offline`).
+    """
+    manifest = Manifest()
+    oww, piper = oww_files(config), _piper_files(config)
+    bad = {name: path for name, path in {**oww, **piper}.items() if not manifest.check(name, path)}
+    if bad:
+        if config.models_offline:
+            manifest.save()
+            raise ModelCheckError(
+                "Modeles manquants ou corrompus (MODELS_OFFLINE=true): "
+                + ", ".join(f"{name} ({path})" for name, path in bad.items())
+            )
+        if "oww/wake" in bad:
+            raise ModelCheckError(f"Modele wake word personnalise illisible: {config.wake_model}")
+        for path in bad.values():
+            path.unlink(missing_ok=True)
+        if bad.keys() & oww.keys():
+            import openwakeword.utils
+
+            logger.info("Telechargement des modeles OpenWakeWord...")
+            # Features et VAD toujours ; un chemin de modele personnalise ne correspond a aucun nom
+            openwakeword.utils.download_models(model_names=[config.wake_model])
+        if bad.keys() & piper.keys():
+            ensure_piper_model(config.tts_model)
+        for name, path in bad.items():
+            if not path.exists():
+                raise ModelCheckError(f"Modele introuvable apres telechargement: {name} ({path})")
+            manifest.record(name, path)
+    manifest.save()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    from config import load_config
+
+    ensure_models(load_config())
+    logger.info("Modeles conformes au manifeste %s.", MANIFEST_PATH)
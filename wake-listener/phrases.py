@@ -0,0 +1,12 @@
+"""Phrases fixes du wake listener : pre-synthetisees au demarrage (cf. TtsClient.preload)."""
+
+PROMPT_PHRASES = ["Je t'écoute.", "À l'écoute.", "Dis-moi.", "Oui ?", "Je suis là."]
+PROCESSING_PHRASES = ["Analyse en cours.", "Un instant.", "Je traite ça.", "Je réfléchis."]
+ADD_DONE_PHRASES = ["C'est noté.", "Bien noté.", "Enregistré.", "Je m'en souviens."]
+QUERY_PENDING_PHRASES = ["Je cherche dans ma mémoire.", "Laisse-moi réfléchir.", "Je consulte mes souvenirs."]
+ANSWER_INTRO_PHRASES = ["Voilà.", "Bien sûr.", "Je réponds."]
+ERROR_PHRASES = ["Désolé, une erreur est survenue.", "Je n'ai pas pu faire ça.", "Quelque chose s'est mal passé."]
+ALL_PHRASES = (
+    PROMPT_PHRASES + PROCESSING_PHRASES + ADD_DONE_PHRASES
+    + QUERY_PENDING_PHRASES + ANSWER_INTRO_PHRASES + ERROR_PHRASES
+)
@@ -0,0 +1,514 @@
+"""Pipeline asyncio du wake listener : les etapes tournent en parallele.
+
+    capture (callback PyAudio) → wake (thread) → record → transcribe → act → speak (PlaybackEngine)
+
+Les etapes sont reliees par des files bornees : pendant que l'interaction N
+est transcrite, classifiee ou traitee par le backend, l'ecoute du wake word
+continue et l'interaction N+1 peut deja etre enregistree. Un nouveau wake
+word pre-empte les interactions en cours : leur lecture est coupee, une
+reponse QUERY en cours de generation est abandonnee (connexion fermee). Un
+ADD est ecrit dans la file locale durable (cf. memory_queue.py) et confirme
+aussitot ; l'envoi au backend se fait en arriere-plan, meme pre-empte.
+
+Le wake word est ignore pendant un enregistrement (l'utilisateur est en
+train de dicter sa commande).
+
+En mode multi-pieces (ROOMS), chaque `Room` a sa capture, sa porte, son
+end-pointer, sa sortie audio et ses propres etapes record/transcribe/act :
+les pieces s'enregistrent et se repondent independamment. Le thread wake
+est commun et evalue les frames de toutes les pieces actives en un seul
+appel par tick (cf. wake_batch.py) ; la voix Piper et les clients HTTP sont
+partages.
+"""
+
+import asyncio
+import contextvars
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import AsyncGenerator
+
+import numpy as np
+
+import speculation
+import tracing
+from audio_prep import trim_silence
+from capture import AudioCapture, CaptureReader
+from command_classifier import CommandType, classify
+from config import Config
+from endpointing import Endpointer
+from jarvis_client import JarvisClient
+from memory_queue import MemoryQueue
+from phrases import (
+    ADD_DONE_PHRASES,
+    ANSWER_INTRO_PHRASES,
+    ERROR_PHRASES,
+    PROCESSING_PHRASES,
+    PROMPT_PHRASES,
+    QUERY_PENDING_PHRASES,
+)
+from playback import Priority
+from recorder import record_until_silence
+from stt_client import SttClient, SttStream
+from tts_client import TtsClient, iter_sentences
+from wake_gate import WakeGate
+
+logger = logging.getLogger("wake_listener")
+
+
+@dataclass
+class WakeEvent:
+    cursor: int
+    model_name: str
+    score: float
+    predict_ms: float
+
+
+@dataclass
+class Room:
+    """Etat propre a un micro : capture, porte, end-pointing, sortie audio et files des etapes."""
+
+    name: str
+    capture: AudioCapture
+    gate: WakeGate
+    endpointer: Endpointer
+    tts: TtsClient
+    recording: threading.Event = field(default_factory=threading.Event)
+    in_flight: list["Interaction"] = field(default_factory=list)
+    wake_q: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=1))
+    stt_q: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=2))
+    act_q: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=2))
+
+    @property
+    def idle(self) -> bool:
+        return not self.in_flight and self.wake_q.empty() and not self.recording.is_set()
+
+
+@dataclass
+class Interaction:
+    room: Room
+    trace: tracing.Trace
+    reader: CaptureReader
+    dropped_before: dict
+    superseded: bool = False
+    stt_stream: SttStream | None = None
+    pcm: np.ndarray | None = None
+    text: str | None = None
+    answer_task: asyncio.Task | None = field(default=None, repr=False)
+
+
+class Pipeline:
+    def __init__(
+        self,
+        config: Config,
+        rooms: list[Room],
+        wake_model,
+        stt_client: SttClient,
+        jarvis_client: JarvisClient,
+    ):
+        """`wake_model` : OwwWakeModel (une piece) ou BatchedWakeModel (cf. wake_batch.py)."""
+        self._config = config
+        self._rooms = rooms
+        self._wake = wake_model
+        self._stt = stt_client
+        self._jarvis = jarvis_client
+        self.memory_queue = MemoryQueue(config, jarvis_client)
+
+        self._stop = threading.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.wake_cpu_sec = 0.0  # temps CPU du thread wake (lecture + porte + OWW)
+
+    def stop(self) -> None:
+        """Demande l'arret (appelable depuis un gestionnaire de signal)."""
+        self._stop.set()
+
+    @property
+    def idle(self) -> bool:
+        """Aucune interaction en attente ni en cours."""
+        return all(room.idle for room in self._rooms)
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self.memory_queue.open)
+        stages = [asyncio.create_task(self.memory_queue.run(), name="memory_queue")] + [
+            asyncio.create_task(stage(room), name=f"{stage.__name__.strip('_')}:{room.name}")
+            for room in self._rooms
+            for stage in (self._record_stage, self._transcribe_stage, self._act_stage)
+        ]
+        try:
+            await asyncio.to_thread(self._wake_loop)
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            self.memory_queue.close()
+            await self._stt.aclose()
+            await self._jarvis.aclose()
+
+    # ------------------------------------------------------------------
+    # Etape wake (thread : lecture bloquante du ring buffer + inference OWW)
+    # ------------------------------------------------------------------
+
+    def _wake_loop(self) -> None:
+        cpu_started = time.thread_time()
+        try:
+            self._detect_wake_words()
+        finally:
+            self.wake_cpu_sec += time.thread_time() - cpu_started
+
+    def _detect_wake_words(self) -> None:
+        config = self._config
+        readers = {room.name: room.capture.reader() for room in self._rooms}
+        was_recording: set[str] = set()
+
+        while not self._stop.is_set():
+            # Un frame par piece, puis une seule inference pour les pieces actives
+            frames: dict[str, np.ndarray] = {}
+            for room in self._rooms:
+                reader = readers[room.name]
+                audio_frame = reader.read_array(config.chunk_size)
+
+                if room.recording.is_set():
+                    was_recording.add(room.name)
+                    continue
+                if room.name in was_recording:
+                    # Trou dans les features OWW pendant l'enregistrement
+                    was_recording.discard(room.name)
+                    self._wake.reset(room.name)
+                room.endpointer.observe_ambient(audio_frame)
+
+                # Porte d'energie : pas d'inference OWW pendant le silence
+                run_oww, gate_opened = room.gate.check(audio_frame)
+                if not run_oww:
+                    continue
+                if gate_opened:
+                    # Rejouer l'audio recent pour que les features OWW soient contigues
+                    self._wake.reset(room.name)
+                    frame_start = reader.cursor - config.chunk_size
+                    replay = room.capture.reader(room.gate.replay_sec, start=frame_start)
+                    while replay.cursor + config.chunk_size <= frame_start:
+                        self._wake.predict({room.name: replay.read_array(config.chunk_size)})
+                frames[room.name] = audio_frame
+
+            if not frames:
+                continue
+
+            # Prediction OpenWakeWord
+            predict_started = time.monotonic()
+            predictions = self._wake.predict(frames)
+            predict_ms = (time.monotonic() - predict_started) * 1000
+
+            for room in self._rooms:
+                if room.name not in frames:
+                    continue
+                room.gate.record_predict(predict_ms / len(frames))
+                # Verifier si le wake word est detecte
+                for model_name, score in predictions[room.name].items():
+                    if score >= config.wake_threshold:
+                        logger.info(
+                            "*** Wake word detecte! (piece=%s, modele=%s, score=%.3f)",
+                            room.name or "-",
+                            model_name,
+                            score,
+                        )
+                        # Barge-in : une reponse encore en cours de lecture est coupee
+                        room.tts.interrupt()
+                        # Bloque la detection jusqu'a la prise en charge par l'etape record
+                        room.recording.set()
+                        event = WakeEvent(readers[room.name].cursor, model_name, float(score), predict_ms)
+                        self._loop.call_soon_threadsafe(room.wake_q.put_nowait, event)
+                        self._wake.reset(room.name)
+                        break
+
+    # ------------------------------------------------------------------
+    # Etapes asyncio
+    # ------------------------------------------------------------------
+
+    async def _record_stage(self, room: Room) -> None:
+        config = self._config
+        while True:
+            event = await room.wake_q.get()
+            self._supersede_in_flight(room)
+
+            trace = tracing.Trace()
+            trace.attrs.update(
+                wake_model=event.model_name,
+                wake_score=round(event.score, 3),
+                wake_predict_ms=round(event.predict_ms, 1),
+                wake_audio_sec=round(event.cursor / config.sample_rate, 3),
+            )
+            if room.name:
+                trace.attrs["room"] = room.name
+            # Le lecteur d'enregistrement demarre au wake word (moins le pre-roll)
+            interaction = Interaction(
+                room=room,
+                trace=trace,
+                reader=room.capture.reader(config.preroll_sec, start=event.cursor),
+                dropped_before=room.capture.stats(),
+            )
+            room.in_flight.append(interaction)
+
+            try:
+                with tracing.activate(trace):
+                    # Le micro entend le prompt : ce qui est dit avant sa lecture est garde
+                    # comme pre-roll, la fenetre de lecture (plus la marge d'echo) est sautee
+                    # pour que ni l'end-pointer ni la transcription ne voient le prompt
+                    with tracing.span("prompt") as span:
+                        prompt_start = room.capture.write_pos
+                        prompt = room.tts.speak_random(PROMPT_PHRASES, Priority.PROMPT, wait=False)
+                        preroll = None
+                        if prompt is not None:
+                            reader = interaction.reader
+                            preroll = reader.read_array(max(0, prompt_start - reader.cursor))
+                            await asyncio.to_thread(prompt.wait)
+                            resume = room.capture.write_pos + int(config.prompt_echo_tail_sec * config.sample_rate)
+                            interaction.reader = room.capture.reader(start=resume)
+                            span["skipped_sec"] = round((resume - prompt_start) / config.sample_rate, 2)
+
+                    # Enregistrer jusqu'au silence (en streamant vers le STT si active)
+                    with tracing.span("record") as span:
+                        if config.stt_streaming:
+                            interaction.stt_stream = await asyncio.to_thread(self._stt.open_stream)
+                        stt_stream = interaction.stt_stream
+                        interaction.pcm = await asyncio.to_thread(
+                            record_until_silence,
+                            interaction.reader,
+                            config,
+                            on_frame=stt_stream.send if stt_stream else None,
+                            endpointer=room.endpointer,
+                            preroll=preroll,
+                        )
+                        span["audio_sec"] = round(len(interaction.pcm) / config.sample_rate, 2)
+                    if config.trim_silence:
+                        # Vue sur l'enregistrement : sert au repli POST si le streaming echoue
+                        with tracing.span("trim") as span:
+                            interaction.pcm = trim_silence(interaction.pcm, config)
+                            span["audio_sec"] = round(len(interaction.pcm) / config.sample_rate, 2)
+                    # Position de fin sur l'horloge de capture (delai d'end-pointing)
+                    trace.attrs["record_end_audio_sec"] = round(interaction.reader.cursor / config.sample_rate, 3)
+            except Exception:
+                logger.exception("Erreur pendant l'enregistrement")
+                if interaction.stt_stream is not None:
+                    # Session WebSocket ouverte (et creneau d'admission cote serveur) : a liberer
+                    await asyncio.to_thread(interaction.stt_stream.abort)
+                self._finish(interaction)
+                continue
+            finally:
+                room.recording.clear()
+
+            logger.info(
+                "Enregistrement termine (%.1fs d'audio). Envoi au STT...",
+                len(interaction.pcm) / config.sample_rate,
+            )
+            room.tts.speak_async(random.choice(PROCESSING_PHRASES))
+            await room.stt_q.put(interaction)
+
+    async def _transcribe_stage(self, room: Room) -> None:
+        while True:
+            interaction = await room.stt_q.get()
+            try:
+                with tracing.activate(interaction.trace):
+                    stt_stream = interaction.stt_stream
+                    with tracing.span("stt", streaming=bool(stt_stream)):
+                        if stt_stream and not stt_stream.broken:
+                            interaction.text = await asyncio.to_thread(stt_stream.finish)
+                        else:
+                            interaction.text = await self._stt.transcribe_pcm(interaction.pcm)
+            except Exception:
+                logger.exception("Erreur pendant la transcription")
+
+            if not interaction.text:
+                logger.info("Aucune parole detectee ou transcription vide.")
+                self._finish(interaction)
+                continue
+            logger.info("TRANSCRIPTION: %s", interaction.text)
+            await room.act_q.put(interaction)
+
+    async def _act_stage(self, room: Room) -> None:
+        while True:
+            interaction = await room.act_q.get()
+            try:
+                with tracing.activate(interaction.trace):
+                    await self._route_command(interaction)
+            except Exception:
+                logger.exception("Erreur pendant le traitement de la commande")
+            finally:
+                self._finish(interaction)
+
+    # ------------------------------------------------------------------
+    # Routage des commandes
+    # ------------------------------------------------------------------
+
+    async def _route_command(self, interaction: Interaction) -> None:
+        """
+        Classifie la transcription et route vers le bon endpoint de la mémoire.
+
+        - ADD   → file locale durable, puis POST /memory/add en arrière-plan
+        - QUERY → POST /memory/query/stream (réponse LLM lue phrase par phrase),
+                  ou POST /memory/query si ANSWER_STREAMING=false
+        - UNKNOWN → log simple, aucun appel backend
+
+        Avec SPECULATIVE_QUERY=true, la requête mémoire streamée est lancée dès
+        que la classification part vers le LLM, et jetée si l'intention n'est
+        pas QUERY.
+        """
+        config = self._config
+        tts = interaction.room.tts
+        text = interaction.text
+        speculative: list[speculation.SpeculativeQuery] = []
+
+        def speculate() -> None:
+            # Appelé depuis le thread de classification : la tâche est créée
+            # dans la boucle, avec le contexte (trace) de l'interaction
+            ctx = contextvars.copy_context()
+            self._loop.call_soon_threadsafe(
+                lambda: speculative.append(speculation.SpeculativeQuery(self._jarvis, text)), context=ctx
+            )
+
+        try:
+            with tracing.span("classify") as span:
+                command_type, content = await asyncio.to_thread(
+                    classify,
+                    text,
+                    jarvis_api_url=config.jarvis_api_url,
+                    on_llm_call=speculate if config.speculative_query else None,
+                )
+                span["result"] = command_type.value
+
+            tokens = None
+            if speculative:
+                with tracing.span("speculation") as span:
+                    if command_type == CommandType.QUERY and not interaction.superseded:
+                        tokens, saved_ms = speculative[0].use()
+                        span.update(outcome="used", saved_ms=round(saved_ms, 1))
+                        logger.info("Requête mémoire spéculative utilisée (%.0f ms d'avance).", saved_ms)
+                    else:
+                        wasted = speculative[0].discard()
+                        span.update(outcome="discarded", **wasted)
+                        logger.info("Requête mémoire spéculative jetée: %s", wasted)
+
+            if command_type == CommandType.ADD:
+                # Toujours journalisé, même pré-empté : seule l'annonce est omise
+                logger.info("Commande ADD détectée. Contenu à mémoriser: %s", content)
+                try:
+                    with tracing.span("add_memory"):
+                        await self.memory_queue.put(content)
+                except OSError:
+                    logger.exception("Écriture dans la file ADD locale impossible.")
+                    self._speak_unless_superseded(interaction, random.choice(ERROR_PHRASES))
+                    return
+                with tracing.span("tts_answer"):
+                    self._speak_unless_superseded(interaction, random.choice(ADD_DONE_PHRASES))
+
+            elif command_type == CommandType.QUERY:
+                logger.info("Commande QUERY détectée. Question: %s", content)
+                if interaction.superseded:
+                    logger.info("Question abandonnée (nouvelle interaction en cours).")
+                    return
+                tts.speak_async(random.choice(QUERY_PENDING_PHRASES))
+                interaction.answer_task = asyncio.create_task(self._answer(interaction, content, tokens))
+                try:
+                    await interaction.answer_task
+                except asyncio.CancelledError:
+                    if not interaction.superseded:
+                        raise
+                    logger.info("Réponse abandonnée (nouvelle interaction en cours).")
+
+            else:
+                logger.info("Commande non reconnue (UNKNOWN). Texte ignoré: %s", text)
+        finally:
+            # Rejetée, pré-emptée, lue ou abandonnée avant d'être lue (générateur jamais
+            # démarré) : la requête spéculative est toujours arrêtée explicitement
+            for query in speculative:
+                if not query.settled:
+                    query.discard()
+                query.cancel()
+
+    async def _answer(
+        self, interaction: Interaction, question: str, tokens: AsyncGenerator[str, None] | None
+    ) -> None:
+        tts = interaction.room.tts
+        if tokens is None and self._config.answer_streaming:
+            tokens = self._jarvis.query_memory_stream(question)
+        if tokens is not None and await self._speak_streamed_answer(tts, tokens):
+            return
+
+        with tracing.span("query_memory"):
+            result = await self._jarvis.query_memory(question)
+        if result:
+            answer = result.get("answer", "")
+            logger.info(
+                "RÉPONSE JARVIS: %s  [contexte temporel: %s]",
+                answer,
+                result.get("temporalContext", "aucun"),
+            )
+            with tracing.span("tts_answer", chars=len(answer)):
+                tts.speak_random(ANSWER_INTRO_PHRASES, wait=False)
+                tts.speak(answer, wait=False)
+        else:
+            logger.warning("La requête mémoire a échoué (backend injoignable ou erreur).")
+            tts.speak_random(ERROR_PHRASES, wait=False)
+
+    async def _speak_streamed_answer(self, tts: TtsClient, tokens: AsyncGenerator[str, None]) -> bool:
+        """
+        Lit la réponse streamée phrase par phrase : la première phrase est
+        synthétisée dès qu'elle est complète, pendant que le LLM génère la suite.
+
+        Retourne False si aucune phrase n'a été reçue (l'appelant se rabat alors
+        sur la requête bloquante).
+        """
+        t0 = time.monotonic()
+
+        with tracing.span("query_memory_stream") as span:
+            async def sentences() -> AsyncGenerator[str, None]:
+                stream = iter_sentences(tokens)
+                try:
+                    first = await anext(stream, None)
+                    if first is None:
+                        return
+                    span["first_sentence_ms"] = round((time.monotonic() - t0) * 1000, 1)
+                    yield random.choice(ANSWER_INTRO_PHRASES)
+                    yield first
+                    async for sentence in stream:
+                        yield sentence
+                finally:
+                    await stream.aclose()
+
+            spoken = await tts.speak_stream(sentences())
+            span["sentences"] = max(0, len(spoken) - 1)
+
+        if not spoken:
+            logger.warning("Réponse streamée vide — repli sur la requête bloquante.")
+            return False
+        logger.info("RÉPONSE JARVIS: %s", " ".join(spoken[1:]))
+        return True
+
+    # ------------------------------------------------------------------
+    # Suivi des interactions en vol
+    # ------------------------------------------------------------------
+
+    def _supersede_in_flight(self, room: Room) -> None:
+        for interaction in room.in_flight:
+            if interaction.superseded:
+                continue
+            interaction.superseded = True
+            interaction.trace.attrs["superseded"] = True
+            if interaction.answer_task is not None:
+                interaction.answer_task.cancel()
+
+    def _speak_unless_superseded(
+        self, interaction: Interaction, text: str, priority: Priority = Priority.ANSWER
+    ) -> None:
+        if not interaction.superseded:
+            interaction.room.tts.speak(text, priority, wait=False)
+
+    def _finish(self, interaction: Interaction) -> None:
+        room = interaction.room
+        if interaction in room.in_flight:
+            room.in_flight.remove(interaction)
+        interaction.trace.attrs["dropped"] = {
+            k: v - interaction.dropped_before[k] for k, v in room.capture.stats().items()
+        }
+        tracing.finish(interaction.trace)
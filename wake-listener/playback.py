@@ -0,0 +1,139 @@
+"""Moteur de lecture audio unique : un flux de sortie persistant et une file a priorites.
+
+Toutes les sorties vocales (prompt, attentes, reponses) passent par un seul
+`sd.OutputStream` ouvert au demarrage et ecrit par un thread dedie : plus
+d'ouverture/fermeture du peripherique a chaque phrase, et plus de lectures
+concurrentes qui se chevauchent.
+
+- Les utterances sont jouees par priorite (`Priority.PROMPT` d'abord), puis
+  dans l'ordre d'arrivee.
+- Une attente (`Priority.FILLER`) encore en file est abandonnee des qu'une
+  autre utterance arrive : seule la plus recente reste, et jamais devant une
+  reponse.
+- `interrupt()` (barge-in) vide la file et coupe la lecture en cours en moins
+  d'un bloc (`block_sec`).
+"""
+
+import enum
+import itertools
+import logging
+import queue
+import threading
+from typing import Iterable
+
+import numpy as np
+import sounddevice as sd
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(enum.IntEnum):
+    PROMPT = 0
+    ANSWER = 1
+    FILLER = 2
+
+
+class Utterance:
+    """Element de la file : source de buffers int16 et evenement de fin."""
+
+    def __init__(self, chunks: Iterable[np.ndarray], priority: Priority):
+        self.chunks = chunks
+        self.priority = priority
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self.done.wait(timeout)
+
+
+class PlaybackEngine:
+    def __init__(self, sample_rate: int, block_sec: float = 0.05, device: int | None = None):
+        self._block = max(1, int(sample_rate * block_sec))
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._pending: list[Utterance] = []
+        self._current: Utterance | None = None
+        self._interrupted = False
+        self._running = True
+        self.interrupts = 0  # barge-ins depuis le demarrage (cf. TtsClient.speak_stream)
+
+        self._stream = sd.OutputStream(samplerate=sample_rate, channels=1, dtype="int16", device=device)
+        self._stream.start()
+        self._thread = threading.Thread(target=self._run, name="playback", daemon=True)
+        self._thread.start()
+
+    def play(self, chunks: Iterable[np.ndarray], priority: Priority = Priority.ANSWER) -> Utterance:
+        """Met une utterance en file ; `chunks` est consomme par le thread de lecture."""
+        utterance = Utterance(chunks, priority)
+        with self._lock:
+            # Une attente pas encore jouee est perimee des qu'autre chose arrive
+            for pending in self._pending:
+                if pending.priority == Priority.FILLER:
+                    pending.cancel()
+            self._pending = [u for u in self._pending if not u.cancelled]
+            self._pending.append(utterance)
+        self._queue.put((int(priority), next(self._seq), utterance))
+        return utterance
+
+    def interrupt(self) -> None:
+        """Barge-in : abandonne tout ce qui est en file et coupe la lecture en cours."""
+        with self._lock:
+            self.interrupts += 1
+            for pending in self._pending:
+                pending.cancel()
+            self._pending.clear()
+            if self._current is not None:
+                self._current.cancel()
+                self._interrupted = True
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return self._current is not None or bool(self._pending)
+
+    def close(self) -> None:
+        self.interrupt()
+        self._running = False
+        self._queue.put((-1, next(self._seq), None))
+        self._thread.join(timeout=2)
+        self._stream.stop()
+        self._stream.close()
+
+    def _run(self) -> None:
+        while self._running:
+            _, _, utterance = self._queue.get()
+            if utterance is None:
+                break
+            with self._lock:
+                if utterance in self._pending:
+                    self._pending.remove(utterance)
+                if utterance.cancelled:
+                    utterance.done.set()
+                    continue
+                self._current = utterance
+            try:
+                self._play(utterance)
+            except Exception:
+                logger.exception("Erreur lors de la lecture audio")
+            finally:
+                with self._lock:
+                    self._current = None
+                    interrupted, self._interrupted = self._interrupted, False
+                if interrupted:
+                    # Jette l'audio deja transmis au peripherique
+                    self._stream.abort()
+                    self._stream.start()
+                utterance.done.set()
+
+    def _play(self, utterance: Utterance) -> None:
+        for audio in utterance.chunks:
+            for i in range(0, len(audio), self._block):
+                if utterance.cancelled:
+                    return
+                self._stream.write(audio[i:i + self._block])
+            if utterance.cancelled:
+                return
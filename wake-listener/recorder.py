@@ -1,77 +1,92 @@
-"""Enregistrement audio post-wake avec detection de silence par RMS."""
+"""Enregistrement audio post-wake avec detection de fin de parole (VAD ou RMS)."""
 
 import io
 import math
 import struct
 import wave
 import logging
+from typing import Callable, Optional
 
 import numpy as np
 import pyaudio
 
+from capture import CaptureReader
 from config import Config
+from endpointing import Endpointer, build_endpointer, compute_rms  # noqa: F401 (compute_rms re-exporte)
 
 logger = logging.getLogger(__name__)
 
 
-def compute_rms(pcm: np.ndarray) -> float:
-    """Calcule le RMS (root mean square) d'un frame PCM int16."""
-    if len(pcm) == 0:
-        return 0.0
-    return float(np.sqrt(np.mean(pcm.astype(np.float64) ** 2)))
+def record_until_silence(
+    stream: "pyaudio.Stream | CaptureReader",
+    config: Config,
+    on_frame: Optional[Callable[[bytes], None]] = None,
+    endpointer: Optional[Endpointer] = None,
+    preroll: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Enregistre depuis le stream PyAudio (ou un lecteur du ring buffer de
+    capture) jusqu'a la fin de la parole.
 
+    La decision d'arret est deleguee a `endpointer` (construit depuis la
+    config si absent, cf. endpointing.py) ; `max_recording_sec` reste une
+    borne dure.
 
-def record_until_silence(stream: pyaudio.Stream, config: Config) -> bytes:
-    """
-    Enregistre depuis le stream PyAudio jusqu'a detection de silence.
+    Si `on_frame` est fourni, chaque frame PCM brut lui est transmis des sa
+    lecture (streaming vers le STT pendant l'enregistrement).
 
-    Arrete quand le RMS reste sous le seuil pendant `silence_duration_sec`
-    ou quand `max_recording_sec` est atteint.
+    `preroll` : PCM deja capte a placer en tete de l'enregistrement (parole
+    prononcee avant le prompt) ; il est transmis a `on_frame` mais pas a
+    l'end-pointer, qui ne juge que les frames lues ensuite.
 
-    Retourne les donnees audio encodees en WAV.
+    Retourne le PCM int16 mono enregistre : une vue sur un buffer
+    preallouee pour la duree max, sans concatenation ni re-encodage.
     """
-    frames: list[bytes] = []
+    if endpointer is None:
+        endpointer = build_endpointer(config)
+    endpointer.start()
+
     frames_per_sec = config.sample_rate / config.chunk_size
-    silence_frame_limit = int(config.silence_duration_sec * frames_per_sec)
     max_frames = int(config.max_recording_sec * frames_per_sec)
-    silent_frames = 0
+    if preroll is None:
+        preroll = np.zeros(0, dtype=np.int16)
+    pcm_buffer = np.empty(len(preroll) + max_frames * config.chunk_size, dtype=np.int16)
+    n_samples = 0
 
-    logger.debug(
-        "Enregistrement: seuil silence=%.0f, limite=%d frames (~%.1fs), max=%d frames",
-        config.silence_threshold,
-        silence_frame_limit,
-        config.silence_duration_sec,
-        max_frames,
-    )
+    logger.debug("Enregistrement: max=%d frames (~%.0fs)", max_frames, config.max_recording_sec)
+
+    if len(preroll):
+        pcm_buffer[:len(preroll)] = preroll
+        n_samples = len(preroll)
+        if on_frame is not None:
+            for start in range(0, len(preroll), config.chunk_size):
+                on_frame(preroll[start:start + config.chunk_size].tobytes())
 
     for i in range(max_frames):
         raw = stream.read(config.chunk_size, exception_on_overflow=False)
-        frames.append(raw)
+        if on_frame is not None:
+            on_frame(raw)
 
         pcm = np.frombuffer(raw, dtype=np.int16)
-        rms = compute_rms(pcm)
-
-        if rms < config.silence_threshold:
-            silent_frames += 1
-        else:
-            silent_frames = 0
+        pcm_buffer[n_samples:n_samples + len(pcm)] = pcm
+        n_samples += len(pcm)
 
-        if silent_frames >= silence_frame_limit:
+        if endpointer.update(pcm):
             logger.info(
-                "Silence detecte apres %d frames (~%.1fs)",
+                "Fin de parole detectee apres %d frames (~%.1fs)%s",
                 i + 1,
                 (i + 1) / frames_per_sec,
+                "" if endpointer.heard_speech else " — aucune parole",
             )
             break
-
-    if silent_frames < silence_frame_limit:
+    else:
         logger.info("Duree max d'enregistrement atteinte (%.0fs)", config.max_recording_sec)
 
-    return encode_wav(frames, config.sample_rate)
+    return pcm_buffer[:n_samples]
 
 
 def encode_wav(frames: list[bytes], sample_rate: int) -> bytes:
-    """Encode une liste de frames PCM brutes en bytes WAV."""
+    """Encode une liste de frames PCM brutes en bytes WAV (chemin multipart /transcribe)."""
     buf = io.BytesIO()
     with wave.open(buf, "wb") as wf:
         wf.setnchannels(1)
@@ -0,0 +1,472 @@
+"""Banc de rejeu hors ligne du pipeline wake word → commande.
+
+Rejoue un corpus de WAV annotes dans le vrai pipeline (Pipeline, porte
+d'energie, OpenWakeWord, record_until_silence, classification, routage),
+sans micro ni serveurs : la capture PyAudio est remplacee par `FileCapture`
+(horloge audio acceleree d'un facteur `--speed`), le serveur STT et le
+backend NestJS par des stubs HTTP locaux a latence configurable. Le TTS est
+desactive.
+
+Corpus : un fichier JSON listant des WAV 16 bits mono (re-echantillonnes a
+16 kHz si besoin), relatifs au fichier JSON :
+
+    [
+      {"file": "salon_01.wav",
+       "events": [{"wake_at": 3.1, "speech_end": 6.4, "text": "Ajoute que ..."}]},
+      {"file": "tele_30min.wav", "events": []}
+    ]
+
+`wake_at` : fin du « Hey Jarvis » ; `speech_end` : fin de la commande ;
+`text` : transcription renvoyee par le stub STT. Un fichier sans evenement
+ne sert qu'a compter les faux declenchements.
+
+Mesures (ecrites en JSON avec `--out`, comparables avec `--baseline`) :
+
+- CPU du thread wake par heure d'audio, taux de frames sautees par la porte ;
+- detections correctes, faux declenchements (par heure), rates ;
+- delai d'end-pointing (fin d'enregistrement - `speech_end`, horloge audio) ;
+- latence apres enregistrement (STT → classification → backend, horloge
+  murale, stubs compris) et latence de bout en bout (somme des deux), en
+  percentiles.
+
+Avec `--speed` > 1 les latences des stubs restent en temps reel : seule
+l'attente de l'audio est accelere. Les mesures d'end-pointing sont exactes a
+toute vitesse tant que le CPU suit.
+
+    python replay_bench.py corpus/corpus.json --speed 8 --out bench.json
+    python replay_bench.py corpus/corpus.json --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+import command_classifier
+import tracing
+from capture import CaptureReader
+from config import Config, load_config
+from endpointing import build_endpointer
+from jarvis_client import JarvisClient
+from pipeline import Pipeline, Room
+from stt_client import SttClient
+from tts_client import TtsClient
+from wake_batch import OwwWakeModel
+from wake_gate import WakeGate
+
+logger = logging.getLogger("replay_bench")
+
+# Fenetre d'appariement d'une detection avec un evenement annote
+_MATCH_BEFORE_SEC = 0.5
+_MATCH_AFTER_SEC = 2.0
+
+# Metriques comparees a la reference : (chemin, plus_haut_est_mieux)
+_COMPARED = [
+    ("wake.cpu_sec_per_audio_hour", False),
+    ("wake.false_accepts_per_hour", False),
+    ("wake.miss_rate", False),
+    ("endpointing.delay_ms.p50", False),
+    ("endpointing.delay_ms.p95", False),
+    ("latency.post_record_ms.p50", False),
+    ("latency.post_record_ms.p95", False),
+    ("latency.end_to_end_ms.p50", False),
+    ("latency.end_to_end_ms.p95", False),
+]
+
+
+# ----------------------------------------------------------------------
+# Corpus et capture simulee
+# ----------------------------------------------------------------------
+
+
+def _load_wav(path: Path, sample_rate: int) -> np.ndarray:
+    with wave.open(str(path), "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: WAV 16 bits attendu")
+        pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if wf.getnchannels() > 1:
+            pcm = pcm.reshape(-1, wf.getnchannels())[:, 0]
+        rate = wf.getframerate()
+    if rate != sample_rate:
+        n_out = int(len(pcm) * sample_rate / rate)
+        pcm = np.interp(
+            np.linspace(0, len(pcm) - 1, n_out), np.arange(len(pcm)), pcm.astype(np.float32)
+        ).astype(np.int16)
+    return pcm
+
+
+def load_corpus(path: Path, sample_rate: int, gap_sec: float = 2.0) -> tuple[np.ndarray, list[dict]]:
+    """Concatene le corpus (separe par du silence) ; evenements en secondes absolues."""
+    entries = json.loads(path.read_text(encoding="utf-8"))
+    gap = np.zeros(int(gap_sec * sample_rate), dtype=np.int16)
+    parts, events, offset = [], [], 0.0
+    for entry in entries:
+        pcm = _load_wav(path.parent / entry["file"], sample_rate)
+        for event in entry.get("events", []):
+            events.append({
+                "file": entry["file"],
+                "wake_at": offset + event["wake_at"],
+                "speech_end": offset + event["speech_end"],
+                "text": event.get("text", ""),
+            })
+        parts += [pcm, gap]
+        offset += (len(pcm) + len(gap)) / sample_rate
+    return np.concatenate(parts) if parts else gap, events
+
+
+class FileCapture:
+    """
+    Remplace AudioCapture : le « micro » produit l'audio du corpus a
+    `speed` x temps reel, puis du silence indefiniment.
+    """
+
+    def __init__(self, audio: np.ndarray, sample_rate: int, speed: float = 1.0):
+        self.sample_rate = sample_rate
+        self._audio = audio
+        self._speed = speed
+        self._t0 = time.monotonic()
+        self.input_overflows = 0
+        self.reader_overruns = 0
+
+    @property
+    def write_pos(self) -> int:
+        return int((time.monotonic() - self._t0) * self.sample_rate * self._speed)
+
+    @property
+    def audio_sec(self) -> float:
+        return self.write_pos / self.sample_rate
+
+    @property
+    def exhausted(self) -> bool:
+        return self.write_pos >= len(self._audio)
+
+    def reader(self, preroll_sec: float = 0.0, start: int | None = None) -> CaptureReader:
+        pos = self.write_pos if start is None else start
+        return CaptureReader(self, max(0, pos - int(preroll_sec * self.sample_rate)))
+
+    def stats(self) -> dict:
+        return {"input_overflows": self.input_overflows, "reader_overruns": self.reader_overruns}
+
+    def close(self) -> None:
+        pass
+
+    def _read(self, cursor: int, n: int, timeout: float = 0.5) -> tuple[np.ndarray, int]:
+        while (missing := cursor + n - self.write_pos) > 0:
+            time.sleep(min(timeout, missing / (self.sample_rate * self._speed)))
+        out = np.zeros(n, dtype=np.int16)
+        end = min(cursor + n, len(self._audio))
+        if cursor < end:
+            out[:end - cursor] = self._audio[cursor:end]
+        return out, cursor + n
+
+
+# ----------------------------------------------------------------------
+# Stubs STT et NestJS
+# ----------------------------------------------------------------------
+
+
+class Stubs:
+    """Serveurs HTTP locaux imitant le STT et le backend, latences en ms."""
+
+    def __init__(self, capture: FileCapture, events: list[dict], stt_ms: float, llm_ms: float, token_ms: float):
+        self.capture = capture
+        self.events = events
+        self.stt_ms = stt_ms
+        self.llm_ms = llm_ms
+        self.token_ms = token_ms
+        self._consumed: set[int] = set()
+        self._lock = threading.Lock()
+        self._servers = [self._serve(self._stt_handler()), self._serve(self._backend_handler())]
+
+    @property
+    def stt_url(self) -> str:
+        return f"http://127.0.0.1:{self._servers[0].server_port}"
+
+    @property
+    def backend_url(self) -> str:
+        return f"http://127.0.0.1:{self._servers[1].server_port}"
+
+    def close(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+
+    def transcript_now(self) -> str:
+        """Texte du dernier evenement commence et pas encore transcrit."""
+        now = self.capture.audio_sec
+        with self._lock:
+            for i in reversed(range(len(self.events))):
+                if self.events[i]["wake_at"] - _MATCH_BEFORE_SEC <= now:
+                    if i in self._consumed:
+                        return ""
+                    self._consumed.add(i)
+                    return self.events[i]["text"]
+        return ""
+
+    @staticmethod
+    def _serve(handler) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def _stt_handler(self):
+        stubs = self
+
+        class Handler(_JsonHandler):
+            def do_POST(self):
+                self.read_body()
+                time.sleep(stubs.stt_ms / 1000)
+                self.send_json({"text": stubs.transcript_now()})
+
+        return Handler
+
+    def _backend_handler(self):
+        stubs = self
+
+        class Handler(_JsonHandler):
+            def do_POST(self):
+                body = self.read_body()
+                if self.path == "/agent/classify":
+                    time.sleep(stubs.llm_ms / 1000)
+                    self.send_json({"primary": "memory_query", "extractedContent": body.get("text", "")})
+                elif self.path == "/memory/add":
+                    self.send_json({"eventDate": None, "expression": None})
+                elif self.path == "/memory/query":
+                    time.sleep(stubs.llm_ms / 1000)
+                    self.send_json({"answer": "Réponse simulée.", "sources": [], "topK": 0})
+                elif self.path == "/memory/query/stream":
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    self.wfile.write(b'event: metadata\ndata: {"sources": [], "topK": 0}\n\n')
+                    for token in ("Réponse", " simulée", ".", " Fin", "."):
+                        time.sleep(stubs.token_ms / 1000)
+                        self.wfile.write(f"data: {json.dumps({'token': token})}\n\n".encode())
+                        self.wfile.flush()
+                    self.wfile.write(b'data: {"done": true}\n\n')
+                else:
+                    self.send_error(404)
+
+        return Handler
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    def read_body(self) -> dict:
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(raw or b"{}")
+        return {}
+
+    def send_json(self, data: dict) -> None:
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# ----------------------------------------------------------------------
+# Rejeu et mesures
+# ----------------------------------------------------------------------
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values)
+    return {
+        "count": len(values),
+        "p50": round(float(np.percentile(arr, 50)), 1),
+        "p90": round(float(np.percentile(arr, 90)), 1),
+        "p95": round(float(np.percentile(arr, 95)), 1),
+        "max": round(float(arr.max()), 1),
+    }
+
+
+async def _replay(pipeline: Pipeline, capture: FileCapture, drain_timeout: float) -> None:
+    task = asyncio.create_task(pipeline.run())
+    while not capture.exhausted:
+        await asyncio.sleep(0.1)
+    # Laisser les dernieres interactions se terminer
+    deadline = time.monotonic() + drain_timeout
+    while not pipeline.idle and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    pipeline.stop()
+    await task
+
+
+def run(config: Config, corpus: Path, speed: float, stt_ms: float, llm_ms: float, token_ms: float) -> dict:
+    audio, events = load_corpus(corpus, config.sample_rate)
+    audio_sec = len(audio) / config.sample_rate
+
+    trace_dir = tempfile.TemporaryDirectory()
+    trace_file = Path(trace_dir.name) / "traces.jsonl"
+    capture = FileCapture(audio, config.sample_rate, speed)
+    stubs = Stubs(capture, events, stt_ms, llm_ms, token_ms)
+    config = dataclasses.replace(
+        config,
+        stt_server_url=stubs.stt_url,
+        jarvis_api_url=stubs.backend_url,
+        stt_streaming=False,
+        tts_enabled=False,
+        trace_file=str(trace_file),
+        trace_summary=False,
+        intent_log_file="",
+        memory_queue_file=str(Path(trace_dir.name) / "memory_queue.jsonl"),
+        rooms=(),
+    )
+
+    from openwakeword.model import Model
+
+    tracing.setup(config)
+    command_classifier.setup(config)
+    wake_gate = WakeGate(config)
+    pipeline = Pipeline(
+        config,
+        [Room("", capture, wake_gate, build_endpointer(config), TtsClient(config))],
+        OwwWakeModel(Model(wakeword_models=[config.wake_model], inference_framework=config.wake_inference_framework)),
+        SttClient(config),
+        JarvisClient(config),
+    )
+
+    logger.info("Rejeu de %.0fs d'audio (%d evenements) a x%.1f...", audio_sec, len(events), speed)
+    started = time.monotonic()
+    try:
+        asyncio.run(_replay(pipeline, capture, drain_timeout=30 + 5 * (stt_ms + llm_ms) / 1000))
+    finally:
+        stubs.close()
+    wall_sec = time.monotonic() - started
+
+    traces = [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()] \
+        if trace_file.exists() else []
+    trace_dir.cleanup()
+    return _score(traces, events, audio_sec, wall_sec, pipeline.wake_cpu_sec, wake_gate.stats(), speed,
+                  {"stt_ms": stt_ms, "llm_ms": llm_ms, "token_ms": token_ms})
+
+
+def _score(traces, events, audio_sec, wall_sec, wake_cpu_sec, gate_stats, speed, stub_latency) -> dict:
+    matched: set[int] = set()
+    false_accepts = 0
+    endpoint_delays, post_record, end_to_end = [], [], []
+    stage_ms: dict[str, list[float]] = {}
+
+    for trace in sorted(traces, key=lambda t: t.get("wake_audio_sec", 0)):
+        wake_at = trace.get("wake_audio_sec")
+        event_idx = next(
+            (i for i, e in enumerate(events)
+             if i not in matched and e["wake_at"] - _MATCH_BEFORE_SEC <= wake_at <= e["wake_at"] + _MATCH_AFTER_SEC),
+            None,
+        )
+        if event_idx is None:
+            false_accepts += 1
+            continue
+        matched.add(event_idx)
+
+        spans = {s["name"]: s for s in trace["spans"]}
+        for name, span in spans.items():
+            stage_ms.setdefault(name, []).append(span["duration_ms"])
+        if "record_end_audio_sec" not in trace or "record" not in spans:
+            continue
+        delay_ms = (trace["record_end_audio_sec"] - events[event_idx]["speech_end"]) * 1000
+        after_ms = trace["total_ms"] - (spans["record"]["start_ms"] + spans["record"]["duration_ms"])
+        endpoint_delays.append(delay_ms)
+        post_record.append(after_ms)
+        end_to_end.append(delay_ms + after_ms)
+
+    audio_hours = audio_sec / 3600
+    return {
+        "version": _git_version(),
+        "timestamp": round(time.time()),
+        "audio_sec": round(audio_sec, 1),
+        "wall_sec": round(wall_sec, 1),
+        "speed": speed,
+        "stub_latency": stub_latency,
+        "wake": {
+            "cpu_sec_per_audio_hour": round(wake_cpu_sec / audio_hours, 1) if audio_hours else 0.0,
+            "gate_skip_ratio": gate_stats["skip_ratio"],
+            "events": len(events),
+            "detections": len(traces),
+            "true_accepts": len(matched),
+            "false_accepts": false_accepts,
+            "false_accepts_per_hour": round(false_accepts / audio_hours, 2) if audio_hours else 0.0,
+            "misses": len(events) - len(matched),
+            "miss_rate": round((len(events) - len(matched)) / len(events), 3) if events else 0.0,
+        },
+        "endpointing": {"delay_ms": _percentiles(endpoint_delays)},
+        "latency": {
+            "post_record_ms": _percentiles(post_record),
+            "end_to_end_ms": _percentiles(end_to_end),
+            "stages_p50_ms": {name: _percentiles(v)["p50"] for name, v in sorted(stage_ms.items())},
+        },
+    }
+
+
+def _git_version() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _lookup(results: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Affiche l'ecart a la reference ; retourne les metriques en regression."""
+    regressions = []
+    print(f"{'metrique':34} {'reference':>10} {'actuel':>10} {'ecart':>8}")
+    for path, higher_is_better in _COMPARED:
+        old, new = _lookup(baseline, path), _lookup(results, path)
+        if old is None or new is None:
+            continue
+        delta = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = -delta if higher_is_better else delta
+        flag = "  <-- regression" if worse > tolerance else ""
+        if flag:
+            regressions.append(path)
+        print(f"{path:34} {old:>10} {new:>10} {delta:>+8.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Rejoue un corpus WAV annote dans le pipeline wake word.")
+    parser.add_argument("corpus", type=Path, help="fichier JSON du corpus")
+    parser.add_argument("--speed", type=float, default=4.0, help="acceleration de l'horloge audio")
+    parser.add_argument("--stt-ms", type=float, default=300.0, help="latence du stub STT")
+    parser.add_argument("--llm-ms", type=float, default=1500.0, help="latence des appels LLM du stub backend")
+    parser.add_argument("--token-ms", type=float, default=50.0, help="delai entre tokens en streaming")
+    parser.add_argument("--out", type=Path, help="resultats JSON")
+    parser.add_argument("--baseline", type=Path, help="resultats JSON de reference a comparer")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="degradation relative toleree")
+    args = parser.parse_args()
+
+    results = run(load_config(), args.corpus, args.speed, args.stt_ms, args.llm_ms, args.token_ms)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        raise SystemExit(1 if regressions else 0)
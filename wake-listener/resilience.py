@@ -0,0 +1,106 @@
+"""Cache TTL/LRU et disjoncteur pour les appels backend lents ou instables."""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class TtlLruCache:
+    """Cache borne : entrees evincees au-dela de `max_size` (LRU) ou apres `ttl_sec`."""
+
+    def __init__(self, max_size: int, ttl_sec: float):
+        self._max_size = max_size
+        self._ttl = ttl_sec
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self._ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur a trois etats.
+
+    - `closed` : appels normaux ; `failure_threshold` echecs consecutifs l'ouvrent.
+    - `open` : appels sautes pendant `cooldown_sec`.
+    - `half_open` : a l'expiration du cool-down, un seul appel sonde le
+      service ; succes → `closed`, echec → `open` pour un nouveau cool-down.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 2, cooldown_sec: float = 120.0):
+        self.name = name
+        self._threshold = max(1, failure_threshold)
+        self._cooldown = cooldown_sec
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self.skipped = 0
+
+    def allow(self) -> bool:
+        """True si l'appel doit etre tente (fonctionnement normal ou sonde)."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self._cooldown:
+                self._transition("half_open")
+                return True
+            self.skipped += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self.state != "closed":
+                self._transition("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self._threshold:
+                self._opened_at = time.monotonic()
+                if self.state != "open":
+                    self._transition("open")
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._failures, "skipped": self.skipped}
+
+    def _transition(self, state: str) -> None:
+        log = logger.warning if state == "open" else logger.info
+        log("Disjoncteur %s: %s -> %s (%s)", self.name, self.state, state,
+            f"pause {self._cooldown:.0f}s" if state == "open" else f"{self.skipped} appels sautes")
+        self.state = state
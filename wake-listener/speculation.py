@@ -0,0 +1,107 @@
+"""Requete memoire speculative lancee pendant la classification LLM.
+
+Quand la classification doit passer par `/agent/classify` (plusieurs
+secondes), `/memory/query/stream` est lance en parallele avec la
+transcription brute. Si l'intention s'avere etre QUERY, les tokens deja
+recus (et la suite) sont lus directement ; sinon la tache est annulee et la
+connexion fermee, ce qui interrompt la generation cote backend.
+
+L'appelant annule explicitement (`discard()` si la speculation est rejetee,
+`cancel()` une fois la reponse lue, abandonnee ou pre-emptee) : la fermeture
+du generateur de tokens ne suffit pas, son `finally` ne s'execute jamais
+s'il n'a pas ete demarre.
+
+`stats()` cumule le gain (avance prise sur la classification pour les
+speculations utilisees) et le cout (duree de generation et tokens jetes).
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncGenerator
+
+from jarvis_client import JarvisClient
+
+logger = logging.getLogger(__name__)
+
+_STATS_INTERVAL_SEC = 300.0
+
+_stats = {"launched": 0, "used": 0, "discarded": 0, "saved_ms": 0.0, "wasted_ms": 0.0, "wasted_tokens": 0}
+_last_stats = time.monotonic()
+
+
+class SpeculativeQuery:
+    """A creer depuis la boucle asyncio (la requete tourne dans une tache)."""
+
+    def __init__(self, jarvis_client: JarvisClient, question: str):
+        self.question = question
+        self.started_at = time.monotonic()
+        self.tokens_received = 0
+        self.settled = False  # adoptee (use) ou jetee (discard)
+        self._tokens: asyncio.Queue = asyncio.Queue()
+        self._finished_at: float | None = None
+        _stats["launched"] += 1
+        self._task = asyncio.create_task(self._run(jarvis_client))
+
+    async def _run(self, jarvis_client: JarvisClient) -> None:
+        try:
+            async for token in jarvis_client.query_memory_stream(self.question):
+                self.tokens_received += 1
+                self._tokens.put_nowait(token)
+        finally:
+            self._finished_at = time.monotonic()
+            self._tokens.put_nowait(None)
+
+    def use(self) -> tuple[AsyncGenerator[str, None], float]:
+        """
+        Adopte la speculation ; retourne (tokens, avance en ms).
+
+        L'avance est le temps ecoule depuis le lancement : c'est la latence
+        epargnee par rapport a une requete lancee apres la classification.
+        """
+        saved_ms = (time.monotonic() - self.started_at) * 1000
+        self.settled = True
+        _stats["used"] += 1
+        _stats["saved_ms"] += saved_ms
+        _maybe_log_stats()
+        return self._iter_tokens(), saved_ms
+
+    def discard(self) -> dict:
+        """Abandonne la speculation ; retourne le travail gaspille."""
+        self.cancel()
+        self.settled = True
+        end = self._finished_at or time.monotonic()
+        wasted = {"wasted_ms": round((end - self.started_at) * 1000, 1), "wasted_tokens": self.tokens_received}
+        _stats["discarded"] += 1
+        _stats["wasted_ms"] += wasted["wasted_ms"]
+        _stats["wasted_tokens"] += self.tokens_received
+        _maybe_log_stats()
+        return wasted
+
+    def cancel(self) -> None:
+        """Arrete la requete (et la generation cote backend) ; sans effet si elle est terminee."""
+        self._task.cancel()
+
+    async def _iter_tokens(self) -> AsyncGenerator[str, None]:
+        try:
+            while (token := await self._tokens.get()) is not None:
+                yield token
+        finally:
+            # Lecture abandonnee (barge-in) : la generation s'arrete aussi
+            self.cancel()
+
+
+def stats() -> dict:
+    return {
+        **_stats,
+        "saved_ms": round(_stats["saved_ms"], 1),
+        "wasted_ms": round(_stats["wasted_ms"], 1),
+    }
+
+
+def _maybe_log_stats() -> None:
+    global _last_stats
+    now = time.monotonic()
+    if now - _last_stats >= _STATS_INTERVAL_SEC:
+        _last_stats = now
+        logger.info("Speculation memoire: %s", stats())
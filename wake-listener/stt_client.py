@@ -1,38 +1,170 @@
-"""Client HTTP pour envoyer l'audio enregistre au serveur STT."""
+"""Client HTTP asynchrone (et WebSocket) pour envoyer l'audio enregistre au serveur STT."""
 
+import asyncio
+import json
 import logging
+import threading
 
-import requests
+import httpx
+import numpy as np
+import websocket
 
+import tracing
+from audio_prep import CONTENT_TYPES, check_format, encode
 from config import Config
 
 logger = logging.getLogger(__name__)
 
 
+class SttStream:
+    """Session de transcription en direct sur le WebSocket /transcribe/stream."""
+
+    def __init__(self, ws: websocket.WebSocket):
+        self._ws = ws
+        self._text: str | None = None
+        self._done = threading.Event()
+        self._broken = False
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def send(self, frame: bytes) -> None:
+        """Pousse un frame PCM int16 brut vers le serveur (ignore si la session est cassee)."""
+        if self._broken:
+            return
+        try:
+            self._ws.send_binary(frame)
+        except Exception:
+            logger.exception("Envoi du flux STT interrompu")
+            self._broken = True
+            self._ws.close()
+
+    def finish(self, timeout: float = 30.0) -> str | None:
+        """
+        Signale la fin de l'audio et attend la transcription finale.
+
+        Retourne le texte transcrit, ou None en cas d'erreur ou de texte vide.
+        """
+        try:
+            if not self._broken:
+                self._ws.send(json.dumps({"type": "end"}))
+            if not self._done.wait(timeout):
+                logger.error("Timeout en attente de la transcription finale (%ss)", timeout)
+            return self._text.strip() if self._text and self._text.strip() else None
+        except Exception:
+            logger.exception("Erreur lors de la cloture du flux STT")
+            return None
+        finally:
+            self._ws.close()
+
+    def abort(self) -> None:
+        """Ferme la session sans demander de transcription (enregistrement avorte)."""
+        self._broken = True
+        try:
+            self._ws.close()
+        except Exception:
+            logger.debug("Fermeture du flux STT", exc_info=True)
+
+    @property
+    def broken(self) -> bool:
+        return self._broken
+
+    def _read_loop(self) -> None:
+        try:
+            while True:
+                msg = json.loads(self._ws.recv())
+                if msg["type"] == "partial":
+                    logger.debug("STT partiel: %s", msg["text"])
+                elif msg["type"] == "final":
+                    logger.info("STT segment [%.1f-%.1fs]: %s", msg["start"], msg["end"], msg["text"])
+                elif msg["type"] == "done":
+                    self._text = msg.get("text", "")
+                    return
+        except Exception:
+            if not self._done.is_set():
+                logger.debug("Lecture du flux STT terminee", exc_info=True)
+                self._broken = True
+        finally:
+            self._done.set()
+
+
 class SttClient:
     def __init__(self, config: Config):
         self._url = f"{config.stt_server_url}/transcribe"
-        self._session = requests.Session()
+        self._pcm_url = f"{config.stt_server_url}/transcribe/pcm"
+        self._sample_rate = config.sample_rate
+        self._upload_format = check_format(config.stt_upload_format)
+        self._stream_url = (
+            f"{config.stt_server_url.replace('http', 'ws', 1)}/transcribe/stream"
+            f"?sample_rate={config.sample_rate}"
+        )
+        self._client = httpx.AsyncClient(timeout=30)
 
-    def transcribe(self, wav_bytes: bytes) -> str | None:
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def open_stream(self) -> SttStream | None:
+        """
+        Ouvre une session de transcription en streaming.
+
+        Retourne None si le serveur est injoignable (l'appelant repasse alors
+        sur transcribe_pcm() avec l'enregistrement complet). Bloquant : la
+        session est alimentee depuis le thread d'enregistrement.
+        """
+        try:
+            header = [f"{k}: {v}" for k, v in tracing.headers().items()]
+            return SttStream(websocket.create_connection(self._stream_url, timeout=30, header=header))
+        except Exception as e:
+            logger.warning("Streaming STT indisponible (%s) — fallback POST /transcribe/pcm.", e)
+            return None
+
+    async def transcribe(self, wav_bytes: bytes) -> str | None:
         """
         Envoie un fichier WAV au serveur STT via POST multipart.
 
         Retourne le texte transcrit, ou None en cas d'erreur.
         """
+        return await self._post(
+            self._url,
+            files={"audio": ("recording.wav", wav_bytes, "audio/wav")},
+        )
+
+    async def transcribe_pcm(self, pcm: np.ndarray) -> str | None:
+        """
+        Envoie l'enregistrement int16 au serveur STT (POST /transcribe/pcm).
+
+        En PCM brut (defaut), le corps de la requete est le buffer de
+        l'enregistreur tel quel : ni encodage WAV ni multipart (une seule
+        copie, httpx attend des bytes). Avec STT_UPLOAD_FORMAT=flac|opus,
+        l'encodage se fait dans un thread et le serveur decode en memoire.
+
+        Retourne le texte transcrit, ou None en cas d'erreur.
+        """
+        fmt = self._upload_format
+        with tracing.span("encode", format=fmt) as span:
+            if fmt == "pcm":
+                body = encode(pcm, self._sample_rate, fmt)
+            else:
+                body = await asyncio.to_thread(encode, pcm, self._sample_rate, fmt)
+            span["bytes"] = len(body)
+        return await self._post(
+            self._pcm_url,
+            params={"sample_rate": self._sample_rate},
+            content=body,
+            headers={"Content-Type": CONTENT_TYPES[fmt]},
+        )
+
+    async def _post(self, url: str, headers: dict | None = None, **kwargs) -> str | None:
         try:
-            resp = self._session.post(
-                self._url,
-                files={"audio": ("recording.wav", wav_bytes, "audio/wav")},
-                timeout=30,
+            resp = await self._client.post(
+                url, headers={**tracing.headers(), **(headers or {})}, **kwargs
             )
             resp.raise_for_status()
             text = resp.json().get("text", "").strip()
             return text if text else None
-        except requests.ConnectionError:
-            logger.error("Impossible de joindre le serveur STT a %s", self._url)
+        except httpx.ConnectError:
+            logger.error("Impossible de joindre le serveur STT a %s", url)
             return None
-        except requests.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             logger.error("Erreur du serveur STT: %s", e)
             return None
         except Exception:
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Les modules du wake listener s'importent a plat (`from config import Config`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
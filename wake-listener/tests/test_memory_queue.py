@@ -0,0 +1,55 @@
+import json
+
+from config import Config
+from memory_queue import MemoryQueue
+
+
+def _open_queue(path) -> MemoryQueue:
+    queue = MemoryQueue(Config(memory_queue_file=str(path)), jarvis_client=None)
+    queue.open()
+    return queue
+
+
+def test_replay_skips_bad_lines_and_compacts(tmp_path):
+    journal = tmp_path / "memory_queue.jsonl"
+    lines = [
+        {"op": "add", "id": "a", "text": "acheter du pain", "spoken_at": "2026-10-16T08:00:00+02:00"},
+        {"op": "add", "id": "b", "text": "appeler Paul", "spoken_at": "2026-10-16T08:01:00+02:00"},
+        {"op": "done", "id": "b"},
+        {"op": "done", "id": "inconnu"},
+        {"op": "add", "id": "sans-texte"},
+        {"op": "inconnue", "id": "a"},
+        [1, 2],
+        "pas un objet",
+    ]
+    journal.write_text(
+        "".join(json.dumps(line) + "\n" for line in lines)
+        + "{pas du json}\n"
+        + '{"op": "add", "id": "tronquee", "te',
+        encoding="utf-8",
+    )
+
+    queue = _open_queue(journal)
+    try:
+        assert list(queue._pending) == ["a"]
+        assert queue._pending["a"].text == "acheter du pain"
+    finally:
+        queue.close()
+
+    records = [json.loads(line) for line in journal.read_text(encoding="utf-8").splitlines()]
+    assert records == [lines[0]]
+
+
+def test_replay_after_compaction_is_stable(tmp_path):
+    journal = tmp_path / "memory_queue.jsonl"
+    journal.write_text(
+        json.dumps({"op": "add", "id": "a", "text": "x", "spoken_at": "2026-10-16T08:00:00+02:00"}) + "\n",
+        encoding="utf-8",
+    )
+    _open_queue(journal).close()
+
+    queue = _open_queue(journal)
+    try:
+        assert list(queue._pending) == ["a"]
+    finally:
+        queue.close()
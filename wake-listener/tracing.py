@@ -0,0 +1,137 @@
+"""Traces de latence de bout en bout pour chaque interaction du wake listener.
+
+Chaque interaction (wake word → réponse parlée) porte un trace ID et une
+liste de spans mesurés à l'horloge monotone. La trace terminée est écrite
+en une ligne JSON dans un fichier à rotation ; le trace ID est aussi envoyé
+en en-tête `X-Trace-Id` au serveur STT et au backend NestJS pour pouvoir
+joindre leurs timings.
+"""
+
+import contextvars
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Iterator
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+
+_current: contextvars.ContextVar["Trace | None"] = contextvars.ContextVar("trace", default=None)
+_writer: logging.Logger | None = None
+_summary = False
+
+
+def setup(config: Config) -> None:
+    """Configure le fichier JSONL à rotation (appelé une fois au démarrage)."""
+    global _writer, _summary
+    _summary = config.trace_summary
+    if not config.trace_file:
+        return
+    path = Path(config.trace_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(
+        path, maxBytes=config.trace_max_bytes, backupCount=config.trace_backup_count, encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _writer = logging.getLogger("wake_listener.traces")
+    _writer.propagate = False
+    _writer.setLevel(logging.INFO)
+    _writer.addHandler(handler)
+
+
+class Trace:
+    def __init__(self) -> None:
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self._t0 = time.monotonic()
+        self.spans: list[dict] = []
+        self.attrs: dict = {}
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[dict]:
+        """Mesure une phase ; le dict retourné peut recevoir des attributs en cours de route."""
+        record = {"name": name, "start_ms": self._elapsed_ms(), **attrs}
+        try:
+            yield record
+        finally:
+            record["duration_ms"] = round(self._elapsed_ms() - record["start_ms"], 1)
+            self.spans.append(record)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "started_at": round(self.started_at, 3),
+            "total_ms": round(self._elapsed_ms(), 1),
+            **self.attrs,
+            "spans": self.spans,
+        }
+
+    def _elapsed_ms(self) -> float:
+        return round((time.monotonic() - self._t0) * 1000, 1)
+
+
+@contextmanager
+def interaction() -> Iterator[Trace]:
+    """Ouvre une trace pour l'interaction en cours et l'écrit à la sortie."""
+    trace = Trace()
+    try:
+        with activate(trace):
+            yield trace
+    finally:
+        finish(trace)
+
+
+@contextmanager
+def activate(trace: Trace) -> Iterator[Trace]:
+    """
+    Rend `trace` courante sans la terminer : une interaction traversant
+    plusieurs étapes du pipeline est réactivée dans chacune d'elles.
+    """
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[dict]:
+    """Span sur la trace courante (no-op hors interaction)."""
+    trace = _current.get()
+    if trace is None:
+        yield {}
+        return
+    with trace.span(name, **attrs) as record:
+        yield record
+
+
+def current_trace_id() -> str | None:
+    trace = _current.get()
+    return trace.trace_id if trace else None
+
+
+def headers() -> dict[str, str]:
+    """En-têtes HTTP à propager vers le STT et le backend."""
+    trace_id = current_trace_id()
+    return {TRACE_HEADER: trace_id} if trace_id else {}
+
+
+def finish(trace: Trace) -> None:
+    """Écrit la trace terminée (JSONL et résumé)."""
+    data = trace.to_dict()
+    if _writer is not None:
+        _writer.info(json.dumps(data, ensure_ascii=False))
+    if _summary:
+        logger.info(
+            "Trace %s: %.0f ms — %s",
+            trace.trace_id,
+            data["total_ms"],
+            ", ".join(f"{s['name']}={s['duration_ms']:.0f}" for s in trace.spans),
+        )
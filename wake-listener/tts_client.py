@@ -1,107 +1,273 @@
 """Client TTS local utilisant Piper (neural text-to-speech offline)."""
 
+import asyncio
+import copy
+import hashlib
 import logging
 import random
+import re
 import threading
-import urllib.request
+from collections import OrderedDict
 from pathlib import Path
+from typing import AsyncGenerator, Iterator
 
-import sounddevice as sd
+import numpy as np
 from piper.voice import PiperVoice
 
 from config import Config
+from models import ensure_piper_model
+from playback import PlaybackEngine, Priority, Utterance
 
 logger = logging.getLogger(__name__)
 
-_HF_BASE = (
-    "https://huggingface.co/rhasspy/piper-voices/resolve/v1.0.0"
-    "/fr/fr_FR/{voice}/{quality}"
-)
+CACHE_DIR = Path(__file__).parent / "tts_cache"
 
-MODELS_DIR = Path(__file__).parent / "models"
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_sentences(text: str) -> list[str]:
+    """Decoupe un texte en phrases (unite de synthese et de cache)."""
+    return [s for s in (p.strip() for p in _SENTENCE_SPLIT.split(text)) if s]
+
+
+async def iter_sentences(tokens: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    """
+    Regroupe un flux de tokens en phrases completes, emises des que la
+    ponctuation finale est suivie d'un blanc (meme decoupage que split_sentences).
+    Fermer ce generateur ferme aussi le flux de tokens.
+    """
+    buffer = ""
+    try:
+        async for token in tokens:
+            buffer += token
+            parts = _SENTENCE_SPLIT.split(buffer)
+            for sentence in parts[:-1]:
+                if sentence.strip():
+                    yield sentence.strip()
+            buffer = parts[-1]
+        if buffer.strip():
+            yield buffer.strip()
+    finally:
+        await tokens.aclose()
 
 
 class TtsClient:
     """Synthèse vocale locale via Piper (modèle français)."""
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, output_device: int | None = None):
+        """
+        Construction immédiate : le modèle est chargé par `load()`, qui peut
+        tourner en arrière-plan. Tant qu'il n'est pas prêt, le client se
+        comporte comme un TTS désactivé (les phrases sont ignorées).
+        """
         self._enabled = config.tts_enabled
+        self._ready = threading.Event()
         if not self._enabled:
             logger.info("TTS désactivé (TTS_ENABLED=false).")
             return
 
-        model_path = self._ensure_model(config.tts_model)
+        # Phrases fixes (jamais evincees) + LRU borne pour les phrases de reponse
+        self._model_name = config.tts_model
+        self._phrases: dict[str, np.ndarray] = {}
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lru_size = config.tts_cache_size
+        self._cache_lock = threading.Lock()
+        # Piper est appele depuis le thread de lecture et depuis speak_stream
+        self._synth_lock = threading.Lock()
+        self._device = output_device
+        self._outputs: list["TtsClient"] = []
+
+    def output(self, device: int | None) -> "TtsClient":
+        """
+        Client jouant sur un autre périphérique de sortie (mode multi-pièces),
+        partageant la voix Piper, les caches et le chargement de celui-ci.
+        À appeler avant `load()`.
+        """
+        if not self._enabled:
+            return self
+        other = copy.copy(self)
+        other._device = device
+        other._outputs = []
+        self._outputs.append(other)
+        return other
+
+    def load(self, phrases: list[str] = ()) -> None:
+        """
+        Charge Piper, l'amorce par une synthèse factice, ouvre le flux de
+        sortie et précharge *phrases* ; le client est actif ensuite.
+        """
+        if not self._enabled:
+            return
+        model_path = ensure_piper_model(self._model_name)
         logger.info("Chargement du modèle Piper '%s'...", model_path.name)
         self._voice = PiperVoice.load(str(model_path))
+        # Premiere inference : allocation des buffers de la session ONNX
+        self._synthesize("Bonjour.")
         logger.info(
             "Modèle Piper chargé (sample_rate=%d).", self._voice.config.sample_rate
         )
 
+        # Flux de sortie unique par peripherique, ouvert une fois pour toute la duree du process
+        self._player = PlaybackEngine(self._voice.config.sample_rate, device=self._device)
+        for other in self._outputs:
+            other._voice = self._voice
+            other._player = PlaybackEngine(self._voice.config.sample_rate, device=other._device)
+        self.preload(list(phrases))
+        self._ready.set()
+
+    @property
+    def _active(self) -> bool:
+        return self._enabled and self._ready.is_set()
+
     # ------------------------------------------------------------------
     # API publique
     # ------------------------------------------------------------------
 
-    def speak(self, text: str) -> None:
-        """Synthétise *text* et le joue sur le haut-parleur par défaut."""
-        if not self._enabled:
-            return
+    def speak(
+        self, text: str, priority: Priority = Priority.ANSWER, wait: bool = True
+    ) -> Utterance | None:
+        """
+        Synthétise *text* et le met en file sur le moteur de lecture.
+
+        Les phrases déjà synthétisées (préchargées ou en LRU) sont jouées
+        directement depuis leur buffer int16 ; les autres sont synthétisées
+        phrase par phrase par le thread de lecture puis mises en cache.
+        Avec `wait=True`, bloque jusqu'à la fin de la lecture (ou son
+        interruption). Retourne l'utterance mise en file (None si rien n'est
+        joué).
+        """
+        if not self._active:
+            return None
         if not text or not text.strip():
-            return
+            return None
 
         logger.debug("TTS: %s", text[:80])
+        utterance = self._player.play(self._sentence_audio(text), priority)
+        if wait:
+            utterance.wait()
+        return utterance
+
+    async def speak_stream(self, sentences: AsyncGenerator[str, None]) -> list[str]:
+        """
+        Joue des phrases au fil de leur arrivée (réponse LLM streamée).
+
+        Chaque phrase est mise en file comme une utterance à part entière dès
+        qu'elle est synthétisée : la phrase N+1 est synthétisée (dans un
+        thread) pendant que le moteur joue la phrase N, et le moteur reste
+        libre entre deux phrases (barge-in, prompt prioritaire). Retourne les
+        phrases reçues une fois l'itérateur épuisé ou la lecture interrompue
+        (barge-in) ; la fin de la réponse peut encore être en cours de lecture.
+        """
+        received: list[str] = []
+        if not self._active:
+            async for sentence in sentences:
+                received.append(sentence)
+            return received
+
+        interrupts = self._player.interrupts
         try:
-            stream = sd.OutputStream(
-                samplerate=self._voice.config.sample_rate,
-                channels=1,
-                dtype="int16",
-            )
-            stream.start()
-            try:
-                for chunk in self._voice.synthesize(text):
-                    stream.write(chunk.audio_int16_array)
-            finally:
-                stream.stop()
-                stream.close()
+            async for sentence in sentences:
+                if self._player.interrupts != interrupts:
+                    break
+                received.append(sentence)
+                audio = await asyncio.to_thread(self._sentence_audio_one, sentence)
+                if self._player.interrupts != interrupts:
+                    break
+                self._player.play([audio], Priority.ANSWER)
         except Exception:
-            logger.exception("Erreur lors de la lecture TTS")
+            logger.exception("Erreur lors de la synthèse TTS streamée")
+        finally:
+            # Ferme la source (et la connexion HTTP derrière) si on s'arrête avant la fin
+            await sentences.aclose()
+        return received
+
+    def preload(self, phrases: list[str]) -> None:
+        """
+        Pré-synthétise des phrases fixes (accusés de réception, attentes...).
+
+        Chaque phrase est lue depuis le cache disque (clé : modèle + texte) ou
+        synthétisée puis sauvegardée ; elle reste ensuite en mémoire.
+        """
+        if not self._enabled:
+            return
+        cache_dir = CACHE_DIR / self._model_name
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        synthesized = 0
+        for phrase in dict.fromkeys(phrases):
+            key = hashlib.sha1(f"{self._model_name}\n{phrase}".encode("utf-8")).hexdigest()
+            path = cache_dir / f"{key}.npy"
+            try:
+                if path.exists():
+                    audio = np.load(path)
+                else:
+                    audio = self._synthesize(phrase)
+                    np.save(path, audio)
+                    synthesized += 1
+            except Exception:
+                logger.exception("Préchargement TTS impossible pour '%s'", phrase)
+                continue
+            self._phrases[phrase] = audio
+        logger.info(
+            "TTS: %d phrases préchargées (%d synthétisées, %d depuis le cache disque).",
+            len(self._phrases), synthesized, len(self._phrases) - synthesized,
+        )
 
-    def speak_random(self, phrases: list[str]) -> None:
+    def speak_random(
+        self, phrases: list[str], priority: Priority = Priority.ANSWER, wait: bool = True
+    ) -> Utterance | None:
         """Parle une phrase choisie aléatoirement dans la liste."""
-        self.speak(random.choice(phrases))
+        return self.speak(random.choice(phrases), priority, wait)
 
     def speak_async(self, text: str) -> None:
-        """Lance speak() dans un thread daemon (non-bloquant pour l'appelant)."""
-        t = threading.Thread(target=self.speak, args=(text,), daemon=True)
-        t.start()
+        """Phrase d'attente non bloquante, remplacée par toute sortie plus récente."""
+        self.speak(text, Priority.FILLER, wait=False)
+
+    def interrupt(self) -> None:
+        """Coupe la lecture en cours et vide la file (barge-in)."""
+        if self._active:
+            self._player.interrupt()
+
+    def close(self) -> None:
+        if self._active:
+            self._player.close()
+            for other in self._outputs:
+                other._player.close()
 
     # ------------------------------------------------------------------
-    # Téléchargement du modèle
+    # Cache de synthèse
     # ------------------------------------------------------------------
 
-    @staticmethod
-    def _ensure_model(model_name: str) -> Path:
-        """Télécharge le modèle Piper depuis HuggingFace si absent."""
-        MODELS_DIR.mkdir(exist_ok=True)
-
-        onnx_path = MODELS_DIR / f"{model_name}.onnx"
-        json_path = MODELS_DIR / f"{model_name}.onnx.json"
-
-        # Extraire voix et qualité depuis le nom (ex. "fr_FR-gilles-low" → "gilles", "low")
-        parts = model_name.split("-")
-        voice_short = parts[1] if len(parts) > 1 else model_name
-        quality = parts[2] if len(parts) > 2 else "medium"
-
-        if not onnx_path.exists():
-            url = f"{_HF_BASE.format(voice=voice_short, quality=quality)}/{model_name}.onnx"
-            logger.info("URL Piper: %s", url)
-            logger.info("Téléchargement du modèle Piper: %s ...", url)
-            urllib.request.urlretrieve(url, onnx_path)
-            logger.info("Modèle téléchargé: %s", onnx_path)
-
-        if not json_path.exists():
-            url = f"{_HF_BASE.format(voice=voice_short, quality=quality)}/{model_name}.onnx.json"
-            logger.info("Téléchargement de la config Piper: %s ...", url)
-            urllib.request.urlretrieve(url, json_path)
-            logger.info("Config téléchargée: %s", json_path)
-
-        return onnx_path
+    def _synthesize(self, text: str) -> np.ndarray:
+        with self._synth_lock:
+            chunks = [chunk.audio_int16_array for chunk in self._voice.synthesize(text)]
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+
+    def _sentence_audio(self, text: str) -> Iterator[np.ndarray]:
+        for sentence in split_sentences(text):
+            yield self._sentence_audio_one(sentence)
+
+    def _sentence_audio_one(self, sentence: str) -> np.ndarray:
+        audio = self._cached(sentence)
+        if audio is None:
+            audio = self._synthesize(sentence)
+            self._remember(sentence, audio)
+        return audio
+
+    def _cached(self, sentence: str) -> np.ndarray | None:
+        audio = self._phrases.get(sentence)
+        if audio is not None:
+            return audio
+        with self._cache_lock:
+            audio = self._lru.get(sentence)
+            if audio is not None:
+                self._lru.move_to_end(sentence)
+            return audio
+
+    def _remember(self, sentence: str, audio: np.ndarray) -> None:
+        if self._lru_size <= 0 or sentence in self._phrases:
+            return
+        with self._cache_lock:
+            self._lru[sentence] = audio
+            self._lru.move_to_end(sentence)
+            while len(self._lru) > self._lru_size:
+                self._lru.popitem(last=False)
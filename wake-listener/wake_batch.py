@@ -0,0 +1,135 @@
+"""Inference wake word pour une ou plusieurs pieces.
+
+Le pipeline appelle `predict({piece: frame})` une fois par tick de 80 ms avec
+les frames des pieces dont la porte est ouverte, et `reset(piece)` apres une
+detection ou un enregistrement.
+
+- `OwwWakeModel` : une seule piece, delegue a `openwakeword.model.Model`.
+- `BatchedWakeModel` : plusieurs pieces, une seule copie des sessions ONNX
+  (melspectrogramme, embeddings, classifieurs) ; les frames de toutes les
+  pieces actives sont empilees et evaluees en un appel par modele. Seuls les
+  buffers de features (quelques Ko) sont propres a chaque piece. Le calcul
+  reproduit le mode streaming d'OpenWakeWord : 480 echantillons de contexte
+  avant chaque frame pour le melspectrogramme, fenetre de 76 trames mel par
+  embedding, 16 embeddings par prediction, scores forces a 0 sur les 5
+  premiers frames apres une reinitialisation.
+"""
+
+import logging
+
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_MEL_CONTEXT = 160 * 3  # echantillons precedents inclus dans chaque melspectrogramme
+_EMBED_WINDOW = 76  # trames mel par embedding
+_EMBED_STEP = 8  # trames mel par frame de 1280 echantillons
+_WARMUP_FRAMES = 5
+
+
+class OwwWakeModel:
+    """Mode une piece : le `Model` OpenWakeWord tel quel."""
+
+    def __init__(self, oww_model):
+        self._oww = oww_model
+
+    def predict(self, frames: dict[str, np.ndarray]) -> dict[str, dict[str, float]]:
+        return {room: self._oww.predict(frame) for room, frame in frames.items()}
+
+    def reset(self, room: str) -> None:
+        self._oww.reset()
+
+
+class BatchedWakeModel:
+    def __init__(self, rooms: list[str], melspec_path, embedding_path, wake_paths: dict[str, str]):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.inter_op_num_threads = 1
+        options.intra_op_num_threads = 1
+
+        def session(path):
+            return ort.InferenceSession(str(path), sess_options=options, providers=["CPUExecutionProvider"])
+
+        self._melspec = session(melspec_path)
+        self._embedding = session(embedding_path)
+        self._wake = {name: session(path) for name, path in wake_paths.items()}
+        self._wake_frames = {name: s.get_inputs()[0].shape[1] for name, s in self._wake.items()}
+        # Certains classifieurs sont exportes avec un batch fixe a 1
+        self._wake_batched = {name: not isinstance(s.get_inputs()[0].shape[0], int) for name, s in self._wake.items()}
+        self._n_features = max(self._wake_frames.values())
+
+        self._index = {room: i for i, room in enumerate(rooms)}
+        n = len(rooms)
+        noise = np.random.default_rng(0).integers(-1000, 1000, 16000 * 4).astype(np.float32)
+        self._initial_features = self._embed_clip(noise)[-self._n_features:]
+        self._raw_tail = np.zeros((n, _MEL_CONTEXT), dtype=np.float32)
+        self._mel = np.ones((n, _EMBED_WINDOW, 32), dtype=np.float32)
+        self._features = np.repeat(self._initial_features[None], n, axis=0)
+        self._frames_since_reset = np.zeros(n, dtype=np.int64)
+
+    @classmethod
+    def from_config(cls, config: Config, rooms: list[str]) -> "BatchedWakeModel":
+        from models import oww_files
+
+        files = oww_files(config, framework="onnx")
+        wake = {name.removeprefix("oww/"): path for name, path in files.items()
+                if name not in ("oww/melspectrogram", "oww/embedding", "oww/silero_vad")}
+        model = cls(rooms, files["oww/melspectrogram"], files["oww/embedding"], wake)
+        # Amorcage des sessions sur du silence, puis etat initial
+        silence = {room: np.zeros(config.chunk_size, dtype=np.int16) for room in rooms}
+        for _ in range(4):
+            model.predict(silence)
+        for room in rooms:
+            model.reset(room)
+        return model
+
+    def predict(self, frames: dict[str, np.ndarray]) -> dict[str, dict[str, float]]:
+        rooms = list(frames)
+        idx = np.array([self._index[room] for room in rooms])
+        audio = np.stack([frames[room] for room in rooms]).astype(np.float32)
+
+        mel = self._melspectrogram(np.concatenate((self._raw_tail[idx], audio), axis=1))
+        self._raw_tail[idx] = audio[:, -_MEL_CONTEXT:]
+        self._mel[idx] = np.concatenate((self._mel[idx], mel), axis=1)[:, -_EMBED_WINDOW:]
+
+        embeddings = self._embed(self._mel[idx])
+        self._features[idx] = np.concatenate((self._features[idx], embeddings[:, None]), axis=1)[:, -self._n_features:]
+        self._frames_since_reset[idx] += 1
+
+        scores = {room: {} for room in rooms}
+        ready = self._frames_since_reset[idx] > _WARMUP_FRAMES
+        for name, session in self._wake.items():
+            x = self._features[idx][:, -self._wake_frames[name]:]
+            if self._wake_batched[name]:
+                out = session.run(None, {session.get_inputs()[0].name: x})[0].reshape(len(rooms), -1)[:, 0]
+            else:
+                out = np.array([
+                    session.run(None, {session.get_inputs()[0].name: x[i:i + 1]})[0].ravel()[0]
+                    for i in range(len(rooms))
+                ])
+            for i, room in enumerate(rooms):
+                scores[room][name] = float(out[i]) if ready[i] else 0.0
+        return scores
+
+    def reset(self, room: str) -> None:
+        i = self._index[room]
+        self._raw_tail[i] = 0.0
+        self._mel[i] = 1.0
+        self._features[i] = self._initial_features
+        self._frames_since_reset[i] = 0
+
+    def _melspectrogram(self, audio: np.ndarray) -> np.ndarray:
+        out = self._melspec.run(None, {self._melspec.get_inputs()[0].name: audio})[0]
+        return out.reshape(len(audio), -1, 32) / 10 + 2
+
+    def _embed(self, windows: np.ndarray) -> np.ndarray:
+        out = self._embedding.run(None, {self._embedding.get_inputs()[0].name: windows[..., None]})[0]
+        return out.reshape(len(windows), -1)
+
+    def _embed_clip(self, audio: np.ndarray) -> np.ndarray:
+        mel = self._melspectrogram(audio[None])[0]
+        windows = np.stack([mel[i:i + _EMBED_WINDOW] for i in range(0, len(mel) - _EMBED_WINDOW + 1, _EMBED_STEP)])
+        return self._embed(windows)
@@ -0,0 +1,83 @@
+"""Porte d'energie devant OpenWakeWord pour economiser le CPU au repos.
+
+Tant que le RMS reste sous `factor` x plancher de bruit (calibre en continu),
+l'inference OWW (melspectrogramme + embeddings + classifieur) est sautee.
+A la reouverture, le modele est reinitialise puis on lui rejoue les
+`replay_sec` dernieres secondes depuis le ring buffer de capture : son
+buffer de features interne redevient contigu avant que la parole ne soit
+evaluee, la precision de detection est donc preservee.
+"""
+
+import logging
+import time
+
+import numpy as np
+
+from config import Config
+from endpointing import AdaptiveRmsDetector
+
+logger = logging.getLogger(__name__)
+
+_STATS_INTERVAL_SEC = 300.0
+
+
+class WakeGate:
+    def __init__(self, config: Config):
+        self.enabled = config.wake_gate
+        self._detector = AdaptiveRmsDetector(config.wake_gate_min_rms, config.wake_gate_factor)
+        frame_sec = config.chunk_size / config.sample_rate
+        self._hangover_frames = max(1, int(config.wake_gate_hangover_sec / frame_sec))
+        self.replay_sec = config.wake_gate_replay_sec
+        self._open_frames = 0  # frames restantes avant fermeture
+
+        self.frames_total = 0
+        self.frames_skipped = 0
+        self.openings = 0
+        self._predict_ms_avg = 0.0
+        self._last_stats = time.monotonic()
+
+    def check(self, pcm: np.ndarray) -> tuple[bool, bool]:
+        """
+        Evalue un frame ; retourne (lancer_oww, vient_de_s_ouvrir).
+
+        Sur `vient_de_s_ouvrir`, l'appelant doit reinitialiser OWW et lui
+        rejouer l'audio recent avant de predire ce frame.
+        """
+        self.frames_total += 1
+        if not self.enabled:
+            return True, False
+
+        self._detector.observe_ambient(pcm)
+        was_open = self._open_frames > 0
+        if self._detector.is_speech(pcm):
+            self._open_frames = self._hangover_frames
+        elif was_open:
+            self._open_frames -= 1
+
+        self._maybe_log_stats()
+        if self._open_frames > 0:
+            if not was_open:
+                self.openings += 1
+            return True, not was_open
+        self.frames_skipped += 1
+        return False, False
+
+    def record_predict(self, elapsed_ms: float) -> None:
+        """Moyenne glissante du cout d'une prediction OWW (pour estimer le CPU economise)."""
+        self._predict_ms_avg += 0.05 * (elapsed_ms - self._predict_ms_avg)
+
+    def stats(self) -> dict:
+        ratio = self.frames_skipped / self.frames_total if self.frames_total else 0.0
+        return {
+            "frames": self.frames_total,
+            "skipped": self.frames_skipped,
+            "skip_ratio": round(ratio, 3),
+            "openings": self.openings,
+            "cpu_saved_sec": round(self.frames_skipped * self._predict_ms_avg / 1000, 1),
+        }
+
+    def _maybe_log_stats(self) -> None:
+        now = time.monotonic()
+        if now - self._last_stats >= _STATS_INTERVAL_SEC:
+            self._last_stats = now
+            logger.info("Porte wake word: %s", self.stats())
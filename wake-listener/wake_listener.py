@@ -3,24 +3,35 @@ Jarvis Wake Word Listener.
 
 Ecoute en continu le microphone, detecte "Hey Jarvis" via OpenWakeWord,
 enregistre la commande vocale jusqu'au silence, puis envoie l'audio
-au serveur STT pour transcription.
+au serveur STT pour transcription. Les etapes s'executent en parallele
+dans un pipeline asyncio (cf. pipeline.py).
 """
 
+import asyncio
 import logging
-import random
 import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import numpy as np
 import pyaudio
-import openwakeword
 from openwakeword.model import Model
 
-from command_classifier import CommandType, classify
+import command_classifier
+import speculation
+import tracing
+from capture import AudioCapture
 from config import load_config
+from endpointing import build_endpointer
 from jarvis_client import JarvisClient
-from recorder import record_until_silence
+from models import ensure_models
+from phrases import ALL_PHRASES
+from pipeline import Pipeline, Room
 from stt_client import SttClient
 from tts_client import TtsClient
+from wake_batch import BatchedWakeModel, OwwWakeModel
+from wake_gate import WakeGate
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,139 +39,128 @@ logging.basicConfig(
 )
 logger = logging.getLogger("wake_listener")
 
-running = True
+pipeline: Pipeline | None = None
 
 
 def shutdown(sig, frame):
-    global running
     logger.info("Signal d'arret recu.")
-    running = False
-
-
-def _route_command(
-    text: str,
-    jarvis_client: JarvisClient,
-    tts_client: TtsClient,
-    jarvis_api_url: str,
-) -> None:
-    """
-    Classifie la transcription et route vers le bon endpoint de la mémoire.
-
-    - ADD   → POST /memory/add  (mémorisation d'une information)
-    - QUERY → POST /memory/query (interrogation avec réponse LLM)
-    - UNKNOWN → log simple, aucun appel backend
-    """
-    command_type, content = classify(text, jarvis_api_url=jarvis_api_url)
-
-    if command_type == CommandType.ADD:
-        logger.info("Commande ADD détectée. Contenu à mémoriser: %s", content)
-        tts_client.speak_async(random.choice(["J'enregistre ça.", "Je mémorise.", "Un instant, j'enregistre."]))
-        result = jarvis_client.add_memory(content)
-        if result:
-            logger.info(
-                "Mémorisé. eventDate=%s expression=%s",
-                result.get("eventDate", "—"),
-                result.get("expression", "—"),
-            )
-            tts_client.speak_random(["C'est noté.", "Bien noté.", "Enregistré.", "Je m'en souviens."])
-        else:
-            logger.warning("L'ajout en mémoire a échoué (backend injoignable ou erreur).")
-            tts_client.speak_random(["Désolé, une erreur est survenue.", "Je n'ai pas pu faire ça.", "Quelque chose s'est mal passé."])
-
-    elif command_type == CommandType.QUERY:
-        logger.info("Commande QUERY détectée. Question: %s", content)
-        tts_client.speak_async(random.choice(["Je cherche dans ma mémoire.", "Laisse-moi réfléchir.", "Je consulte mes souvenirs."]))
-        result = jarvis_client.query_memory(content)
-        if result:
-            answer = result.get("answer", "")
-            logger.info(
-                "RÉPONSE JARVIS: %s  [contexte temporel: %s]",
-                answer,
-                result.get("temporalContext", "aucun"),
-            )
-            tts_client.speak_random(["Voilà.", "Bien sûr.", "Je réponds."])
-            tts_client.speak(answer)
-        else:
-            logger.warning("La requête mémoire a échoué (backend injoignable ou erreur).")
-            tts_client.speak_random(["Désolé, une erreur est survenue.", "Je n'ai pas pu faire ça.", "Quelque chose s'est mal passé."])
-
-    else:
-        logger.info("Commande non reconnue (UNKNOWN). Texte ignoré: %s", text)
+    if pipeline is not None:
+        pipeline.stop()
+
+
+def _timed(timings: dict[str, float], name: str, fn, *args):
+    """Execute fn(*args) et note sa duree (ms) sous *name*."""
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[name] = round((time.perf_counter() - t0) * 1000)
+
+
+def _format(timings: dict[str, float]) -> str:
+    # Copie : les threads de chargement peuvent encore ajouter des entrees
+    return ", ".join(f"{name}={ms:.0f}ms" for name, ms in dict(timings).items())
+
+
+def _load_wake_model(config, rooms: list[str]) -> OwwWakeModel | BatchedWakeModel:
+    if config.multi_room:
+        return BatchedWakeModel.from_config(config, rooms)
+    oww_model = Model(
+        wakeword_models=[config.wake_model],
+        inference_framework=config.wake_inference_framework,
+    )
+    # Amorcage des sessions (melspectrogramme, embeddings, wake word) sur du silence
+    silence = np.zeros(config.chunk_size, dtype=np.int16)
+    for _ in range(4):
+        oww_model.predict(silence)
+    oww_model.reset()
+    return OwwWakeModel(oww_model)
+
+
+def _open_captures(config, input_devices: list[int | None]) -> tuple[pyaudio.PyAudio, list[AudioCapture]]:
+    pa = pyaudio.PyAudio()
+    return pa, [AudioCapture(pa, config, device) for device in input_devices]
+
+
+def _build_endpointers(config, count: int) -> list:
+    return [build_endpointer(config) for _ in range(count)]
 
 
 def main():
+    global pipeline
     signal.signal(signal.SIGINT, shutdown)
     signal.signal(signal.SIGTERM, shutdown)
 
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
     config = load_config()
-
-    # Telecharger les modeles OpenWakeWord si necessaire
-    logger.info("Chargement du modele OpenWakeWord '%s'...", config.wake_model)
-    openwakeword.utils.download_models()
-    oww_model = Model(wakeword_models=[config.wake_model])
-
-    # Initialiser PyAudio
-    pa = pyaudio.PyAudio()
-    stream = pa.open(
-        format=pyaudio.paInt16,
-        channels=1,
-        rate=config.sample_rate,
-        input=True,
-        frames_per_buffer=config.chunk_size,
+    tracing.setup(config)
+    # Une piece sans nom sur les peripheriques par defaut, ou celles de ROOMS
+    room_specs = list(config.rooms) or [("", None, None)]
+    names = [name for name, _, _ in room_specs]
+
+    # Verification locale des modeles (manifeste + sommes de controle), sans reseau
+    _timed(timings, "models", ensure_models, config)
+
+    # Chargements en parallele ; l'ecoute demarre des que le wake word, le micro
+    # et l'end-pointer sont prets, le TTS et le classifieur local suivent.
+    # Une seule voix Piper, un flux de sortie par piece.
+    tts_client = TtsClient(config, output_device=room_specs[0][2])
+    room_tts = [tts_client] + [tts_client.output(output) for _, _, output in room_specs[1:]]
+    startup = ThreadPoolExecutor(max_workers=5, thread_name_prefix="startup")
+    logger.info("Chargement du modele OpenWakeWord '%s' (%d piece(s))...", config.wake_model, len(room_specs))
+    wake_future = startup.submit(_timed, timings, "oww", _load_wake_model, config, names)
+    capture_future = startup.submit(
+        _timed, timings, "audio", _open_captures, config, [device for _, device, _ in room_specs]
     )
-
+    endpointer_future = startup.submit(_timed, timings, "endpointer", _build_endpointers, config, len(room_specs))
+    background = [
+        startup.submit(_timed, timings, "tts", tts_client.load, ALL_PHRASES),
+        startup.submit(_timed, timings, "intent", command_classifier.setup, config),
+    ]
+    startup.shutdown(wait=False)
+
+    wake_model = wake_future.result()
+    pa, captures = capture_future.result()
+    endpointers = endpointer_future.result()
+
+    rooms = [
+        Room(name, capture, WakeGate(config), endpointer, tts)
+        for name, capture, endpointer, tts in zip(names, captures, endpointers, room_tts)
+    ]
+    # Clients HTTP partages par toutes les pieces (pools de connexions)
     stt_client = SttClient(config)
     jarvis_client = JarvisClient(config)
-    tts_client = TtsClient(config)
+    pipeline = Pipeline(config, rooms, wake_model, stt_client, jarvis_client)
 
     logger.info(
-        "Ecoute du wake word '%s' en cours... (Ctrl+C pour arreter)",
+        "Ecoute du wake word '%s' en cours apres %.0f ms (%s)... (Ctrl+C pour arreter)",
         config.wake_model,
+        (time.perf_counter() - started) * 1000,
+        _format(timings),
     )
 
-    try:
-        while running:
-            # Lire un frame audio depuis le micro
-            raw = stream.read(config.chunk_size, exception_on_overflow=False)
-            audio_frame = np.frombuffer(raw, dtype=np.int16)
-
-            # Prediction OpenWakeWord
-            prediction = oww_model.predict(audio_frame)
-
-            # Verifier si le wake word est detecte
-            for model_name, score in prediction.items():
-                if score >= config.wake_threshold:
-                    logger.info(
-                        "*** Wake word detecte! (modele=%s, score=%.3f)",
-                        model_name,
-                        score,
-                    )
-                    tts_client.speak(random.choice(["Je t'écoute.", "À l'écoute.", "Dis-moi.", "Oui ?", "Je suis là."]))
-
-                    # Enregistrer jusqu'au silence
-                    wav_bytes = record_until_silence(stream, config)
-                    logger.info(
-                        "Enregistrement termine (%d octets). Envoi au STT...",
-                        len(wav_bytes),
-                    )
-                    tts_client.speak_async(random.choice(["Analyse en cours.", "Un instant.", "Je traite ça.", "Je réfléchis."]))
-
-                    # Transcrire
-                    text = stt_client.transcribe(wav_bytes)
-
-                    if text:
-                        logger.info("TRANSCRIPTION: %s", text)
-                        _route_command(text, jarvis_client, tts_client, config.jarvis_api_url)
-                    else:
-                        logger.info("Aucune parole detectee ou transcription vide.")
-
-                    # Reset du buffer OpenWakeWord apres traitement
-                    oww_model.reset()
-                    break
+    def log_complete() -> None:
+        wait(background)
+        for f in background:
+            if f.exception() is not None:
+                logger.error("Chargement en arriere-plan echoue: %r", f.exception())
+        logger.info("Demarrage complet en %.0f ms (%s).", (time.perf_counter() - started) * 1000, _format(timings))
 
+    threading.Thread(target=log_complete, name="startup-report", daemon=True).start()
+
+    try:
+        asyncio.run(pipeline.run())
     finally:
-        stream.stop_stream()
-        stream.close()
+        for room in rooms:
+            if room.gate.enabled:
+                logger.info("Porte wake word%s: %s", f" ({room.name})" if room.name else "", room.gate.stats())
+        if config.speculative_query:
+            logger.info("Speculation memoire: %s", speculation.stats())
+        logger.info("File ADD: %s", pipeline.memory_queue.stats())
+        tts_client.close()
+        for capture in captures:
+            capture.close()
         pa.terminate()
         logger.info("Listener arrete.")
 